@@ -0,0 +1,357 @@
+import sys
+import argparse
+from collections import Counter
+from datetime import date, timedelta
+
+from scoring import LEVEL1
+
+# ==============================================================================
+# COHORT ANALYTICS (pre-aggregated rollups)
+# ==============================================================================
+#
+# Screening reports (label histograms and referral rates by age band, location
+# and day) are served from rollup tables instead of the raw assessments:
+#
+#   cohort_rollups    assessments per (population, domain, label, age band, location, day)
+#   cohort_referrals  Level 1 referrals per (population, referred domain, age band, location, day);
+#                     the denominator is the Level 1 count in cohort_rollups
+#
+# plus the same two per calendar month (*_monthly, day = the 1st), so a report
+# over a year reads twelve monthly slices and at most two partial months of days
+# instead of 365 daily ones. Reports broken down by day use the daily tables only.
+#
+# AssessmentWriter.write() folds every batch into all four in the same transaction
+# as the insert (one users lookup, one executemany per table), so a report costs
+# the same however many assessments there are. Age band and location are the
+# user's at the time of the assessment. rebuild() recomputes the tables from the
+# raw rows (backfill, or after changing AGE_BANDS): python analytics.py --rebuild
+
+AGE_BANDS = [(0, 12, "0-12"), (13, 17, "13-17"), (18, 24, "18-24"), (25, 44, "25-44"), (45, 64, "45-64"),
+             (65, None, "65+")]
+UNKNOWN = "unknown"
+LOCATION_LENGTH = 64
+DIMENSIONS = ("age_band", "location", "day")
+REPORT_DAYS = 30
+MAX_REPORT_DAYS = 366
+
+GRAINS = {"day": "", "month": "_monthly"}     # table suffix per rollup grain
+
+
+def _schema(text, integer, day, without_rowid):
+    statements = []
+    for suffix in GRAINS.values():
+        statements += [
+            f"""
+            CREATE TABLE IF NOT EXISTS cohort_rollups{suffix} (
+                population {text(16)} NOT NULL,
+                domain {text(64)} NOT NULL,
+                day {day} NOT NULL,
+                age_band {text(8)} NOT NULL,
+                location {text(LOCATION_LENGTH)} NOT NULL,
+                label {text(64)} NOT NULL,
+                assessments {integer} NOT NULL,
+                PRIMARY KEY (population, domain, day, age_band, location, label)
+            ){without_rowid}
+            """,
+            f"""
+            CREATE TABLE IF NOT EXISTS cohort_referrals{suffix} (
+                population {text(16)} NOT NULL,
+                day {day} NOT NULL,
+                domain {text(64)} NOT NULL,
+                age_band {text(8)} NOT NULL,
+                location {text(LOCATION_LENGTH)} NOT NULL,
+                referrals {integer} NOT NULL,
+                PRIMARY KEY (population, day, domain, age_band, location)
+            ){without_rowid}
+            """,
+        ]
+    return statements
+
+
+SCHEMA = {
+    "mysql": _schema(lambda n: f"VARCHAR({n})", "INT", "DATE", ""),
+    # Stand-in for benchmarks and local runs
+    "sqlite": _schema(lambda n: "TEXT", "INTEGER", "TEXT", " WITHOUT ROWID"),
+}
+
+
+class InvalidReport(ValueError):
+    """A report request with an unknown dimension or a bad date range."""
+
+
+def _sql(statement, dialect):
+    return statement if dialect == "mysql" else statement.replace("%s", "?")
+
+
+def age_band(age):
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        return UNKNOWN
+    for low, high, band in AGE_BANDS:
+        if age >= low and (high is None or age <= high):
+            return band
+    return UNKNOWN
+
+
+def normalise_location(location):
+    """'  new   york' and 'New York' are one cohort."""
+    location = " ".join(str(location or "").split()).title()[:LOCATION_LENGTH]
+    return location or UNKNOWN
+
+
+# ==============================================================================
+# WRITE SIDE
+# ==============================================================================
+
+def _increment_statement(table, keys, count, dialect):
+    columns = keys + (count,)
+    values = ", ".join(["%s"] * len(columns))
+    if dialect == "mysql":
+        conflict = f"ON DUPLICATE KEY UPDATE {count} = {count} + VALUES({count})"
+    else:
+        conflict = f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {count} = {count} + excluded.{count}"
+    return _sql(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values}) {conflict}", dialect)
+
+
+ROLLUP_KEYS = ("population", "domain", "day", "age_band", "location", "label")
+REFERRAL_KEYS = ("population", "day", "domain", "age_band", "location")
+
+
+def increment_statements(dialect):
+    """{(grain, "rollups" | "referrals"): upsert statement}"""
+    statements = {}
+    for grain, suffix in GRAINS.items():
+        statements[(grain, "rollups")] = _increment_statement(
+            f"cohort_rollups{suffix}", ROLLUP_KEYS, "assessments", dialect)
+        statements[(grain, "referrals")] = _increment_statement(
+            f"cohort_referrals{suffix}", REFERRAL_KEYS, "referrals", dialect)
+    return statements
+
+
+def rollup_counts(records, demographics):
+    """
+    (rollup counts, referral counts) per day for assessment records; demographics
+    maps user_id -> (age, location). Keys are in ROLLUP_KEYS / REFERRAL_KEYS order.
+    """
+    rollups, referrals = Counter(), Counter()
+    for record in records:
+        age, location = demographics.get(record["user_id"], (None, None))
+        band, location = age_band(age), normalise_location(location)
+        day = str(record["taken_at"])[:10]
+        rollups[(record["population"], record["domain"], day, band, location, record["label"])] += 1
+        if record["domain"] == LEVEL1 and record["referrals"]:
+            for referred in record["referrals"].split(","):
+                referrals[(record["population"], day, referred, band, location)] += 1
+    return rollups, referrals
+
+
+def _monthly(counts, day_index):
+    months = Counter()
+    for key, count in counts.items():
+        months[key[:day_index] + (key[day_index][:8] + "01",) + key[day_index + 1:]] += count
+    return months
+
+
+def _increment(cursor, statements, rollups, referrals):
+    counts = {
+        ("day", "rollups"): rollups,
+        ("day", "referrals"): referrals,
+        ("month", "rollups"): _monthly(rollups, ROLLUP_KEYS.index("day")),
+        ("month", "referrals"): _monthly(referrals, REFERRAL_KEYS.index("day")),
+    }
+    for table, table_counts in counts.items():
+        if table_counts:
+            cursor.executemany(statements[table], [key + (count,) for key, count in table_counts.items()])
+
+
+def demographics(cursor, user_ids, dialect):
+    user_ids = sorted(set(user_ids))
+    cursor.execute(
+        _sql(f"SELECT id, age, location FROM users WHERE id IN ({', '.join(['%s'] * len(user_ids))})", dialect),
+        user_ids,
+    )
+    return {user_id: (age, location) for user_id, age, location in cursor.fetchall()}
+
+
+def update_rollups(cursor, records, dialect, statements=None):
+    """Folds a batch of assessment records into the rollups (caller commits)."""
+    if not records:
+        return
+    rollups, referrals = rollup_counts(records, demographics(cursor, [r["user_id"] for r in records], dialect))
+    _increment(cursor, statements or increment_statements(dialect), rollups, referrals)
+
+
+def rebuild(conn, dialect="mysql", chunk=100_000):
+    """
+    Recomputes the rollup tables from assessments and users. Run it while nothing
+    is being written: batches folded in meanwhile would be counted twice or lost.
+    """
+    cursor = conn.cursor()
+    for statement in SCHEMA[dialect]:
+        cursor.execute(statement)
+    for suffix in GRAINS.values():
+        cursor.execute(f"DELETE FROM cohort_rollups{suffix}")
+        cursor.execute(f"DELETE FROM cohort_referrals{suffix}")
+
+    rollups, referrals = Counter(), Counter()
+    cursor.execute(
+        "SELECT a.user_id, a.population, a.domain, a.taken_at, a.label, a.referrals, u.age, u.location "
+        "FROM assessments a LEFT JOIN users u ON u.id = a.user_id"
+    )
+    while True:
+        rows = cursor.fetchmany(chunk)
+        if not rows:
+            break
+        people = {row[0]: (row[6], row[7]) for row in rows}
+        records = [
+            {"user_id": user_id, "population": population, "domain": domain, "taken_at": taken_at,
+             "label": label, "referrals": referred}
+            for user_id, population, domain, taken_at, label, referred, _, _ in rows
+        ]
+        chunk_rollups, chunk_referrals = rollup_counts(records, people)
+        rollups.update(chunk_rollups)
+        referrals.update(chunk_referrals)
+
+    _increment(cursor, increment_statements(dialect), rollups, referrals)
+    conn.commit()
+    return sum(rollups.values()), len(rollups), len(referrals)
+
+
+# ==============================================================================
+# REPORTS (read side)
+# ==============================================================================
+
+def report_range(start=None, end=None):
+    """Validated (start, end) ISO days, inclusive; defaults to the last REPORT_DAYS days."""
+    try:
+        end = date.fromisoformat(end) if end else date.today()
+        start = date.fromisoformat(start) if start else end - timedelta(days=REPORT_DAYS - 1)
+    except ValueError as e:
+        raise InvalidReport(f"Dates must be YYYY-MM-DD: {e}") from e
+    if start > end or (end - start).days >= MAX_REPORT_DAYS:
+        raise InvalidReport(f"from must not be after to, and the range is at most {MAX_REPORT_DAYS} days")
+    return start.isoformat(), end.isoformat()
+
+
+def _dimensions(by):
+    by = tuple(by or ())
+    unknown = [d for d in by if d not in DIMENSIONS]
+    if unknown:
+        raise InvalidReport(f"Unknown dimension(s) {unknown}; choose from {list(DIMENSIONS)}")
+    return by
+
+
+def _filters(where, params, age_band=None, location=None):
+    if age_band is not None:
+        where += " AND age_band = %s"
+        params.append(age_band)
+    if location is not None:
+        where += " AND location = %s"
+        params.append(normalise_location(location))
+    return where, params
+
+
+def spans(start, end, by_day=False):
+    """
+    [(grain, first, last)] covering start..end: whole calendar months from the
+    monthly tables, the partial months at either end (or everything, by_day) from
+    the daily ones.
+    """
+    start, end = date.fromisoformat(start), date.fromisoformat(end)
+    if by_day:
+        return [("day", start.isoformat(), end.isoformat())]
+    result = []
+    day = start
+    while day <= end:
+        month_start = day.replace(day=1)
+        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        if day == month_start and month_end <= end:
+            grain, last = "month", month_start
+        else:
+            grain, last = "day", min(month_end, end)
+        if result and result[-1][0] == grain:
+            result[-1][2] = last
+        else:
+            result.append([grain, day, last])
+        day = min(month_end, end) + timedelta(days=1)
+    return [(grain, first.isoformat(), last.isoformat()) for grain, first, last in result]
+
+
+def _sum(cursor, table, columns, count, where, params, start, end, by, dialect):
+    """SUM(count) per `columns` over start..end, reading each span from its grain's table."""
+    totals = Counter()
+    group = ", ".join(columns)
+    for grain, first, last in spans(start, end, by_day="day" in by):
+        cursor.execute(
+            _sql(f"SELECT {group + ', ' if columns else ''}SUM({count}) FROM {table}{GRAINS[grain]} "
+                 f"WHERE {where} AND day BETWEEN %s AND %s{' GROUP BY ' + group if columns else ''}", dialect),
+            params + [first, last],
+        )
+        for row in cursor.fetchall():
+            if row[-1]:
+                totals[tuple(str(value) for value in row[:-1])] += int(row[-1])
+    return totals
+
+
+def _group(totals, n_dimensions):
+    """{(dim..., key): count} -> {(dim...): {key: count}}"""
+    cohorts = {}
+    for key, count in sorted(totals.items()):
+        cohorts.setdefault(key[:n_dimensions], {})[key[n_dimensions]] = count
+    return cohorts
+
+
+def label_distribution(conn, population, domain, start=None, end=None, by=("age_band",), age_band=None,
+                       location=None, dialect="mysql"):
+    """Label histogram of a domain per cohort: [{"cohort": {dim: value}, "total", "labels": {label: n}}]."""
+    by = _dimensions(by)
+    start, end = report_range(start, end)
+    where, params = _filters("population = %s AND domain = %s", [population, domain], age_band, location)
+    totals = _sum(conn.cursor(), "cohort_rollups", by + ("label",), "assessments", where, params, start, end, by,
+                  dialect)
+    return [
+        {"cohort": dict(zip(by, cohort)), "total": sum(labels.values()), "labels": labels}
+        for cohort, labels in _group(totals, len(by)).items()
+    ]
+
+
+def referral_rates(conn, population, start=None, end=None, by=(), age_band=None, location=None, dialect="mysql"):
+    """
+    Share of Level 1 assessments referring each domain, per cohort:
+    [{"cohort": {dim: value}, "screened": n, "referrals": {domain: n}, "rates": {domain: share}}].
+    """
+    by = _dimensions(by)
+    start, end = report_range(start, end)
+    cursor = conn.cursor()
+    where, params = _filters("population = %s AND domain = %s", [population, LEVEL1], age_band, location)
+    screened = _sum(cursor, "cohort_rollups", by, "assessments", where, params, start, end, by, dialect)
+    where, params = _filters("population = %s", [population], age_band, location)
+    referred = _group(
+        _sum(cursor, "cohort_referrals", by + ("domain",), "referrals", where, params, start, end, by, dialect),
+        len(by),
+    )
+    return [
+        {
+            "cohort": dict(zip(by, cohort)),
+            "screened": total,
+            "referrals": referred.get(cohort, {}),
+            "rates": {domain: round(n / total, 4) for domain, n in referred.get(cohort, {}).items()},
+        }
+        for cohort, total in sorted(screened.items())
+    ]
+
+
+if __name__ == '__main__':
+    import db
+
+    parser = argparse.ArgumentParser(description="Cohort rollup maintenance.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the rollups from all assessments")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        sys.exit(1)
+    with db.connection() as conn:
+        assessments_counted, rollup_rows, referral_rows = rebuild(conn, dialect=db.DIALECT)
+    print(f"Rebuilt cohort rollups from {assessments_counted} assessments: "
+          f"{rollup_rows} rollup rows, {referral_rows} referral rows")
@@ -1,68 +1,457 @@
-from flask import Flask, request, jsonify
+import time
+
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import mysql.connector
+
+import analytics
+import assessments
+import db
+import passwords
+import profiles
+import profiling
+import roster
+import schemas
+import scoring
+import tokens
+from metrics import REGISTRY, REQUEST_LATENCY
 
 app = Flask(__name__)
+app.json = schemas.FastJSONProvider(app)
 CORS(app)
 
-# --- DATABASE ---
-db = mysql.connector.connect(
-    host="localhost",
-    user="root",
-    password="9744997775",
-    database="mindgauge_db"
-)
+# --- METRICS ---
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_latency(response):
+    start = g.pop("request_start", None)
+    if start is not None:
+        # Route pattern, not the raw path, keeps the label set bounded
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint, request.method, str(response.status_code))
+    return response
+
 
-cursor = db.cursor(dictionary=True)
+@app.get("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.get("/debug/rule-audit")
+def rule_audit():
+    """Per-domain disagreement between the rule fast path and the model (sampled; staff only)."""
+    _, error = _authorize()
+    if error:
+        return error
+    return jsonify({"sample_rate": scoring.AUDITOR.sample_rate, "domains": scoring.AUDITOR.summary()})
+
+@app.get("/debug/shadow")
+def shadow_scoring():
+    """Candidate vs. current release on shadowed live traffic (see shadow.py; staff only)."""
+    _, error = _authorize()
+    if error:
+        return error
+    return jsonify({
+        "sample_rate": scoring.SHADOW.sample_rate, "dropped": scoring.SHADOW.dropped, "domains": scoring.SHADOW.summary(),
+    })
+
+# --- SCHEMA: assessment and rollup tables exist before the first read or write ---
+try:
+    db.ensure_schema(assessments.SCHEMA, analytics.SCHEMA)
+except Exception as e:
+    print(f"Could not create the assessment tables ({e}); history and analytics fail until they exist")
 
 # --- LOGIN API ---
+def _payload(schema):
+    """(the body decoded with a schemas.Schema, None) or (None, 400 response)."""
+    try:
+        return schema.decode(request.get_data()), None
+    except schemas.InvalidPayload as e:
+        return None, (jsonify({"status": "invalid", "error": str(e)}), 400)
+
+
+def _overloaded(error):
+    response = jsonify({"status": "overloaded", "error": str(error)})
+    response.headers["Retry-After"] = str(passwords.RETRY_AFTER_SECONDS)
+    return response, 503
+
+
+def _store_rehash(user, new_hash):
+    """Swaps in an upgraded hash unless the password changed meanwhile."""
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE users SET password=%s WHERE id=%s AND password=%s",
+                       (new_hash, user["id"], user["password"]))
+        conn.commit()
+        return cursor.rowcount == 1
+
+
 @app.post("/login")
 def login():
-    data = request.json
-    email = data.get("email")
-    password = data.get("password")
+    data, error = _payload(schemas.LOGIN)
+    if error:
+        return error
+    email = data.email
+    password = data.password
+
+    # Unique index on email; the hash is checked on the login pool, not in SQL
+    generation = profiles.CACHE.generation()
+    with db.connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT id, name, age, location, password FROM users WHERE email=%s",
+            (email,)
+        )
+        user = cursor.fetchone()
 
-    cursor.execute(
-        "SELECT * FROM users WHERE email=%s AND password=%s",
-        (email, password)
-    )
-    user = cursor.fetchone()
+    try:
+        ok = passwords.LOGIN.verify(user["password"] if user else None, password)
+    except passwords.Overloaded as e:
+        return _overloaded(e)
 
-    if user:
+    if ok:
+        passwords.LOGIN.upgrade(user["password"], password, lambda new_hash: _store_rehash(user, new_hash))
+        profile = {"id": user["id"], "name": user["name"], "age": user["age"], "location": user["location"]}
+        profiles.CACHE.put(user["id"], profile, generation)
         return jsonify({
             "status": "success",
             "name": user["name"],
             "userId": user["id"],
             "age": user["age"],
-            "location": user["location"]
+            "location": user["location"],
+            **tokens.issue(user["id"], user["age"]),
         })
 
     return jsonify({"status": "fail"}), 401
 
+# --- SESSION TOKENS (see tokens.py) ---
+@app.post("/token/refresh")
+def refresh_token():
+    """Body: {"refreshToken": ...}. Looks the user up again, so the new access token has their current age."""
+    data, error = _payload(schemas.REFRESH)
+    if error:
+        return error
+    try:
+        claims = tokens.verify(data.refreshToken, "refresh")
+    except tokens.InvalidToken as e:
+        return jsonify({"status": "invalid_token", "error": str(e)}), 401
+
+    user = profiles.CACHE.get(claims["sub"], _load_profile)
+    if not user:
+        return jsonify({"status": "invalid_token", "error": "User no longer exists"}), 401
+    return jsonify({"status": "success", **tokens.issue(user["id"], user["age"])})
+
+
+def _load_profile(user_id):
+    """Read-through loader of profiles.CACHE."""
+    with db.connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT id, name, age, location FROM users WHERE id=%s", (user_id,))
+        return cursor.fetchone()
+
+
+def _caller():
+    """(claims of the request's bearer token or None, error response or None)."""
+    try:
+        return tokens.bearer(request.headers.get("Authorization")), None
+    except tokens.InvalidToken as e:
+        return None, (jsonify({"status": "invalid_token", "error": str(e)}), 401)
+
+
+def _authorize(user_id=None, roles=tokens.STAFF_ROLES):
+    """
+    (claims, None) for the user's own access token (user_id) or a staff token with
+    one of `roles`, else (None, 401/403 response).
+    """
+    claims, error = _caller()
+    if error:
+        return None, error
+    if not claims:
+        return None, (jsonify({"status": "invalid_token", "error": "Needs 'Authorization: Bearer <token>'"}), 401)
+    if claims.get("role") in roles or (user_id is not None and "role" not in claims and claims["sub"] == user_id):
+        return claims, None
+    return None, (jsonify({"status": "forbidden", "error": "This token may not read this resource"}), 403)
+
+# --- PROFILING (opt-in, staff only; see profiling.py) ---
+if profiling.ENABLED:
+    profiling.install(app, _authorize)
+
 # --- REGISTER API ---
 @app.post("/register")
 def register():
-    data = request.json
+    data, error = _payload(schemas.REGISTER)
+    if error:
+        return error
 
-    name = data.get("name")
-    email = data.get("email")
-    password = data.get("password")
-    age = data.get("age")
-    location = data.get("location")
+    name = data.name
+    email = data.email
+    password = data.password
+    age = data.age
+    location = data.location
+    # The app sends age as text
+    if isinstance(age, str):
+        if age.strip() and not age.strip().isdigit():
+            return jsonify({"status": "invalid", "error": "age must be an integer"}), 400
+        age = int(age) if age.strip() else None
+    # Hashed on the login pool before borrowing a connection: scrypt takes tens of milliseconds
+    try:
+        hashed = passwords.LOGIN.hash(password) if password else passwords.UNUSABLE
+    except passwords.Overloaded as e:
+        return _overloaded(e)
 
     try:
-        cursor.execute(
-            """
-            INSERT INTO users (name, email, password, age, location)
-            VALUES (%s, %s, %s, %s, %s)
-            """,
-            (name, email, password, age, location)
-        )
-        db.commit()
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO users (name, email, password, age, location)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                (name, email, hashed, age, location)
+            )
+            conn.commit()
+        # The new id may have been looked up (and cached as unknown) before
+        profiles.CACHE.invalidate(cursor.lastrowid)
         return jsonify({"status": "success"}), 201
 
-    except mysql.connector.IntegrityError:
+    except db.IntegrityError:
         return jsonify({"status": "email_exists"}), 409
 
+# --- PROFILE API (cached, see profiles.py) ---
+PROFILE_FIELDS = ("name", "age", "location")
+
+@app.patch("/users/<int:user_id>/profile")
+def update_profile(user_id):
+    """
+    Body: any of name, age, location. Needs the user's own access token; the
+    response carries fresh tokens, since a new age can change their population.
+    """
+    claims, error = _caller()
+    if error:
+        return error
+    if not claims or claims["sub"] != user_id:
+        return jsonify({"status": "forbidden", "error": "Needs the user's own access token"}), 403
+    data, error = _payload(schemas.PROFILE)
+    if error:
+        return error
+    changes = {field: getattr(data, field) for field in PROFILE_FIELDS if hasattr(data, field)}
+    if not changes:
+        return jsonify({"status": "invalid", "error": "name, age or location is required"}), 400
+    if "name" in changes and not changes["name"].strip():
+        return jsonify({"status": "invalid", "error": "name must be a non-empty string"}), 400
+    if changes.get("age") is not None and not 0 <= changes["age"] <= roster.MAX_AGE:
+        return jsonify({"status": "invalid", "error": f"age must be an integer 0-{roster.MAX_AGE}"}), 400
+
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"UPDATE users SET {', '.join(f'{field}=%s' for field in changes)} WHERE id=%s",
+            (*changes.values(), user_id)
+        )
+        conn.commit()
+    profiles.CACHE.invalidate(user_id)
+
+    profile = profiles.CACHE.get(user_id, _load_profile)
+    if not profile:
+        return jsonify({"status": "not_found"}), 404
+    return jsonify({"status": "success", **profile, **tokens.issue(user_id, profile["age"])})
+
+# --- BULK IMPORT API (see roster.py) ---
+@app.post("/users/import")
+def import_users():
+    """
+    Body: a CSV roster (Content-Type text/csv) or JSON roster with the /register fields.
+    Responds with the count per outcome and one outcome per row. Needs an admin token.
+    """
+    _, error = _authorize(roles=("admin",))
+    if error:
+        return error
+    try:
+        rows = roster.parse(request.get_data(), request.content_type or "application/json")
+    except roster.InvalidRoster as e:
+        return jsonify({"status": "invalid", "error": str(e)}), 400
+
+    with db.connection() as conn:
+        results = roster.import_users(conn, rows, db.DIALECT)
+    profiles.CACHE.invalidate(*(result["user_id"] for result in results if result["status"] == "created"))
+    return jsonify({"status": "success", "counts": roster.counts(results), "results": results})
+
+# --- SCORING API ---
+EXPLAIN_TOP_K = 3
+
+@app.post("/score")
+def score():
+    """
+    Body: {"population": "adult"|"children", "domain": "<level 2 domain>"|"level1",
+           "scores": [[...], ...]} (one row of item scores per respondent, null = unanswered)
+    Optional "explain": true | <k> adds the top contributing items per respondent (k defaults to 3).
+    With "Authorization: Bearer <access token>", population defaults to the token's and the scored
+    rows are stored as the user's assessments (written behind the response); "user_id", if given,
+    must be the token's. Without a token nothing is stored.
+    """
+    claims, error = _caller()
+    if error:
+        return error
+    data, error = _payload(schemas.SCORE)
+    if error:
+        return error
+    population = data.population
+    domain = data.domain
+    rows = data.scores      # float64 matrix, NaN = unanswered
+    explain = data.explain
+    user_id = None
+    if claims and "role" not in claims:
+        population = population or claims["pop"]
+        user_id = claims["sub"]
+        if data.user_id is not None and data.user_id != user_id:
+            return jsonify({"status": "forbidden", "error": "user_id does not match the access token"}), 403
+    elif data.user_id is not None:
+        error = {"status": "forbidden" if claims else "invalid_token",
+                 "error": "Storing assessments needs the user's access token"}
+        return jsonify(error), 403 if claims else 401
+
+    if not population or not domain:
+        return jsonify({"status": "invalid", "error": "population, domain and scores are required"}), 400
+    if explain is True:
+        explain = EXPLAIN_TOP_K
+    if explain is False or explain is None:
+        explain = 0
+    if explain < 0:
+        return jsonify({"status": "invalid", "error": "explain must be true, false or a positive integer"}), 400
+
+    g.profile_tags = {"population": population, "domain": domain}
+    try:
+        result = scoring.score(population, domain, rows, explain=explain)
+    except scoring.inference.UnknownDomainError as e:
+        return jsonify({"status": "unknown_domain", "error": str(e)}), 404
+    except scoring.inference.ModelNotFoundError as e:
+        return jsonify({"status": "model_unavailable", "error": str(e)}), 503
+    except scoring.inference.InvalidInputError as e:
+        return jsonify({"status": "invalid", "error": str(e)}), 400
+
+    g.profile_tags["model_version"] = result["model_version"]
+    if user_id is not None:
+        assessments.WRITER.submit(assessments.assessment_records(user_id, population, domain, rows, result))
+    result["status"] = "success"
+    return jsonify(result)
+
+# --- ASSESSMENT HISTORY API (see assessments.py; the user's own token or a staff token) ---
+def _page_size():
+    limit = request.args.get("limit", assessments.HISTORY_PAGE_SIZE, type=int)
+    return None if limit is None or not 0 < limit <= assessments.MAX_PAGE_SIZE else limit
+
+
+@app.get("/users/<int:user_id>/assessments")
+def assessment_history(user_id):
+    """?population=&domain= (together) filter; ?cursor= is the next_cursor of the previous page."""
+    _, error = _authorize(user_id)
+    if error:
+        return error
+    population = request.args.get("population")
+    domain = request.args.get("domain")
+    limit = _page_size()
+    if limit is None:
+        return jsonify({"status": "invalid", "error": f"limit must be 1-{assessments.MAX_PAGE_SIZE}"}), 400
+    if domain is not None and population is None:
+        return jsonify({"status": "invalid", "error": "domain needs population"}), 400
+
+    try:
+        with db.connection() as conn:
+            items, next_cursor = assessments.history(
+                conn, user_id, population, domain, cursor=request.args.get("cursor"), limit=limit, dialect=db.DIALECT
+            )
+    except assessments.InvalidCursor as e:
+        return jsonify({"status": "invalid", "error": str(e)}), 400
+    return jsonify({"status": "success", "assessments": items, "next_cursor": next_cursor})
+
+
+@app.get("/users/<int:user_id>/trends")
+def assessment_trends(user_id):
+    """Level 1 domain scores over time (?population= required), newest first, keyset-paginated."""
+    _, error = _authorize(user_id)
+    if error:
+        return error
+    population = request.args.get("population")
+    limit = _page_size()
+    if population not in scoring.inference.LEVEL1_FEATURES:
+        return jsonify({"status": "invalid", "error": "population must be adult or children"}), 400
+    if limit is None:
+        return jsonify({"status": "invalid", "error": f"limit must be 1-{assessments.MAX_PAGE_SIZE}"}), 400
+
+    try:
+        with db.connection() as conn:
+            points, next_cursor = assessments.trends(
+                conn, user_id, population, cursor=request.args.get("cursor"), limit=limit, dialect=db.DIALECT
+            )
+    except assessments.InvalidCursor as e:
+        return jsonify({"status": "invalid", "error": str(e)}), 400
+    return jsonify({"status": "success", "features": scoring.inference.LEVEL1_FEATURES[population],
+                    "points": points, "next_cursor": next_cursor})
+
+
+@app.get("/users/<int:user_id>/summary")
+def assessment_summary(user_id):
+    """Latest result, rolling mean and last referrals per domain, from the maintained summary rows."""
+    _, error = _authorize(user_id)
+    if error:
+        return error
+    with db.connection() as conn:
+        summary = assessments.summary(conn, user_id, request.args.get("population"), db.DIALECT)
+    return jsonify({"status": "success", "summary": summary})
+
+# --- COHORT ANALYTICS API (see analytics.py; staff tokens only) ---
+def _report_args():
+    """Shared query parameters: from, to (YYYY-MM-DD), by (comma-separated), age_band, location."""
+    by = request.args.get("by")
+    return {
+        "start": request.args.get("from"),
+        "end": request.args.get("to"),
+        "by": [d for d in by.split(",") if d] if by else (),
+        "age_band": request.args.get("age_band"),
+        "location": request.args.get("location"),
+    }
+
+
+@app.get("/analytics/labels")
+def cohort_labels():
+    """Label histogram of one domain per cohort (?population=&domain=, by defaults to age_band)."""
+    _, error = _authorize()
+    if error:
+        return error
+    population = request.args.get("population")
+    domain = request.args.get("domain")
+    if not population or not domain:
+        return jsonify({"status": "invalid", "error": "population and domain are required"}), 400
+    report = _report_args()
+    if "by" not in request.args:
+        report["by"] = ("age_band",)
+
+    try:
+        with db.connection() as conn:
+            cohorts = analytics.label_distribution(conn, population, domain, dialect=db.DIALECT, **report)
+    except analytics.InvalidReport as e:
+        return jsonify({"status": "invalid", "error": str(e)}), 400
+    return jsonify({"status": "success", "cohorts": cohorts})
+
+
+@app.get("/analytics/referrals")
+def cohort_referrals():
+    """Level 1 referral rate per domain and cohort (?population=)."""
+    _, error = _authorize()
+    if error:
+        return error
+    population = request.args.get("population")
+    if not population:
+        return jsonify({"status": "invalid", "error": "population is required"}), 400
+
+    try:
+        with db.connection() as conn:
+            cohorts = analytics.referral_rates(conn, population, dialect=db.DIALECT, **_report_args())
+    except analytics.InvalidReport as e:
+        return jsonify({"status": "invalid", "error": str(e)}), 400
+    return jsonify({"status": "success", "cohorts": cohorts})
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,552 @@
+import os
+import json
+import math
+import base64
+import time
+import uuid
+import queue
+import atexit
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:     # Windows: a single dev-server process, the thread lock is enough
+    fcntl = None
+
+import analytics
+import db
+from scoring import LEVEL1, inference
+from metrics import ASSESSMENT_ROWS, ASSESSMENT_FLUSH_SECONDS, ASSESSMENT_FLUSH_ROWS, REGISTRY
+
+# ==============================================================================
+# ASSESSMENT PERSISTENCE (write-behind, batched executemany, local spool)
+# ==============================================================================
+#
+# Every scored respondent of an authenticated /score request becomes one
+# `assessments` row plus one `assessment_items` row per answer. The request only
+# appends to an in-memory queue; a writer thread drains it and inserts with
+# executemany (one multi-row INSERT per table) once BATCH_ROWS assessments are
+# waiting or FLUSH_MS after the first one arrived.
+#
+# When the database is unavailable the batch is appended to a local spool file
+# (JSON lines, fsynced) instead, and replayed once a later flush succeeds. Ids are
+# generated here (uuid4), so a batch written twice - replay after a crash between
+# INSERT and truncating the spool - is recognised and skipped.
+# A request finding the queue full (DB slow and MAX_QUEUED waiting) spools too.
+#
+# Under gunicorn every worker has its own writer but they share SPOOL_PATH, so
+# appends and the rename before a replay hold an flock on <spool>.lock, and only
+# the worker holding <spool>.replay.lock replays (the others skip that round).
+
+BATCH_ROWS = int(os.environ.get("MINDGAUGE_ASSESSMENT_BATCH_ROWS", "500"))
+FLUSH_MS = int(os.environ.get("MINDGAUGE_ASSESSMENT_FLUSH_MS", "200"))
+MAX_QUEUED = 50_000
+SPOOL_PATH = os.environ.get(
+    "MINDGAUGE_ASSESSMENT_SPOOL",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "spool", "assessments.jsonl"),
+)
+RETRY_SECONDS = 5.0
+
+# Index choices (see history(), trends() and summary() below):
+#   idx_assessments_user_taken         keyset pages of a user's history, covering the listed columns
+#   idx_assessments_user_domain_taken  the same per domain, and the Level 1 rows trends() joins to items
+#   assessment_summaries               one row per (user, population, domain), upserted with every
+#                                      insert, so dashboards read O(domains) rows per user
+
+SCHEMA = {
+    "mysql": [
+        """
+        CREATE TABLE IF NOT EXISTS assessments (
+            id CHAR(32) NOT NULL PRIMARY KEY,
+            user_id INT NOT NULL,
+            population VARCHAR(16) NOT NULL,
+            domain VARCHAR(64) NOT NULL,
+            taken_at DATETIME(3) NOT NULL,
+            model_version INT NULL,
+            label VARCHAR(64) NOT NULL,
+            probability DOUBLE NULL,
+            decided_by VARCHAR(8) NULL,
+            referrals VARCHAR(512) NULL,
+            KEY idx_assessments_user_taken (user_id, taken_at, id, population, domain, label, probability),
+            KEY idx_assessments_user_domain_taken (user_id, population, domain, taken_at, id, label, probability)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS assessment_items (
+            assessment_id CHAR(32) NOT NULL,
+            item_index SMALLINT NOT NULL,
+            score SMALLINT NULL,
+            PRIMARY KEY (assessment_id, item_index)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS assessment_summaries (
+            user_id INT NOT NULL,
+            population VARCHAR(16) NOT NULL,
+            domain VARCHAR(64) NOT NULL,
+            taken_at DATETIME(3) NOT NULL,
+            latest_score DOUBLE NULL,
+            latest_label VARCHAR(64) NULL,
+            referrals VARCHAR(512) NULL,
+            rolling_mean DOUBLE NULL,
+            samples INT NOT NULL,
+            PRIMARY KEY (user_id, population, domain)
+        )
+        """,
+    ],
+    # Stand-in for benchmarks and local runs
+    "sqlite": [
+        """
+        CREATE TABLE IF NOT EXISTS assessments (
+            id TEXT NOT NULL PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            population TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            taken_at TEXT NOT NULL,
+            model_version INTEGER NULL,
+            label TEXT NOT NULL,
+            probability REAL NULL,
+            decided_by TEXT NULL,
+            referrals TEXT NULL
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_assessments_user_taken
+            ON assessments (user_id, taken_at, id, population, domain, label, probability)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_assessments_user_domain_taken
+            ON assessments (user_id, population, domain, taken_at, id, label, probability)
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS assessment_items (
+            assessment_id TEXT NOT NULL,
+            item_index INTEGER NOT NULL,
+            score INTEGER NULL,
+            PRIMARY KEY (assessment_id, item_index)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS assessment_summaries (
+            user_id INTEGER NOT NULL,
+            population TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            taken_at TEXT NOT NULL,
+            latest_score REAL NULL,
+            latest_label TEXT NULL,
+            referrals TEXT NULL,
+            rolling_mean REAL NULL,
+            samples INTEGER NOT NULL,
+            PRIMARY KEY (user_id, population, domain)
+        )
+        """,
+    ],
+}
+
+ASSESSMENT_COLUMNS = (
+    "id", "user_id", "population", "domain", "taken_at", "model_version",
+    "label", "probability", "decided_by", "referrals",
+)
+ITEM_COLUMNS = ("assessment_id", "item_index", "score")
+SUMMARY_COLUMNS = ("user_id", "population", "domain", "taken_at", "latest_score", "latest_label", "referrals")
+
+# rolling_mean is an exponential moving average over about the last ROLLING_SPAN assessments
+ROLLING_SPAN = 5
+ROLLING_ALPHA = 2 / (ROLLING_SPAN + 1)
+
+# Later assessments win latest_*; a replayed older one still counts towards the mean.
+# new(x) is the incoming row's value. MySQL applies the assignments left to right,
+# so taken_at has to come last.
+_SUMMARY_UPDATES = [
+    ("rolling_mean", "COALESCE(rolling_mean + {alpha} * (new(latest_score) - rolling_mean), new(latest_score), rolling_mean)"),
+    ("samples", "samples + 1"),
+    ("latest_score", "CASE WHEN new(taken_at) >= taken_at THEN new(latest_score) ELSE latest_score END"),
+    ("latest_label", "CASE WHEN new(taken_at) >= taken_at THEN new(latest_label) ELSE latest_label END"),
+    ("referrals", "CASE WHEN new(taken_at) >= taken_at THEN new(referrals) ELSE referrals END"),
+    ("taken_at", "CASE WHEN new(taken_at) >= taken_at THEN new(taken_at) ELSE taken_at END"),
+]
+
+
+def _sql(statement, dialect):
+    return statement if dialect == "mysql" else statement.replace("%s", "?")
+
+
+def insert_statement(table, columns, dialect):
+    verb = "INSERT IGNORE" if dialect == "mysql" else "INSERT OR IGNORE"
+    return _sql(f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})", dialect)
+
+
+def summary_upsert_statement(dialect):
+    columns = SUMMARY_COLUMNS + ("rolling_mean", "samples")
+    values = ", ".join(["%s"] * len(SUMMARY_COLUMNS)) + ", %s, 1"
+    if dialect == "mysql":
+        conflict, incoming = "ON DUPLICATE KEY UPDATE", r"VALUES(\1)"
+    else:
+        conflict, incoming = "ON CONFLICT (user_id, population, domain) DO UPDATE SET", r"excluded.\1"
+    updates = ", ".join(
+        f"{column} = " + re.sub(r"new\((\w+)\)", incoming, expression.format(alpha=ROLLING_ALPHA))
+        for column, expression in _SUMMARY_UPDATES
+    )
+    return _sql(f"INSERT INTO assessment_summaries ({', '.join(columns)}) VALUES ({values}) {conflict} {updates}", dialect)
+
+
+def assessment_records(user_id, population, domain, rows, result, taken_at=None):
+    """One record per scored respondent of a scoring.score() result (unscorable rows are skipped)."""
+    taken_at = (taken_at or datetime.now(timezone.utc)).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    decided_by = result.get("decided_by")
+    referrals = result.get("referrals")
+    records = []
+    for i, (row, label, probabilities) in enumerate(zip(rows, result["labels"], result["probabilities"])):
+        if label is None:
+            continue
+        records.append({
+            "id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "population": population,
+            "domain": domain,
+            "taken_at": taken_at,
+            "model_version": result.get("model_version"),
+            "label": label,
+            "probability": max(probabilities) if probabilities else None,
+            "decided_by": decided_by[i] if decided_by else None,
+            "referrals": ",".join(referrals[i]) if referrals is not None else None,
+            "items": [None if score is None or math.isnan(score) else int(round(score)) for score in row],
+        })
+    return records
+
+
+def summary_rows(record):
+    """
+    assessment_summaries rows one assessment updates: its domain (score = raw total of
+    the answered items) or, for Level 1, the 'level1' row (label + referrals) and one
+    row per Level 1 domain score.
+    """
+    key = (record["user_id"], record["population"])
+    answered = [score for score in record["items"] if score is not None]
+    if record["domain"] != LEVEL1:
+        return [key + (record["domain"], record["taken_at"], sum(answered), record["label"], None, sum(answered))]
+
+    rows = [key + (LEVEL1, record["taken_at"], None, record["label"], record["referrals"], None)]
+    for feature, score in zip(inference.LEVEL1_FEATURES[record["population"]], record["items"]):
+        rows.append(key + (feature, record["taken_at"], score, None, None, score))
+    return rows
+
+
+@contextmanager
+def _file_lock(path, blocking=True):
+    """Exclusive flock on `path` across processes; yields False when it is taken and blocking is False."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if fcntl is None:
+        yield True
+        return
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class AssessmentWriter:
+
+    def __init__(self, connect, dialect="mysql", batch_rows=BATCH_ROWS, flush_ms=FLUSH_MS,
+                 spool_path=SPOOL_PATH, max_queued=MAX_QUEUED):
+        """connect() is a context manager yielding a DB-API connection (db.connection)."""
+        self.connect = connect
+        self.dialect = dialect
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_ms / 1000
+        self.spool_path = spool_path
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._spool_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._retry_at = 0.0
+        self._insert_assessments = insert_statement("assessments", ASSESSMENT_COLUMNS, dialect)
+        self._insert_items = insert_statement("assessment_items", ITEM_COLUMNS, dialect)
+        self._upsert_summaries = summary_upsert_statement(dialect)
+        self._increment_rollups = analytics.increment_statements(dialect)
+
+    # --- Request side ---
+
+    def submit(self, records):
+        """Queues assessment records for writing; never touches the database."""
+        if not records:
+            return
+        self._ensure_started()
+        for record in records:
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                self.spool([record])
+
+    def queued(self):
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="assessment-writer", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+
+    # --- Writer thread ---
+
+    def _next_batch(self, timeout=None):
+        """Blocks for the first record, then collects until batch_rows or flush_seconds after it."""
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                self._step()
+            except Exception as e:      # e.g. the spool's disk is full: the writer must outlive it
+                print(f"Assessment writer error ({e}); retrying in {RETRY_SECONDS:.0f}s")
+                self._retry_at = time.monotonic() + RETRY_SECONDS
+
+    def _step(self):
+        batch = self._next_batch(timeout=RETRY_SECONDS if self.has_spool() else None)
+        if batch and time.monotonic() < self._retry_at:
+            # Database recently failed: do not hold every request's batch for a connect timeout
+            self.spool(batch)
+            return
+        if batch and not self.flush(batch):
+            return
+        if self.has_spool() and time.monotonic() >= self._retry_at:
+            self.replay()
+
+    def flush(self, batch):
+        """Writes a batch; spools it and returns False when the database is unavailable."""
+        start = time.perf_counter()
+        try:
+            self.write(batch)
+        except Exception as e:
+            print(f"Assessment write failed ({e}); spooling {len(batch)} rows to {self.spool_path}")
+            self._retry_at = time.monotonic() + RETRY_SECONDS
+            self.spool(batch)
+            return False
+        ASSESSMENT_FLUSH_SECONDS.observe(time.perf_counter() - start)
+        ASSESSMENT_FLUSH_ROWS.observe(len(batch))
+        ASSESSMENT_ROWS.inc("written", amount=len(batch))
+        return True
+
+    def write(self, batch, replayed=False):
+        """
+        Inserts a batch and folds it into assessment_summaries and the cohort rollups
+        (analytics.py), in one transaction. The tables are created at startup (db.ensure_schema).
+        Replayed batches may already be (partly) stored; those rows are skipped so
+        summaries and rollups count every assessment once.
+        """
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            if replayed:
+                cursor.execute(
+                    _sql(f"SELECT id FROM assessments WHERE id IN ({', '.join(['%s'] * len(batch))})", self.dialect),
+                    [r["id"] for r in batch],
+                )
+                stored = {row[0] for row in cursor.fetchall()}
+                batch = [r for r in batch if r["id"] not in stored]
+                if not batch:
+                    return
+            cursor.executemany(self._insert_assessments, [tuple(r[c] for c in ASSESSMENT_COLUMNS) for r in batch])
+            cursor.executemany(
+                self._insert_items,
+                [(r["id"], i, score) for r in batch for i, score in enumerate(r["items"])],
+            )
+            cursor.executemany(self._upsert_summaries, [row for r in batch for row in summary_rows(r)])
+            analytics.update_rollups(cursor, batch, self.dialect, self._increment_rollups)
+            conn.commit()
+
+    # --- Spool ---
+
+    def has_spool(self):
+        return os.path.exists(self.spool_path) or os.path.exists(self.spool_path + ".replaying")
+
+    def spool(self, records):
+        with self._spool_lock, _file_lock(self.spool_path + ".lock"), open(self.spool_path, "a") as f:
+            f.write("".join(json.dumps(r) + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+        ASSESSMENT_ROWS.inc("spooled", amount=len(records))
+
+    def replay(self):
+        """
+        Writes spooled records in batches. The spool is first renamed aside, so records
+        spooled meanwhile go to a fresh file; the renamed file is removed once written.
+        Returns without replaying while another process is at it.
+        """
+        replaying = self.spool_path + ".replaying"
+        with _file_lock(self.spool_path + ".replay.lock", blocking=False) as locked:
+            if not locked:
+                return
+            with self._spool_lock, _file_lock(self.spool_path + ".lock"):
+                if not os.path.exists(replaying):
+                    if not os.path.exists(self.spool_path):
+                        return
+                    os.replace(self.spool_path, replaying)
+
+            with open(replaying) as f:
+                # A torn last line (crash mid-append) is skipped
+                records = []
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+            try:
+                for i in range(0, len(records), self.batch_rows):
+                    self.write(records[i:i + self.batch_rows], replayed=True)
+            except Exception as e:
+                print(f"Assessment spool replay failed ({e}); retrying in {RETRY_SECONDS:.0f}s")
+                self._retry_at = time.monotonic() + RETRY_SECONDS
+                return
+            os.remove(replaying)
+        ASSESSMENT_ROWS.inc("replayed", amount=len(records))
+
+    def close(self):
+        """Writes (or spools) whatever is still queued; registered with atexit."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for i in range(0, len(batch), self.batch_rows):
+            self.flush(batch[i:i + self.batch_rows])
+
+
+# ==============================================================================
+# HISTORY, TRENDS AND DASHBOARD SUMMARY (read side)
+# ==============================================================================
+#
+# Pages are keyset-paginated on (taken_at, id), newest first: `cursor` is the
+# opaque next_cursor of the previous page, so every page is one index range scan
+# however deep it is (OFFSET would walk and discard all earlier rows).
+
+HISTORY_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    """A pagination cursor that was not produced by this API."""
+
+
+def _timestamp(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3] if isinstance(value, datetime) else value
+
+
+def encode_cursor(taken_at, assessment_id):
+    return base64.urlsafe_b64encode(f"{_timestamp(taken_at)}|{assessment_id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        taken_at, assessment_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+    return taken_at, assessment_id
+
+
+def _page(conn, dialect, select, where, params, cursor, limit):
+    if cursor:
+        taken_at, assessment_id = decode_cursor(cursor)
+        # The leading `taken_at <=` bound is what lets the planner seek instead of scanning the user's range
+        where += " AND a.taken_at <= %s AND (a.taken_at < %s OR a.id < %s)"
+        params += [taken_at, taken_at, assessment_id]
+    statement = f"{select} WHERE {where} ORDER BY a.taken_at DESC, a.id DESC LIMIT %s"
+    db_cursor = conn.cursor()
+    db_cursor.execute(_sql(statement, dialect), params + [limit + 1])
+    rows = db_cursor.fetchall()
+    next_cursor = encode_cursor(rows[limit - 1][0], rows[limit - 1][1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def history(conn, user_id, population=None, domain=None, cursor=None, limit=HISTORY_PAGE_SIZE, dialect="mysql"):
+    """A page of a user's assessments, newest first: (items, next_cursor). Index-only scan."""
+    where, params = "a.user_id = %s", [user_id]
+    if domain is not None:
+        where += " AND a.population = %s AND a.domain = %s"
+        params += [population, domain]
+    select = "SELECT a.taken_at, a.id, a.population, a.domain, a.label, a.probability FROM assessments a"
+    rows, next_cursor = _page(conn, dialect, select, where, params, cursor, limit)
+    return [
+        {"id": id_, "taken_at": _timestamp(taken_at), "population": pop, "domain": dom, "label": label,
+         "probability": probability}
+        for taken_at, id_, pop, dom, label, probability in rows
+    ], next_cursor
+
+
+def trends(conn, user_id, population, cursor=None, limit=HISTORY_PAGE_SIZE, dialect="mysql"):
+    """
+    A page of a user's Level 1 assessments with every domain score, newest first:
+    (points, next_cursor), each point {"taken_at", "label", "scores": {domain: score}}.
+    """
+    where, params = "a.user_id = %s AND a.population = %s AND a.domain = %s", [user_id, population, LEVEL1]
+    select = "SELECT a.taken_at, a.id, a.label FROM assessments a"
+    rows, next_cursor = _page(conn, dialect, select, where, params, cursor, limit)
+    if not rows:
+        return [], None
+
+    db_cursor = conn.cursor()
+    db_cursor.execute(
+        _sql(f"SELECT assessment_id, item_index, score FROM assessment_items "
+             f"WHERE assessment_id IN ({', '.join(['%s'] * len(rows))})", dialect),
+        [row[1] for row in rows],
+    )
+    features = inference.LEVEL1_FEATURES[population]
+    scores = {}
+    for assessment_id, item_index, score in db_cursor.fetchall():
+        scores.setdefault(assessment_id, {})[features[item_index]] = score
+    return [
+        {"taken_at": _timestamp(taken_at), "label": label, "scores": scores.get(id_, {})}
+        for taken_at, id_, label in rows
+    ], next_cursor
+
+
+def summary(conn, user_id, population=None, dialect="mysql"):
+    """Dashboard view: the user's assessment_summaries rows, keyed by population then domain."""
+    statement = ("SELECT population, domain, taken_at, latest_score, latest_label, referrals, rolling_mean, samples "
+                 "FROM assessment_summaries WHERE user_id = %s")
+    params = [user_id]
+    if population is not None:
+        statement += " AND population = %s"
+        params.append(population)
+    db_cursor = conn.cursor()
+    db_cursor.execute(_sql(statement, dialect), params)
+    result = {}
+    for pop, dom, taken_at, score, label, referrals, mean, samples in db_cursor.fetchall():
+        result.setdefault(pop, {})[dom] = {
+            "taken_at": _timestamp(taken_at),
+            "latest_score": score,
+            "latest_label": label,
+            "referrals": referrals.split(",") if referrals else ([] if dom == LEVEL1 else None),
+            "rolling_mean": None if mean is None else round(mean, 4),
+            "assessments": samples,
+        }
+    return result
+
+
+WRITER = AssessmentWriter(db.connection, dialect=db.DIALECT)
+
+REGISTRY.gauge("mindgauge_assessment_write_queue", "Assessment records waiting for the writer thread.", WRITER.queued)
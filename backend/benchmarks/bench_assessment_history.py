@@ -0,0 +1,233 @@
+import os
+import sys
+import time
+import uuid
+import sqlite3
+import argparse
+import contextlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+os.environ["MINDGAUGE_RELEASE_POLL_SECONDS"] = "0"
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, '..'))
+
+import analytics
+import assessments
+import db
+from assessments import SCHEMA, LEVEL1, inference
+
+# ==============================================================================
+# ASSESSMENT HISTORY: keyset vs OFFSET pages, summary rows vs GROUP BY, writes
+# ==============================================================================
+#
+# SQLite stand-in for the assessments database. --assessments rows are seeded for
+# --users users with a Zipf-like skew (the heaviest user has tens of thousands of
+# assessments), spread over all populations/domains. Level 1 rows get a random
+# referral set; item rows are only seeded for the heaviest user's Level 1
+# assessments (what trends() reads). Users get a random age and one of
+# --locations places (cohort reports, bench_cohort_analytics.py). Tables are filled
+# without indexes and indexed afterwards; assessment_summaries is derived from the
+# seeded rows in one pass (rolling_mean as a plain mean: only its read cost matters
+# here). The database is kept at --db and reused by later runs.
+#
+# Measured:
+#   history pages     keyset cursor vs LIMIT/OFFSET at increasing depth (heaviest user)
+#   dashboard         summary() vs the latest-per-domain GROUP BY it replaces
+#   trends            one page of Level 1 points with their domain scores
+#   writes            AssessmentWriter.write() throughput incl. summary and rollup upserts
+
+
+def seed(path, n_assessments, n_users, n_locations=50, chunk=200_000):
+    rng = np.random.default_rng(43)
+    keys = sorted(inference.DOMAINS) + [(population, LEVEL1) for population in inference.LEVEL1_FEATURES]
+    keys = [(population, domain) for population, domain in keys if domain != "level1_diagnosis"]
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    for statement in SCHEMA["sqlite"]:
+        if "CREATE TABLE" in statement:
+            conn.execute(statement)
+    conn.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, age INTEGER, location TEXT)")
+    conn.executemany(
+        "INSERT INTO users VALUES (?, ?, ?)",
+        zip(range(1, n_users + 1), rng.integers(6, 90, n_users).tolist(),
+            (f"Town {i}" for i in rng.zipf(1.5, n_users) % n_locations)),
+    )
+
+    start, t0 = time.perf_counter(), datetime(2024, 1, 1)
+    heaviest_level1 = []
+    for offset in range(0, n_assessments, chunk):
+        n = min(chunk, n_assessments - offset)
+        users = np.minimum(rng.zipf(1.3, n), n_users)
+        key = rng.integers(0, len(keys), n)
+        seconds = rng.integers(0, 2 * 365 * 86400, n)
+        labels = rng.integers(0, 4, n)
+        referred = rng.random((n, max(map(len, inference.LEVEL1_FEATURES.values())))) < 0.15
+        rows = []
+        for i in range(n):
+            population, domain = keys[key[i]]
+            assessment_id = f"{offset + i:032x}"
+            taken_at = (t0 + timedelta(seconds=int(seconds[i]))).strftime("%Y-%m-%d %H:%M:%S.000")
+            referrals = None
+            if domain == LEVEL1:
+                features = inference.LEVEL1_FEATURES[population]
+                referrals = ",".join(f for f, r in zip(features, referred[i]) if r)
+            rows.append((assessment_id, int(users[i]), population, domain, taken_at, None,
+                         f"label-{labels[i]}", float(labels[i]) / 4, "model", referrals))
+            if users[i] == 1 and domain == LEVEL1:
+                heaviest_level1.append((assessment_id, population))
+        conn.executemany("INSERT INTO assessments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+        print(f"  seeded {offset + n:>11,d} assessments ({time.perf_counter() - start:.0f}s)", flush=True)
+
+    conn.executemany(
+        "INSERT INTO assessment_items VALUES (?, ?, ?)",
+        ((assessment_id, i, int(rng.integers(0, 5)))
+         for assessment_id, population in heaviest_level1
+         for i in range(len(inference.LEVEL1_FEATURES[population]))),
+    )
+    for statement in SCHEMA["sqlite"]:
+        if "CREATE INDEX" in statement:
+            conn.execute(statement)
+    conn.execute("""
+        INSERT INTO assessment_summaries
+        SELECT user_id, population, domain, taken_at, probability, label, referrals, mean, samples FROM (
+            SELECT *, AVG(probability) OVER w AS mean, COUNT(*) OVER w AS samples,
+                   ROW_NUMBER() OVER (PARTITION BY user_id, population, domain ORDER BY taken_at DESC, id DESC) AS rn
+            FROM assessments WINDOW w AS (PARTITION BY user_id, population, domain)
+        ) WHERE rn = 1
+    """)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    print(f"  indexed and summarised ({time.perf_counter() - start:.0f}s)")
+
+
+def median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def offset_page(conn, user_id, offset, limit):
+    return conn.execute(
+        "SELECT a.taken_at, a.id, a.population, a.domain, a.label, a.probability FROM assessments a "
+        "WHERE a.user_id = ? ORDER BY a.taken_at DESC, a.id DESC LIMIT ? OFFSET ?",
+        (user_id, limit, offset),
+    ).fetchall()
+
+
+def grouped_dashboard(conn, user_id):
+    """What a dashboard would run without assessment_summaries."""
+    return conn.execute(
+        "SELECT a.population, a.domain, a.taken_at, a.label, s.mean, s.samples FROM assessments a "
+        "JOIN (SELECT population, domain, MAX(taken_at) AS latest, AVG(probability) AS mean, COUNT(*) AS samples "
+        "      FROM assessments WHERE user_id = ? GROUP BY population, domain) s "
+        "  ON a.population = s.population AND a.domain = s.domain AND a.taken_at = s.latest "
+        "WHERE a.user_id = ?",
+        (user_id, user_id),
+    ).fetchall()
+
+
+def new_records(n, n_users, seed=7):
+    """Assessment records as assessment_records() makes them, for write benchmarks."""
+    rng = np.random.default_rng(seed)
+    keys = [(population, LEVEL1) for population in inference.LEVEL1_FEATURES]
+    keys += [key for key in sorted(inference.DOMAINS) if key[1] != "level1_diagnosis"]
+    records = []
+    for i in range(n):
+        population, domain = keys[i % len(keys)]
+        n_items = len(inference.LEVEL1_FEATURES[population]) if domain == LEVEL1 else 8
+        records.append({
+            "id": uuid.uuid4().hex, "user_id": int(rng.integers(1, n_users)),
+            "population": population, "domain": domain, "taken_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "model_version": None, "label": "label-0", "probability": 0.9, "decided_by": "model",
+            "referrals": "Anger_Score" if domain == LEVEL1 else None,
+            "items": rng.integers(0, 5, n_items).tolist(),
+        })
+    return records
+
+
+def keyset_cursor_at(conn, user_id, offset):
+    """The cursor a client paging through from the start would hold at `offset`."""
+    row = offset_page(conn, user_id, offset - 1, 1)[0]
+    return assessments.encode_cursor(row[0], row[1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Assessment history reads and writes on an SQLite stand-in.")
+    parser.add_argument("--db", default=os.path.join(current_dir, "assessments-bench.sqlite"))
+    parser.add_argument("--assessments", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--locations", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--writes", type=int, default=20_000, help="records written through AssessmentWriter")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Seeding {args.db} with {args.assessments:,d} assessments for {args.users:,d} users")
+        seed(args.db, args.assessments, args.users, args.locations)
+
+    conn = sqlite3.connect(args.db)
+    total, = conn.execute("SELECT COUNT(*) FROM assessments").fetchone()
+    counts = dict(conn.execute(
+        "SELECT user_id, COUNT(*) FROM assessments WHERE user_id IN (1, 2, 10, 1000) GROUP BY user_id"
+    ).fetchall())
+    heaviest = counts[1]
+
+    print("=" * 72)
+    print(f"{total:,d} assessments; user 1 has {heaviest:,d}, user 1000 has {counts.get(1000, 0):,d}")
+    print("-" * 72)
+    print(f"{'history page at':>20s}{'keyset':>14s}{'OFFSET':>14s}")
+    for depth in (0, 1_000, 10_000, heaviest - args.page_size):
+        if depth < 0 or depth >= heaviest:
+            continue
+        cursor = keyset_cursor_at(conn, 1, depth) if depth else None
+        keyset = median_ms(
+            lambda: assessments.history(conn, 1, cursor=cursor, limit=args.page_size, dialect="sqlite"), args.repeat
+        )
+        offset = median_ms(lambda: offset_page(conn, 1, depth, args.page_size), args.repeat)
+        print(f"{depth:>20,d}{keyset:12.3f}ms{offset:12.3f}ms")
+
+    print("-" * 72)
+    print(f"{'dashboard, user':>20s}{'summaries':>14s}{'GROUP BY':>14s}")
+    for user_id in (1, 10, 1000):
+        summarised = median_ms(lambda: assessments.summary(conn, user_id, dialect="sqlite"), args.repeat)
+        grouped = median_ms(lambda: grouped_dashboard(conn, user_id), args.repeat)
+        print(f"{user_id:>20d}{summarised:12.3f}ms{grouped:12.3f}ms")
+
+    print("-" * 72)
+    population = conn.execute(
+        "SELECT population FROM assessments WHERE user_id = 1 AND domain = ? LIMIT 1", (LEVEL1,)
+    ).fetchone()[0]
+    trend = median_ms(
+        lambda: assessments.trends(conn, 1, population, limit=args.page_size, dialect="sqlite"), args.repeat
+    )
+    print(f"trends page (user 1, {population}): {trend:.3f}ms")
+    conn.close()
+
+    @contextlib.contextmanager
+    def connect():
+        c = sqlite3.connect(args.db)
+        try:
+            yield c
+        finally:
+            c.close()
+
+    db.ensure_schema(assessments.SCHEMA, analytics.SCHEMA, connect=connect, dialect="sqlite")
+    writer = assessments.AssessmentWriter(connect, dialect="sqlite", spool_path=args.db + ".spool")
+    records = new_records(args.writes, args.users)
+    start = time.perf_counter()
+    for i in range(0, len(records), writer.batch_rows):
+        writer.write(records[i:i + writer.batch_rows])
+    seconds = time.perf_counter() - start
+    print(f"writes: {len(records):,d} records in batches of {writer.batch_rows} -> "
+          f"{len(records) / seconds:,.0f} records/s (assessments + items + summary and rollup upserts)")
+    print("=" * 72)
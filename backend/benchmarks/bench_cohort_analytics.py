@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import contextlib
+from datetime import date, timedelta
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, '..'))
+
+import analytics
+import assessments
+from assessments import LEVEL1, inference
+from bench_assessment_history import seed, median_ms, new_records
+
+# ==============================================================================
+# COHORT REPORTS: rollup tables vs scanning raw assessments
+# ==============================================================================
+#
+# Uses (or seeds) the same SQLite stand-in as bench_assessment_history.py, builds
+# the rollups once with analytics.rebuild(), then times (and cross-checks) the two dashboard reports
+# from the rollups and as the GROUP BY over assessments JOIN users they replace,
+# and the write path with and without rollup maintenance.
+
+RAW_AGE_BAND = "CASE " + " ".join(
+    f"WHEN u.age BETWEEN {low} AND {high if high is not None else 1000} THEN '{band}'"
+    for low, high, band in analytics.AGE_BANDS
+) + f" ELSE '{analytics.UNKNOWN}' END"
+
+
+def raw_label_distribution(conn, population, domain, start, end):
+    return conn.execute(
+        f"SELECT {RAW_AGE_BAND} AS band, u.location, a.label, COUNT(*) FROM assessments a "
+        f"LEFT JOIN users u ON u.id = a.user_id "
+        f"WHERE a.population = ? AND a.domain = ? AND a.taken_at >= ? AND a.taken_at < date(?, '+1 day') "
+        f"GROUP BY band, u.location, a.label",
+        (population, domain, start, end),
+    ).fetchall()
+
+
+def raw_referral_rates(conn, population, start, end):
+    referred = ", ".join(
+        f"SUM(instr(',' || a.referrals || ',', ',{feature},') > 0)" for feature in inference.LEVEL1_FEATURES[population]
+    )
+    return conn.execute(
+        f"SELECT u.location, COUNT(*), {referred} FROM assessments a LEFT JOIN users u ON u.id = a.user_id "
+        f"WHERE a.population = ? AND a.domain = ? AND a.taken_at >= ? AND a.taken_at < date(?, '+1 day') "
+        f"GROUP BY u.location",
+        (population, LEVEL1, start, end),
+    ).fetchall()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cohort reports from rollups vs raw assessment scans.")
+    parser.add_argument("--db", default=os.path.join(current_dir, "assessments-bench.sqlite"))
+    parser.add_argument("--assessments", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--locations", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--writes", type=int, default=20_000)
+    parser.add_argument("--end", default="2025-12-31", help="last day of the reports (the seed covers 2024-2025)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Seeding {args.db} with {args.assessments:,d} assessments for {args.users:,d} users")
+        seed(args.db, args.assessments, args.users, args.locations)
+
+    conn = sqlite3.connect(args.db)
+    for statement in analytics.SCHEMA["sqlite"]:
+        conn.execute(statement)
+    # Rows seeded (not written through AssessmentWriter) are not in the rollups yet
+    total, = conn.execute("SELECT COUNT(*) FROM assessments").fetchone()
+    if any(conn.execute(f"SELECT COALESCE(SUM(assessments), 0) FROM cohort_rollups{suffix}").fetchone()[0] != total
+           for suffix in analytics.GRAINS.values()):
+        start = time.perf_counter()
+        counted, rollup_rows, referral_rows = analytics.rebuild(conn, "sqlite")
+        print(f"rebuild: {counted:,d} assessments -> {rollup_rows:,d} rollup rows, {referral_rows:,d} referral rows "
+              f"in {time.perf_counter() - start:.0f}s")
+
+    population, domain = "adult", "depression"
+    print("=" * 72)
+    print(f"{'report':>40s}{'rollups':>14s}{'raw scan':>14s}")
+    print("-" * 72)
+    for days in (7, 90, 365):
+        end = args.end
+        start = (date.fromisoformat(end) - timedelta(days=days - 1)).isoformat()
+        rolled = median_ms(lambda: analytics.label_distribution(
+            conn, population, domain, start, end, by=("age_band", "location"), dialect="sqlite"), args.repeat)
+        raw = median_ms(lambda: raw_label_distribution(conn, population, domain, start, end), args.repeat)
+        assert sum(c["total"] for c in analytics.label_distribution(
+            conn, population, domain, start, end, by=("age_band", "location"), dialect="sqlite"
+        )) == sum(row[-1] for row in raw_label_distribution(conn, population, domain, start, end))
+        print(f"{f'{domain} labels by band x location, {days}d':>40s}{rolled:12.3f}ms{raw:12.3f}ms")
+        rolled = median_ms(lambda: analytics.referral_rates(
+            conn, population, start, end, by=("location",), dialect="sqlite"), args.repeat)
+        raw = median_ms(lambda: raw_referral_rates(conn, population, start, end), args.repeat)
+        print(f"{f'referral rates by location, {days}d':>40s}{rolled:12.3f}ms{raw:12.3f}ms")
+    conn.close()
+
+    @contextlib.contextmanager
+    def connect():
+        c = sqlite3.connect(args.db)
+        try:
+            yield c
+        finally:
+            c.close()
+
+    print("-" * 72)
+    update_rollups = analytics.update_rollups
+    for maintained in (False, True):
+        analytics.update_rollups = update_rollups if maintained else (lambda *a, **k: None)
+        writer = assessments.AssessmentWriter(connect, dialect="sqlite", spool_path=args.db + ".spool")
+        records = new_records(args.writes, args.users, seed=11 + maintained)
+        start = time.perf_counter()
+        for i in range(0, len(records), writer.batch_rows):
+            writer.write(records[i:i + writer.batch_rows])
+        rate = len(records) / (time.perf_counter() - start)
+        print(f"writes, rollups {'maintained' if maintained else 'skipped':>10s}: {rate:,.0f} records/s")
+    analytics.update_rollups = update_rollups
+    print("=" * 72)
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import argparse
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, '..'))
+
+from metrics import Registry
+
+# ==============================================================================
+# METRIC RECORDING OVERHEAD (per event, single thread and contended)
+# ==============================================================================
+
+
+def per_event_ns(fn, events):
+    start = time.perf_counter()
+    fn(events)
+    return (time.perf_counter() - start) / events * 1e9
+
+
+def loop_overhead(events):
+    for _ in range(events):
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the cost of recording one metric event.")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    registry = Registry()
+    histogram = registry.histogram("bench_latency_seconds", "bench", ("population", "domain"))
+    counter = registry.counter("bench_lookups_total", "bench", ("cache", "result"))
+
+    def observe(events):
+        for _ in range(events):
+            histogram.observe(0.0042, "adult", "sleep")
+
+    def inc(events):
+        for _ in range(events):
+            counter.inc("model", "hit")
+
+    def timer(events):
+        for _ in range(events):
+            with histogram.time("adult", "sleep"):
+                pass
+
+    base = per_event_ns(loop_overhead, args.events)
+    results = {
+        "Histogram.observe": per_event_ns(observe, args.events) - base,
+        "Counter.inc": per_event_ns(inc, args.events) - base,
+        "Histogram.time (incl. 2 perf_counter calls)": per_event_ns(timer, args.events) - base,
+    }
+
+    # Contended: every thread records into the same metric and label set
+    per_thread = args.events // args.threads
+    threads = [threading.Thread(target=observe, args=(per_thread,)) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    contended = (time.perf_counter() - start) / (per_thread * args.threads) * 1e9 - base
+
+    scrape_start = time.perf_counter()
+    text = registry.render()
+    scrape_ms = (time.perf_counter() - scrape_start) * 1000
+    recorded = [line for line in text.splitlines() if line.startswith("bench_latency_seconds_count")]
+
+    print("=" * 60)
+    for name, ns in results.items():
+        print(f"{name:45s} {ns:7.0f} ns/event")
+    print(f"{'Histogram.observe, ' + str(args.threads) + ' threads':45s} {contended:7.0f} ns/event")
+    print("-" * 60)
+    print(f"scrape: {scrape_ms:.2f} ms  -> {recorded[0]}")
+    print("=" * 60)
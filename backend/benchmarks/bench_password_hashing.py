@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, '..'))
+
+import passwords
+
+# ==============================================================================
+# LOGIN PASSWORD CHECKS: logins/s per core, and behaviour past saturation
+# ==============================================================================
+#
+# 1. Sequential scrypt verifies on one thread give the cost of one login (and so
+#    logins/s per core); the same on the LoginHasher pool adds its hand-off cost.
+# 2. Logins arrive open loop at --overload x the measured capacity for --seconds,
+#    each on its own client thread (like a threaded server's request threads).
+#    With admission control (MAX_PENDING) excess logins are refused at once and
+#    accepted ones keep a bounded latency; with an unbounded queue every login
+#    waits behind the backlog until they start to time out. "failed" counts both.
+
+
+def sequential(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def overload(hasher, stored, rate, seconds):
+    latencies, failed = [], [0]
+    lock = threading.Lock()
+
+    def login():
+        start = time.perf_counter()
+        try:
+            hasher.verify(stored, "correct horse")
+        except passwords.Overloaded:
+            with lock:
+                failed[0] += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    requests = int(rate * seconds)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=requests) as clients:
+        next_at = time.perf_counter()
+        for _ in range(requests):
+            clients.submit(login)
+            next_at += 1 / rate
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+    # Until the last login finished: a backlog is still being worked off after arrivals stop
+    return requests, np.array(latencies) * 1000, failed[0], time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Password check throughput and overload behaviour.")
+    parser.add_argument("--verifies", type=int, default=50)
+    parser.add_argument("--overload", type=float, default=2.0, help="offered load as a multiple of capacity")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    stored = passwords.hash_password("correct horse")
+    cores = len(os.sched_getaffinity(0))
+    inline = sequential(lambda: passwords.verify(stored, "correct horse"), args.verifies)
+    pooled = sequential(lambda: passwords.LOGIN.verify(stored, "correct horse"), args.verifies)
+    capacity = passwords.LOGIN.workers / inline
+
+    print("=" * 72)
+    print(f"scrypt n={passwords.SCRYPT_N} r={passwords.SCRYPT_R}; {cores} core(s), "
+          f"{passwords.LOGIN.workers} pool worker(s), MAX_PENDING {passwords.MAX_PENDING}")
+    print(f"  verify on the request thread: {inline * 1000:7.1f} ms  -> {1 / inline:6.1f} logins/s per core")
+    print(f"  verify via the login pool:    {pooled * 1000:7.1f} ms")
+    print("-" * 72)
+    print(f"{'queue':>12s}{'offered/s':>11s}{'accepted/s':>12s}{'failed':>9s}{'p50':>11s}{'p99':>11s}{'max':>11s}")
+    for name, max_pending in (("bounded", passwords.MAX_PENDING), ("unbounded", 1_000_000)):
+        hasher = passwords.LoginHasher(max_pending=max_pending)
+        rate = capacity * args.overload
+        requests, latencies, failed, elapsed = overload(hasher, stored, rate, args.seconds)
+        accepted = len(latencies) / elapsed
+        p50, p99, worst = np.percentile(latencies, [50, 99, 100]) if len(latencies) else (0, 0, 0)
+        print(f"{name:>12s}{rate:11.1f}{accepted:12.1f}{failed / requests:8.0%}"
+              f"{p50:9.0f}ms{p99:9.0f}ms{worst:9.0f}ms")
+    print("=" * 72)
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import subprocess
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, '..'))
+
+import profiles
+
+# ==============================================================================
+# PROFILE LOOKUPS: per-request query vs profiles.ProfileCache (local / shared)
+# ==============================================================================
+#
+# Replays a skewed stream of profile lookups (a few active users make most of
+# the scoring requests, as with a clinic's daily sessions) against an SQLite
+# users table, with a fraction of requests updating a profile (invalidate). The
+# per-request query is an in-process SQLite lookup, so its cost is a floor: a
+# MySQL round trip plus pool checkout costs more. The shared variant starts a
+# cache process (profiles.py) on a Unix socket.
+
+
+def users_db(path, n):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, age INTEGER, location TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                     [(i, f"User {i}", 8 + i % 60, f"Town {i % 50}") for i in range(1, n + 1)])
+    conn.commit()
+    return conn
+
+
+def workload(n_requests, n_users, skew, seed=5):
+    rng = random.Random(seed)
+    return [min(n_users, int(rng.paretovariate(skew))) for _ in range(n_requests)]
+
+
+def replay(cache, stream, load, update_rate, seed=9):
+    """(us per lookup, database reads per lookup)"""
+    rng = random.Random(seed)
+    reads = [0]
+
+    def counted(user_id):
+        reads[0] += 1
+        return load(user_id)
+
+    start = time.perf_counter()
+    for user_id in stream:
+        if rng.random() < update_rate:
+            cache.invalidate(user_id)
+        cache.get(user_id, counted)
+    return (time.perf_counter() - start) / len(stream) * 1e6, reads[0] / len(stream)
+
+
+class NoCache:
+
+    def get(self, user_id, load):
+        return load(user_id)
+
+    def invalidate(self, *user_ids):
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Profile lookups with and without profiles.ProfileCache.")
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--skew", type=float, default=0.6, help="Pareto shape of user activity (smaller = flatter)")
+    parser.add_argument("--update-rate", type=float, default=0.001, help="share of requests that update a profile")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="mindgauge-profiles-") as directory:
+        conn = users_db(os.path.join(directory, "users.sqlite"), args.users)
+
+        def load(user_id):
+            row = conn.execute("SELECT id, name, age, location FROM users WHERE id = ?", (user_id,)).fetchone()
+            return dict(zip(("id", "name", "age", "location"), row)) if row else None
+
+        stream = workload(args.requests, args.users, args.skew)
+        socket = os.path.join(directory, "profiles.sock")
+        authkey = os.urandom(16).hex()
+        server = subprocess.Popen([sys.executable, os.path.join(current_dir, "..", "profiles.py"), "--address", socket],
+                                  env=dict(os.environ, MINDGAUGE_PROFILE_CACHE_AUTHKEY=authkey),
+                                  stdout=subprocess.DEVNULL)
+        while not os.path.exists(socket):
+            time.sleep(0.05)
+        try:
+            variants = [
+                ("query per request", NoCache()),
+                ("local cache", profiles.ProfileCache()),
+                ("local + shared process", profiles.ProfileCache(shared=profiles.SharedProfiles(socket, authkey.encode()))),
+            ]
+            print("=" * 72)
+            print(f"{args.requests:,d} lookups over {len(set(stream)):,d} distinct of {args.users:,d} users, "
+                  f"{args.update_rate:.1%} updates")
+            print(f"{'':>28s}{'us/lookup':>14s}{'db reads/lookup':>18s}")
+            print("-" * 72)
+            for name, cache in variants:
+                micros, reads = replay(cache, stream, load, args.update_rate)
+                print(f"{name:>28s}{micros:14.2f}{reads:18.4f}")
+            # Shared process, second worker: its local cache is cold, the shared one is warm
+            second = profiles.ProfileCache(shared=profiles.SharedProfiles(socket, authkey.encode()))
+            micros, reads = replay(second, stream, load, args.update_rate, seed=10)
+            print(f"{'second worker (shared warm)':>28s}{micros:14.2f}{reads:18.4f}")
+            print("=" * 72)
+        finally:
+            server.terminate()
+            server.wait()
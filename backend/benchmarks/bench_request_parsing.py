@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+import numpy as np
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, '..'))
+
+import schemas
+import scoring
+from scoring import LEVEL1, inference
+
+# ==============================================================================
+# /score SERIALIZATION: request.json + list rows + jsonify vs schemas.py
+# ==============================================================================
+#
+# Per request size, times the two serialization steps of /score, median of
+# --repeat runs, and the scoring itself for scale:
+#   parse   body bytes -> validated fields + the float matrix scoring needs.
+#           Before, this was stdlib json.loads, data.get, then to_score_matrix
+#           over the row lists. Now it is schemas.SCORE.decode.
+#   encode  the scoring.score() result -> response, via Flask's default
+#           provider or schemas.FastJSONProvider.
+# Rows are Level 1 ratings (0-4) for the children population. With --nulls,
+# Level 2 rows of one domain are used instead, with some unanswered items.
+
+
+def median_us(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2] * 1e6
+
+
+def request_body(domain, n_rows, n_items, nulls, seed=3):
+    rng = random.Random(seed)
+    rows = [[None if nulls and rng.random() < 0.1 else rng.randint(0, 4) for _ in range(n_items)]
+            for _ in range(n_rows)]
+    return json.dumps({"population": "children", "domain": domain, "scores": rows, "explain": False}).encode()
+
+
+def stdlib_parse(body, n_items):
+    data = json.loads(body)
+    population, domain, rows = data.get("population"), data.get("domain"), data.get("scores")
+    _ = data.get("explain", False), data.get("user_id")     # read like /score did, not used here
+    if not population or not domain or not isinstance(rows, list) or not rows:
+        raise ValueError("population, domain and scores are required")
+    return inference.to_score_matrix(rows, n_items)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Request parsing and response encoding cost of /score.")
+    parser.add_argument("--rows", default="1,100,10000")
+    parser.add_argument("--repeat", type=int, default=21)
+    parser.add_argument("--nulls", action="store_true", help="Level 2 rows with unanswered items")
+    args = parser.parse_args()
+
+    population = "children"
+    domain = "depression" if args.nulls else LEVEL1
+    n_items = len(inference.load_domain_model(population, domain)["item_names"]) if args.nulls \
+        else len(inference.LEVEL1_FEATURES[population])
+    app = Flask(__name__)
+    stdlib_provider, fast_provider = DefaultJSONProvider(app), schemas.FastJSONProvider(app)
+
+    print("=" * 72)
+    print(f"{population}/{domain}, {n_items} items per row; msgspec: {schemas.msgspec is not None}, "
+          f"orjson: {schemas.orjson is not None}")
+    print(f"{'rows':>7s}{'':>9s}{'stdlib us':>13s}{'schemas us':>13s}{'speedup':>10s}{'score() us':>14s}")
+    print("-" * 72)
+    for n_rows in [int(n) for n in args.rows.split(",")]:
+        body = request_body(domain, n_rows, n_items, args.nulls)
+        repeat = max(3, args.repeat if n_rows < 10_000 else args.repeat // 4)
+        matrix = schemas.SCORE.decode(body).scores
+        assert np.array_equal(matrix, stdlib_parse(body, n_items), equal_nan=True)
+        result = scoring.score(population, domain, matrix)
+        result["status"] = "success"
+        scored = median_us(lambda: scoring.score(population, domain, matrix), repeat)
+
+        before = median_us(lambda: stdlib_parse(body, n_items), repeat)
+        after = median_us(lambda: schemas.SCORE.decode(body), repeat)
+        print(f"{n_rows:7d}{'parse':>9s}{before:13.1f}{after:13.1f}{before / after:9.1f}x{scored:14.1f}")
+        before = median_us(lambda: stdlib_provider.response(result), repeat)
+        after = median_us(lambda: fast_provider.response(result), repeat)
+        print(f"{'':7s}{'encode':>9s}{before:13.1f}{after:13.1f}{before / after:9.1f}x")
+    print("=" * 72)
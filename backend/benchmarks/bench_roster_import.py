@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, '..'))
+
+import passwords
+import roster
+
+# ==============================================================================
+# ROSTER IMPORT: chunked executemany vs one INSERT + commit per user (/register)
+# ==============================================================================
+#
+# SQLite stand-in for the users table (unique email), in a temporary file with
+# the default durable journal, so every commit is a real fsync. The roster has a
+# few percent of rows that are invalid, repeat an earlier email or already exist.
+# Rows carry no password by default (roster invites); --hashed-rows of them get
+# one, and scrypt throughput is reported separately, since at ~50 ms per hash and
+# core it - not the database - bounds imports that ship passwords.
+
+USERS_TABLE = """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL,
+        age INTEGER NULL,
+        location TEXT NULL
+    )
+"""
+
+
+def roster_rows(n, hashed_rows):
+    rows = []
+    for i in range(n):
+        row = {"name": f"Student {i}", "email": f"student{i}@district.example", "age": 6 + i % 12,
+               "location": f"School {i % 40}"}
+        if i % 50 == 7:
+            row["email"] = "not-an-email"
+        if i % 50 == 13:
+            row["email"] = f"student{i - 1}@district.example"
+        if i < hashed_rows:
+            row["password"] = f"initial-{i}"
+        rows.append(row)
+    return rows
+
+
+def fresh_db(directory, name, existing=0):
+    path = os.path.join(directory, name)
+    conn = sqlite3.connect(path)
+    conn.execute(USERS_TABLE)
+    conn.executemany(
+        "INSERT INTO users (name, email, password) VALUES (?, ?, ?)",
+        [(f"Existing {i}", f"student{i * 97}@district.example", passwords.UNUSABLE) for i in range(existing)],
+    )
+    conn.commit()
+    return conn
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk roster import throughput on an SQLite stand-in.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--existing", type=int, default=500, help="roster emails already registered")
+    parser.add_argument("--hashed-rows", type=int, default=0, help="rows that carry a password")
+    parser.add_argument("--per-row", type=int, default=2_000, help="rows inserted one commit at a time")
+    parser.add_argument("--hashes", type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="mindgauge-roster-") as directory:
+        rows = roster_rows(args.rows, args.hashed_rows)
+        conn = fresh_db(directory, "bulk.sqlite", args.existing)
+        start = time.perf_counter()
+        results = roster.import_users(conn, rows, dialect="sqlite")
+        bulk = time.perf_counter() - start
+        conn.close()
+
+        conn = fresh_db(directory, "per-row.sqlite")
+        start = time.perf_counter()
+        for row in rows[:args.per_row]:
+            user, error = roster.validate(row)
+            if error:
+                continue
+            try:
+                conn.execute("INSERT INTO users (name, email, password, age, location) VALUES (?, ?, ?, ?, ?)",
+                             (user["name"], user["email"], passwords.UNUSABLE, user["age"], user["location"]))
+                conn.commit()
+            except sqlite3.IntegrityError:
+                pass
+        per_row = (time.perf_counter() - start) / args.per_row
+        conn.close()
+
+    start = time.perf_counter()
+    passwords.hash_many([f"password-{i}" for i in range(args.hashes)])
+    hash_rate = args.hashes / (time.perf_counter() - start)
+
+    print("=" * 72)
+    print(f"roster of {args.rows:,d} rows ({args.hashed_rows:,d} with a password): {roster.counts(results)}")
+    print(f"  chunked import ({roster.CHUNK_ROWS} rows/commit): {bulk:8.2f}s  ({args.rows / bulk:,.0f} rows/s)")
+    print(f"  one commit per row (/register):  {per_row * args.rows:8.2f}s  "
+          f"({1 / per_row:,.0f} rows/s, extrapolated from {args.per_row:,d})")
+    print(f"  scrypt (n={passwords.SCRYPT_N}, r={passwords.SCRYPT_R}) on {passwords.HASH_WORKERS} workers: "
+          f"{hash_rate:,.1f} hashes/s")
+    print("=" * 72)
@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+# The benchmark drives the watcher itself
+os.environ["MINDGAUGE_RELEASE_POLL_SECONDS"] = "0"
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, '..'))
+
+import scoring
+import shadow
+from inference import config, releases
+from inference.forest import export_forest
+
+# ==============================================================================
+# SHADOW SCORING: foreground latency with and without a candidate in shadow
+# ==============================================================================
+#
+# Works on a copy of the models dir: the domain is adopted as v1 and a candidate v2
+# is published from the same booster cut to its first --candidate-iterations
+# rounds, so the two releases genuinely disagree. Requests arrive at a fixed rate
+# (open loop, like a server that is not saturated) and scoring.score() latency is
+# measured with shadowing off and on, alternating over several rounds. Then the
+# shadow summary (agreement, deltas, both releases' CPU time per batch) is printed.
+
+
+def paced_ms(fn, requests, rate):
+    """Latency of each call when calls are issued every 1/rate seconds."""
+    timings = []
+    next_at = time.perf_counter()
+    for _ in range(requests):
+        next_at += 1 / rate
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+        pause = next_at - time.perf_counter()
+        if pause > 0:
+            time.sleep(pause)
+    return timings
+
+
+def with_candidate(models_dir, population, domain, iterations):
+    import joblib
+
+    model_dir = os.path.join(models_dir, f"{population}_model")
+    releases.adopt(model_dir, domain)
+    staging = releases.stage(model_dir, domain)
+    for name in os.listdir(releases.version_dir(model_dir, domain, 1)):
+        shutil.copy2(os.path.join(releases.version_dir(model_dir, domain, 1), name), staging)
+    model_path = os.path.join(staging, f"{domain}_lgbm_model.pkl")
+    booster = joblib.load(model_path)
+    export_forest(model_path, booster=booster, num_iteration=iterations)
+    releases.publish(model_dir, domain, staging, 2, candidate=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Foreground latency with shadow scoring on and off.")
+    parser.add_argument("--population", default="children")
+    parser.add_argument("--domain", default="sleep")
+    parser.add_argument("--requests", type=int, default=2000, help="per round and mode")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--rate", type=float, default=500, help="requests per second")
+    parser.add_argument("--candidate-iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    models_dir = tempfile.mkdtemp(prefix="mindgauge-shadow-")
+    try:
+        shutil.copytree(config.MODELS_DIR, models_dir, dirs_exist_ok=True)
+        config.MODELS_DIR = models_dir
+        with_candidate(models_dir, args.population, args.domain, args.candidate_iterations)
+
+        import inference
+        loaded = inference.load_domain_model(args.population, args.domain)
+        inference.refresh_models()
+        assert inference.candidate_release(args.population, args.domain) == 2
+
+        rng = np.random.default_rng(5)
+        n_items = len(loaded["item_names"])
+        print("=" * 72)
+        print(f"{args.population}/{args.domain}: v{loaded['release']} served, v2 in shadow, "
+              f"{args.rate:.0f} req/s, {args.rounds} x {args.requests} requests per mode")
+        print(f"{'batch':>8s}{'shadow':>10s}{'p50':>12s}{'p99':>12s}{'queued':>12s}{'dropped':>10s}")
+        print("-" * 72)
+        for batch in (1, 100):
+            rows = rng.integers(0, 5, size=(batch, n_items)).tolist()
+            timings = {False: [], True: []}
+            queued = dropped = 0
+            for _ in range(args.rounds):
+                for enabled in (False, True):
+                    shadow.ENABLED = enabled
+                    before = scoring.SHADOW.submitted, scoring.SHADOW.dropped
+                    timings[enabled] += paced_ms(
+                        lambda: scoring.score(args.population, args.domain, rows), args.requests, args.rate
+                    )
+                    scoring.SHADOW.drain()
+                    queued += scoring.SHADOW.submitted - before[0]
+                    dropped += scoring.SHADOW.dropped - before[1]
+            for enabled in (False, True):
+                p50, p99 = np.percentile(timings[enabled], [50, 99])
+                counts = f"{queued:12d}{dropped:10d}" if enabled else ""
+                print(f"{batch:8d}{'on' if enabled else 'off':>10s}{p50:10.3f}ms{p99:10.3f}ms{counts}")
+        print("=" * 72)
+
+        for name, stats in scoring.SHADOW.summary().items():
+            print(f"{name}: {stats}")
+    finally:
+        shutil.rmtree(models_dir, ignore_errors=True)
@@ -0,0 +1,76 @@
+import os
+import sys
+import hmac
+import json
+import time
+import base64
+import sqlite3
+import hashlib
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, '..'))
+
+os.environ.setdefault("MINDGAUGE_TOKEN_KEYS", "bench:" + base64.b64encode(os.urandom(32)).decode())
+import tokens
+
+# ==============================================================================
+# TOKEN VERIFICATION COST PER REQUEST
+# ==============================================================================
+#
+# What identifying the caller of a request costs:
+#   repeat token     tokens.bearer() on a header whose token was verified before
+#   new token        tokens.bearer() on a token seen for the first time (keyed HMAC copied)
+#   uncached keys    the same checks, but decoding the header and keying HMAC per token
+#                    (what a general-purpose JWT library does)
+#   DB lookup        the per-request read tokens replace: SELECT by primary key on an
+#                    SQLite users table (in process, so a floor for a MySQL round trip)
+
+
+def per_call_us(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def uncached_verify(token, secret):
+    header, payload, signature = token.encode().split(b".")
+    kid = json.loads(tokens._b64decode(header))["kid"]
+    assert kid == "bench"
+    expected = hmac.new(secret, header + b"." + payload, hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, tokens._b64decode(signature)):
+        raise tokens.InvalidToken("Bad signature")
+    claims = json.loads(tokens._b64decode(payload))
+    if claims["typ"] != "access" or claims["exp"] < time.time():
+        raise tokens.InvalidToken("Expired")
+    return claims
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Per-request cost of verifying an access token.")
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=200_000)
+    args = parser.parse_args()
+
+    secret = os.environ["MINDGAUGE_TOKEN_KEYS"].partition(":")[2].encode()
+    issued = tokens.issue(123456, 15)
+    header = "Bearer " + issued["accessToken"]
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER, location TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?, ?)",
+                     ((i, f"User {i}", f"user{i}@example.org", 20 + i % 50, "Town") for i in range(args.users)))
+    lookup = lambda: conn.execute("SELECT id, age FROM users WHERE id = ?", (123456,)).fetchone()
+
+    print("=" * 72)
+    print(f"access token: {len(issued['accessToken'])} bytes, claims {tokens.verify(issued['accessToken'])}")
+    print(f"  issue (access + refresh):   {per_call_us(lambda: tokens.issue(123456, 15), args.calls // 4):8.2f} us")
+    print(f"  verify, repeat token:       {per_call_us(lambda: tokens.bearer(header), args.calls):8.2f} us")
+    fresh = ["Bearer " + tokens.issue(i, 30)["accessToken"] for i in range(args.calls // 4)]
+    fresh_tokens = iter(fresh)
+    print(f"  verify, new token:          {per_call_us(lambda: tokens.bearer(next(fresh_tokens)), len(fresh)):8.2f} us")
+    print(f"  verify, uncached keys:      "
+          f"{per_call_us(lambda: uncached_verify(issued['accessToken'], secret), args.calls):8.2f} us")
+    print(f"  SQLite primary-key lookup:  {per_call_us(lookup, args.calls):8.2f} us")
+    print("=" * 72)
@@ -0,0 +1,331 @@
+import os
+import sys
+import json
+import time
+import random
+import socket
+import sqlite3
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import importlib.util
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.join(current_dir, '..')
+sys.path.append(backend_dir)
+
+# Server and harness must agree on the signing key; set before tokens is imported
+os.environ.setdefault("MINDGAUGE_TOKEN_KEYS", f"load:{os.urandom(24).hex()}")
+
+import passwords
+import tokens
+from assessments import LEVEL1
+from scoring import inference
+
+# ==============================================================================
+# LOAD TEST: the API under gunicorn against an SQLite stand-in
+# ==============================================================================
+#
+# Boots app:app under gunicorn (gthread workers) with MINDGAUGE_DB_SQLITE_PATH
+# pointing at a fresh SQLite file (WAL) seeded with --users accounts, then, for
+# every --workers count, offers each --rates arrival rate for --duration
+# seconds. Arrivals are open-loop (Poisson, fixed seed): a request is sent at
+# its scheduled time whether or not earlier ones have returned, and latency is
+# measured from that scheduled time, so a server that falls behind shows it
+# in the percentiles instead of silently slowing the client down.
+#
+# The mix picks per request between
+#   login     POST /login for a seeded user (scrypt verify on the login pool)
+#   register  POST /register with a new email (scrypt hash + INSERT)
+#   score     POST /score with a bearer token, --score-rows Level 1 rows
+#             (assessments are written behind the response by the writer thread)
+#
+# A rate "holds" if errors (non-2xx, timeouts, refused connections) stay within
+# --max-error-rate and p99 within --p99-ms; the saturation point of a worker
+# count is the highest rate that held. Ramping stops at the first rate that
+# does not.
+#
+# Client and server share this machine's cores: compare results between runs on
+# the same host, and keep an eye on "client lag", the worst delay between a
+# scheduled arrival and its send (a saturated client, not server).
+#
+#   python load_test.py --workers 1,2,4 --rates 10,25,50,100 --mix login=0.05,register=0.01,score=0.94
+
+USERS_TABLE = """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL,
+        age INTEGER NULL,
+        location TEXT NULL
+    )
+"""
+PASSWORD = "load-test-password"
+KINDS = ("login", "register", "score")
+TIMEOUT_SECONDS = 10.0
+READY_SECONDS = 60.0
+KEEP_ALIVE_SECONDS = 75     # above the client's longest idle gap; gunicorn's default (2s) drops idle connections mid-test
+
+
+def parse_mix(spec):
+    mix = {}
+    for entry in spec.split(","):
+        kind, _, weight = entry.partition("=")
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"mix entries must be one of {', '.join(KINDS)}")
+        mix[kind] = float(weight)
+    total = sum(mix.values())
+    return {kind: weight / total for kind, weight in mix.items()}
+
+
+def parse_ints(spec):
+    return [int(value) for value in spec.split(",")]
+
+
+def prepare_db(path, n_users):
+    """Users with ages 8-67, all sharing one scrypt hash (hashing each would take minutes)."""
+    hashed = passwords.hash_password(PASSWORD)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(USERS_TABLE)
+    conn.executemany(
+        "INSERT INTO users (id, name, email, password, age, location) VALUES (?, ?, ?, ?, ?, ?)",
+        [(i, f"Load {i}", f"load{i}@example.test", hashed, 8 + i % 60, f"Town {i % 50}") for i in range(1, n_users + 1)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, workers, threads, env):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app:app", "--bind", f"127.0.0.1:{port}", "--workers", str(workers),
+         "--worker-class", "gthread", "--threads", str(threads), "--keep-alive", str(KEEP_ALIVE_SECONDS),
+         "--log-level", "warning"],
+        cwd=backend_dir, env=env,
+    )
+    deadline = time.monotonic() + READY_SECONDS
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"gunicorn exited with {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/metrics")
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    sys.exit(f"gunicorn did not answer on port {port} within {READY_SECONDS:.0f}s")
+
+
+class Traffic:
+    """Builds the requests of the mix; shared by the client threads."""
+
+    def __init__(self, mix, n_users, score_rows, seed):
+        self.kinds, self.weights = zip(*mix.items())
+        self.n_users = n_users
+        self.score_rows = score_rows
+        self.rng = random.Random(seed)
+        self.registered = 0
+        self.tokens = {}
+
+    def _bearer(self, user_id):
+        if user_id not in self.tokens:
+            self.tokens[user_id] = tokens.issue(user_id, 8 + user_id % 60)["accessToken"]
+        return {"Authorization": f"Bearer {self.tokens[user_id]}"}
+
+    def next(self):
+        """(kind, path, body, headers)"""
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        user_id = self.rng.randint(1, self.n_users)
+        if kind == "login":
+            return kind, "/login", {"email": f"load{user_id}@example.test", "password": PASSWORD}, {}
+        if kind == "register":
+            self.registered += 1
+            return kind, "/register", {
+                "name": "Load new", "email": f"new{self.registered}-{self.rng.random()}@example.test",
+                "password": PASSWORD, "age": 30, "location": "Town 0",
+            }, {}
+        population = tokens.population_for_age(8 + user_id % 60)
+        n_items = len(inference.LEVEL1_FEATURES[population])
+        rows = [[self.rng.randint(0, 4) for _ in range(n_items)] for _ in range(self.score_rows)]
+        return kind, "/score", {"domain": LEVEL1, "scores": rows}, self._bearer(user_id)
+
+
+class Client:
+    """One keep-alive connection per client thread."""
+
+    def __init__(self, port):
+        self.port = port
+        self._local = threading.local()
+
+    def post(self, path, body, headers):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=TIMEOUT_SECONDS)
+        try:
+            conn.request("POST", path, json.dumps(body), {"Content-Type": "application/json", **headers})
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            return None
+
+
+def offer(client, traffic, rate, duration, clients, seed):
+    """
+    Sends Poisson arrivals at `rate`/s for `duration`s and waits for the answers:
+    [(kind, status, latency)], worst client lag, seconds until the last answer.
+    """
+    rng = random.Random(seed)
+    results = []
+    lag = [0.0]
+
+    def send(scheduled, kind, path, body, headers):
+        lag[0] = max(lag[0], time.perf_counter() - scheduled)
+        status = client.post(path, body, headers)
+        results.append((kind, status, time.perf_counter() - scheduled))
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        start = time.perf_counter()
+        at = start
+        while True:
+            at += rng.expovariate(rate)
+            if at - start >= duration:
+                break
+            request = traffic.next()
+            delay = at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, at, *request)
+    return results, lag[0], time.perf_counter() - start
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else float("nan")
+
+
+def summarize(results, elapsed):
+    by_kind = defaultdict(list)
+    for kind, status, latency in results:
+        by_kind[kind].append((status, latency))
+    by_kind["all"] = [(status, latency) for _, status, latency in results]
+    summary = {}
+    for kind, samples in by_kind.items():
+        latencies = sorted(latency for _, latency in samples)
+        errors = sum(1 for status, _ in samples if status is None or not 200 <= status < 300)
+        summary[kind] = {
+            "requests": len(samples), "error_rate": errors / len(samples) if samples else 0.0,
+            "overloaded": sum(1 for status, _ in samples if status == 503),
+            "p50_ms": percentile(latencies, 0.50) * 1000, "p90_ms": percentile(latencies, 0.90) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000, "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+        }
+    summary["all"]["throughput"] = sum(1 for status, _ in by_kind["all"] if status and 200 <= status < 300) / elapsed
+    return summary
+
+
+def holds(summary, args):
+    # Latency counts from the scheduled arrival, so a server that cannot keep
+    # up fails the p99 bound as its backlog grows
+    overall = summary["all"]
+    return overall["error_rate"] <= args.max_error_rate and overall["p99_ms"] <= args.p99_ms
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Open-loop load test of the API under gunicorn on an SQLite stand-in.")
+    parser.add_argument("--workers", type=parse_ints, default=[1, 2], help="gunicorn worker counts, e.g. 1,2,4")
+    parser.add_argument("--threads", type=int, default=8, help="gthread threads per worker")
+    parser.add_argument("--rates", type=parse_ints, default=[10, 25, 50, 100, 200], help="arrival rates (req/s)")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per rate")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds at the first rate before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("login=0.05,register=0.01,score=0.94"))
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--score-rows", type=int, default=1)
+    parser.add_argument("--clients", type=int, default=256, help="client threads (max requests in flight)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--p99-ms", type=float, default=500.0)
+    parser.add_argument("--shared-profile-cache", action="store_true", help="run profiles.py for the workers")
+    parser.add_argument("--json", help="also write all results to this file")
+    args = parser.parse_args()
+
+    if importlib.util.find_spec("gunicorn") is None:
+        sys.exit("The load test runs the app under gunicorn: pip install gunicorn")
+
+    report = []
+    with tempfile.TemporaryDirectory(prefix="mindgauge-load-") as directory:
+        env = dict(os.environ, MINDGAUGE_ASSESSMENT_SPOOL=os.path.join(directory, "spool.jsonl"))
+        cache_process = None
+        if args.shared_profile_cache:
+            env["MINDGAUGE_PROFILE_CACHE_ADDRESS"] = os.path.join(directory, "profiles.sock")
+            env["MINDGAUGE_PROFILE_CACHE_AUTHKEY"] = os.urandom(16).hex()
+            cache_process = subprocess.Popen(
+                [sys.executable, "profiles.py", "--address", env["MINDGAUGE_PROFILE_CACHE_ADDRESS"]],
+                cwd=backend_dir, env=env, stdout=subprocess.DEVNULL,
+            )
+
+        print("=" * 72)
+        print(f"mix {', '.join(f'{kind} {weight:.0%}' for kind, weight in args.mix.items())}; "
+              f"{args.score_rows} row(s) per score; {args.duration:.0f}s per rate; {os.cpu_count()} cores")
+        try:
+            for workers in args.workers:
+                # A fresh database per worker count, so registrations and assessments do not pile up across runs
+                env["MINDGAUGE_DB_SQLITE_PATH"] = os.path.join(directory, f"load-{workers}.sqlite")
+                prepare_db(env["MINDGAUGE_DB_SQLITE_PATH"], args.users)
+                port = free_port()
+                server = start_server(port, workers, args.threads, env)
+                client = Client(port)
+                traffic = Traffic(args.mix, args.users, args.score_rows, seed=workers)
+                saturation = None
+                try:
+                    if args.warmup:
+                        offer(client, traffic, args.rates[0], args.warmup, args.clients, seed=0)
+                    print("-" * 72)
+                    print(f"{workers} worker(s) x {args.threads} threads")
+                    print(f"{'rate':>6s}{'done/s':>8s}{'errors':>8s}{'503s':>6s}{'p50 ms':>9s}{'p90 ms':>9s}"
+                          f"{'p99 ms':>9s}{'max ms':>9s}{'lag ms':>8s}")
+                    for rate in args.rates:
+                        results, lag, elapsed = offer(client, traffic, rate, args.duration, args.clients, seed=rate)
+                        summary = summarize(results, elapsed)
+                        ok = holds(summary, args)
+                        overall = summary["all"]
+                        print(f"{rate:6d}{overall['throughput']:8.1f}{overall['error_rate']:8.1%}"
+                              f"{overall['overloaded']:6d}{overall['p50_ms']:9.1f}{overall['p90_ms']:9.1f}"
+                              f"{overall['p99_ms']:9.1f}{overall['max_ms']:9.1f}{lag * 1000:8.1f}"
+                              f"{'' if ok else '  <- does not hold'}")
+                        for kind in KINDS:
+                            if kind in summary:
+                                s = summary[kind]
+                                print(f"{kind:>14s}{s['requests']:8d}{s['error_rate']:8.1%}{s['overloaded']:6d}"
+                                      f"{s['p50_ms']:9.1f}{s['p90_ms']:9.1f}{s['p99_ms']:9.1f}{s['max_ms']:9.1f}")
+                        report.append({"workers": workers, "threads": args.threads, "rate": rate, "holds": ok,
+                                       "client_lag_ms": lag * 1000, "endpoints": summary})
+                        if not ok:
+                            break
+                        saturation = rate
+                finally:
+                    server.terminate()
+                    server.wait()
+                print(f"saturation point, {workers} worker(s): "
+                      f"{f'{saturation} req/s' if saturation else f'below {args.rates[0]} req/s'}")
+        finally:
+            if cache_process:
+                cache_process.terminate()
+                cache_process.wait()
+        print("=" * 72)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k != "json"}, "results": report}, f, indent=2)
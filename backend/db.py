@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import pooling
+
+from metrics import DB_POOL_WAIT, REGISTRY
+
+# ==============================================================================
+# DATABASE CONNECTION POOL
+# ==============================================================================
+#
+# One shared connection + cursor is not safe once requests run concurrently, so
+# every request borrows a pooled connection. mysql.connector's pool raises
+# immediately when it is exhausted; the semaphore in front of it turns that into
+# a bounded wait, which is what the pool wait histogram measures.
+#
+# MINDGAUGE_DB_SQLITE_PATH swaps MySQL for an SQLite file (load tests, local
+# runs without a server; see benchmarks/load_test.py). Callers keep writing
+# MySQL-style %s placeholders and dictionary cursors; DIALECT tells the modules
+# that build dialect-specific SQL (assessments, analytics, roster) which to use.
+
+DB_CONFIG = {
+    "host": os.environ.get("MINDGAUGE_DB_HOST", "localhost"),
+    "user": os.environ.get("MINDGAUGE_DB_USER", "root"),
+    "password": os.environ.get("MINDGAUGE_DB_PASSWORD", "9744997775"),
+    "database": os.environ.get("MINDGAUGE_DB_NAME", "mindgauge_db"),
+}
+POOL_SIZE = int(os.environ.get("MINDGAUGE_DB_POOL_SIZE", "8"))
+POOL_TIMEOUT_SECONDS = 5.0
+SQLITE_PATH = os.environ.get("MINDGAUGE_DB_SQLITE_PATH")
+DIALECT = "sqlite" if SQLITE_PATH else "mysql"
+
+IntegrityError = (mysql.connector.IntegrityError, sqlite3.IntegrityError)
+
+
+class PoolTimeout(Exception):
+    """No pooled connection became free within POOL_TIMEOUT_SECONDS."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(POOL_SIZE)
+_in_use = [0]
+_in_use_lock = threading.Lock()
+
+
+class _SQLiteCursor:
+    """The part of the mysql.connector cursor API the backend uses."""
+
+    def __init__(self, cursor, dictionary):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def execute(self, statement, params=()):
+        self._cursor.execute(statement.replace("%s", "?"), params)
+
+    def executemany(self, statement, rows):
+        self._cursor.executemany(statement.replace("%s", "?"), rows)
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip((column[0] for column in self._cursor.description), row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class _SQLiteConnection:
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=POOL_TIMEOUT_SECONDS)
+
+    def cursor(self, dictionary=False):
+        return _SQLiteCursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(pool_name="mindgauge", pool_size=POOL_SIZE, **DB_CONFIG)
+    return _pool
+
+
+@contextmanager
+def connection():
+    """Borrows a pooled connection for the duration of the block."""
+    start = time.perf_counter()
+    if not _slots.acquire(timeout=POOL_TIMEOUT_SECONDS):
+        DB_POOL_WAIT.observe(time.perf_counter() - start)
+        raise PoolTimeout(f"No database connection free after {POOL_TIMEOUT_SECONDS}s.")
+    with _in_use_lock:
+        _in_use[0] += 1
+    try:
+        conn = _SQLiteConnection(SQLITE_PATH) if SQLITE_PATH else get_pool().get_connection()
+        DB_POOL_WAIT.observe(time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            conn.close()    # returns it to the pool (SQLite: closes the file)
+    finally:
+        with _in_use_lock:
+            _in_use[0] -= 1
+        _slots.release()
+
+
+def ensure_schema(*schemas, connect=connection, dialect=DIALECT):
+    """
+    Runs the CREATE ... IF NOT EXISTS statements of each schema ({dialect: [statements]},
+    e.g. assessments.SCHEMA) once at startup, so reads never find a table missing.
+    """
+    with connect() as conn:
+        cursor = conn.cursor()
+        for schema in schemas:
+            for statement in schema[dialect]:
+                cursor.execute(statement)
+        conn.commit()
+
+
+REGISTRY.gauge("mindgauge_db_pool_in_use", "Pooled DB connections currently borrowed.", lambda: _in_use[0])
+REGISTRY.gauge("mindgauge_db_pool_size", "Configured DB pool size.", lambda: POOL_SIZE)
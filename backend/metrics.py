@@ -0,0 +1,297 @@
+import threading
+import time
+from bisect import bisect_left
+
+# ==============================================================================
+# IN-PROCESS METRICS (Prometheus text format on /metrics)
+# ==============================================================================
+#
+# Recording never takes a lock: every thread writes into its own shard (a plain
+# dict of per-label-set cells) and the scrape sums the shards. Under the GIL an
+# int/float update of a cell owned by one thread is safe to read concurrently, so
+# the hot path is a dict lookup plus an add (0.3-0.9 us per event, see
+# benchmarks/bench_metrics.py).
+#
+# Shards of finished threads (the dev server spawns one per request) are folded
+# into a retired shard on the next scrape, so their counts are kept but the shard
+# list stays short.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+PROBABILITY_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0)
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = []
+        self._gauges = []
+        self._local = threading.local()
+        self._shards = []       # (thread, shard) for every thread that recorded something
+        self._retired = {}
+        self._lock = threading.Lock()   # taken on shard creation and scrape only
+
+    def shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(self, name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self, name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, callback, labelnames=()):
+        """Gauge read at scrape time; callback returns {label_values_tuple: value} (or a number)."""
+        self._gauges.append((name, help_text, labelnames, callback))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def _collect(self):
+        """Sums all shards into {cell_key: cell}; folds shards of dead threads into the retired shard."""
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    _merge_into(self._retired, shard)
+            self._shards = alive
+
+            totals = {}
+            _merge_into(totals, self._retired)
+            for _, shard in alive:
+                _merge_into(totals, dict(shard))
+        return totals
+
+    def render(self):
+        totals = self._collect()
+        lines = []
+        for metric in self._metrics:
+            cells = sorted(((key[1], cell) for key, cell in totals.items() if key[0] is metric),
+                           key=lambda item: tuple(map(str, item[0])))
+            lines.extend(metric.render(cells))
+
+        for name, help_text, labelnames, callback in self._gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            values = callback()
+            if not isinstance(values, dict):
+                values = {(): values}
+            for label_values, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(labelnames, label_values)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _merge_into(target, shard):
+    for key, cell in shard.items():
+        existing = target.get(key)
+        if existing is None:
+            target[key] = list(cell)
+        else:
+            for i, value in enumerate(cell):
+                existing[i] += value
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, label_values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(labelnames, label_values)]
+    pairs.extend(f'{n}="{v}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+
+    def __init__(self, registry, name, help_text, labelnames):
+        self.registry = registry
+        self._local = registry._local
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, *label_values, amount=1):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self.registry.shard()
+        key = (self, label_values)
+        cell = shard.get(key)
+        if cell is None:
+            shard[key] = [amount]
+        else:
+            cell[0] += amount
+
+    def render(self, cells):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, cell in cells:
+            yield f"{self.name}{_format_labels(self.labelnames, label_values)} {_format_value(cell[0])}"
+
+
+class Histogram:
+    """Cell layout: one count per bucket (last one is +Inf), then the running sum."""
+
+    def __init__(self, registry, name, help_text, labelnames, buckets):
+        self.registry = registry
+        self._local = registry._local
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self.registry.shard()
+        key = (self, label_values)
+        cell = shard.get(key)
+        if cell is None:
+            cell = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def observe_counts(self, counts, total, *label_values):
+        """Adds observations bucketed elsewhere (e.g. in a worker process): one count per bucket + +Inf."""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self.registry.shard()
+        key = (self, label_values)
+        cell = shard.get(key)
+        if cell is None:
+            cell = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, count in enumerate(counts):
+            cell[i] += count
+        cell[-1] += total
+
+    def time(self, *label_values):
+        return _Timer(self, label_values)
+
+    def render(self, cells):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        bounds = [_format_value(float(b)) for b in self.buckets] + ["+Inf"]
+        for label_values, cell in cells:
+            cumulative = 0
+            for bound, count in zip(bounds, cell[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, label_values, extra=(("le", bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(cell[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class _Timer:
+
+    __slots__ = ("histogram", "label_values", "start")
+
+    def __init__(self, histogram, label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+
+# --- Service metrics ---
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "mindgauge_http_request_duration_seconds", "HTTP request latency by endpoint.",
+    ("endpoint", "method", "status"),
+)
+SCORING_LATENCY = REGISTRY.histogram(
+    "mindgauge_scoring_duration_seconds", "Model scoring latency per request by population and domain.",
+    ("population", "domain"),
+)
+SCORING_BATCH_SIZE = REGISTRY.histogram(
+    "mindgauge_scoring_batch_rows", "Respondent rows per scoring request.",
+    ("population", "domain"), buckets=SIZE_BUCKETS,
+)
+MODEL_LOAD_SECONDS = REGISTRY.histogram(
+    "mindgauge_model_load_duration_seconds", "Time to load a model on first use.",
+    ("population", "domain"),
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "mindgauge_cache_lookups_total", "In-process cache lookups by cache and result (hit/miss).",
+    ("cache", "result"),
+)
+DB_POOL_WAIT = REGISTRY.histogram(
+    "mindgauge_db_pool_wait_seconds", "Time spent waiting for a pooled DB connection.",
+)
+RULE_PATH_ROWS = REGISTRY.counter(
+    "mindgauge_scoring_rows_total", "Scored rows by the path that decided them (rules/model).",
+    ("population", "domain", "path"),
+)
+RULE_AUDIT_ROWS = REGISTRY.counter(
+    "mindgauge_rule_audit_rows_total", "Rule answers re-scored by the model, by outcome (agree/disagree).",
+    ("population", "domain", "result"),
+)
+RULE_AUDIT_DROPPED = REGISTRY.counter(
+    "mindgauge_rule_audit_dropped_total", "Sampled audit batches dropped because the audit queue was full.",
+)
+MODEL_RELEASE_SWAPS = REGISTRY.counter(
+    "mindgauge_model_release_swaps_total", "Models swapped to a new release after their CURRENT pointer moved.",
+    ("population", "domain"),
+)
+SHADOW_ROWS = REGISTRY.counter(
+    "mindgauge_shadow_rows_total", "Rows scored by a candidate release in shadow, by agreement with the current one.",
+    ("population", "domain", "result"),
+)
+SHADOW_DROPPED = REGISTRY.counter(
+    "mindgauge_shadow_dropped_total", "Shadow batches dropped because the shadow queue was full.",
+    ("population", "domain"),
+)
+SHADOW_CPU_SECONDS = REGISTRY.histogram(
+    "mindgauge_shadow_scoring_cpu_seconds", "CPU time to score a shadowed batch, current vs. candidate release.",
+    ("population", "domain", "release"),
+)
+SHADOW_PROBABILITY_DELTA = REGISTRY.histogram(
+    "mindgauge_shadow_probability_delta", "Largest class probability change per row, candidate vs. current.",
+    ("population", "domain"), buckets=PROBABILITY_BUCKETS,
+)
+ASSESSMENT_ROWS = REGISTRY.counter(
+    "mindgauge_assessment_rows_total", "Assessment records by outcome (written/spooled/replayed).",
+    ("result",),
+)
+ASSESSMENT_FLUSH_SECONDS = REGISTRY.histogram(
+    "mindgauge_assessment_flush_duration_seconds", "Time to write one batch of assessments (executemany + commit).",
+)
+ASSESSMENT_FLUSH_ROWS = REGISTRY.histogram(
+    "mindgauge_assessment_flush_rows", "Assessments per written batch.", buckets=SIZE_BUCKETS,
+)
+PASSWORD_CHECKS = REGISTRY.counter(
+    "mindgauge_password_checks_total", "Login password checks by result (match/mismatch/rejected).",
+    ("result",),
+)
+PASSWORD_CHECK_SECONDS = REGISTRY.histogram(
+    "mindgauge_password_check_duration_seconds", "Time a login waited for its password check (queue + scrypt).",
+)
+PASSWORD_REHASHES = REGISTRY.counter(
+    "mindgauge_password_rehashes_total", "Stored passwords upgraded after a successful login, by outcome.",
+    ("result",),
+)
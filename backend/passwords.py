@@ -0,0 +1,186 @@
+import os
+import base64
+import hashlib
+import hmac
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from metrics import PASSWORD_CHECKS, PASSWORD_CHECK_SECONDS, PASSWORD_REHASHES, REGISTRY
+
+# ==============================================================================
+# PASSWORD HASHING (scrypt)
+# ==============================================================================
+#
+# Stored format: scrypt$<n>$<r>$<p>$<salt b64>$<hash b64>, so the cost can be
+# raised later without invalidating existing hashes. hashlib.scrypt releases the
+# GIL while it runs, so hash_many() spreads a batch over a thread pool and gets
+# one core per worker without the pickling cost of a process pool.
+#
+# Rows created before hashing hold the plaintext password; verify() still
+# accepts those, and a successful login upgrades them (LoginHasher.upgrade).
+# UNUSABLE marks an account that has no password yet (roster imports without
+# one) and never verifies.
+
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+PREFIX = "scrypt$"
+UNUSABLE = "!"
+HASH_WORKERS = int(os.environ.get("MINDGAUGE_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=4 * 128 * r * n, dklen=HASH_BYTES)
+
+
+def hash_password(password):
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return (f"{PREFIX}{SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$"
+            f"{base64.b64encode(salt).decode()}${base64.b64encode(digest).decode()}")
+
+
+def is_hashed(stored):
+    return stored is not None and stored.startswith(PREFIX)
+
+
+def needs_rehash(stored):
+    """Plaintext, or hashed with other parameters than the current ones."""
+    return stored != UNUSABLE and not (stored or "").startswith(f"{PREFIX}{SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+
+def verify(stored, password):
+    """True if `password` matches the stored hash (or legacy plaintext)."""
+    if not stored or stored == UNUSABLE or not isinstance(password, str):
+        return False
+    if not is_hashed(stored):
+        return hmac.compare_digest(stored.encode(), password.encode())
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        expected = base64.b64decode(digest)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def hash_many(passwords):
+    """Hashes in parallel on HASH_WORKERS threads; None (no password) gives UNUSABLE."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+    return list(_pool.map(lambda password: UNUSABLE if password is None else hash_password(password), passwords))
+
+
+# ==============================================================================
+# LOGIN HASHING (bounded pool, admission control)
+# ==============================================================================
+#
+# /login and /register never run scrypt on the request thread: the work goes to
+# one of LOGIN_WORKERS threads (separate from the import pool above, so a large
+# roster import cannot starve logins). At most MAX_PENDING hashes may be queued or
+# running; beyond that a request is refused at once with Overloaded (503 and
+# Retry-After) instead of queueing behind work that would outlast its timeout,
+# so accepted logins keep a bounded latency when offered more than the cores can
+# hash. A login for an unknown email is checked against a dummy hash, so it
+# takes as long as a wrong password.
+
+LOGIN_WORKERS = int(os.environ.get("MINDGAUGE_LOGIN_HASH_WORKERS", str(os.cpu_count() or 1)))
+MAX_PENDING = int(os.environ.get("MINDGAUGE_LOGIN_HASH_MAX_PENDING", str(4 * LOGIN_WORKERS)))
+WAIT_SECONDS = 5.0
+RETRY_AFTER_SECONDS = 1
+
+
+class Overloaded(Exception):
+    """More password hashes are pending than MAX_PENDING (or one took longer than WAIT_SECONDS)."""
+
+
+class LoginHasher:
+
+    def __init__(self, workers=LOGIN_WORKERS, max_pending=MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        self._dummy = None
+
+    def pending(self):
+        return self._pending
+
+    def _submit(self, fn, *args):
+        """Runs fn on the pool if a slot is free; None when at capacity."""
+        if not self._slots.acquire(blocking=False):
+            return None
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="login-hash")
+            self._pending += 1
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _wait(self, future):
+        if future is None:
+            PASSWORD_CHECKS.inc("rejected")
+            raise Overloaded(f"{self.max_pending} password hashes pending")
+        try:
+            return future.result(timeout=WAIT_SECONDS)
+        except TimeoutError:
+            PASSWORD_CHECKS.inc("rejected")
+            raise Overloaded(f"Password hash took longer than {WAIT_SECONDS}s") from None
+
+    def verify(self, stored, password):
+        """verify() on the pool; stored=None (no such user) is checked against a dummy hash."""
+        start = time.perf_counter()
+        if stored is None:
+            if self._dummy is None:
+                self._dummy = hash_password(os.urandom(16).hex())
+            self._wait(self._submit(verify, self._dummy, password))
+            ok = False
+        else:
+            ok = self._wait(self._submit(verify, stored, password))
+        PASSWORD_CHECK_SECONDS.observe(time.perf_counter() - start)
+        PASSWORD_CHECKS.inc("match" if ok else "mismatch")
+        return ok
+
+    def hash(self, password):
+        return self._wait(self._submit(hash_password, password))
+
+    def upgrade(self, stored, password, save):
+        """
+        After a successful verify: rehashes a plaintext or outdated hash in the
+        background and calls save(new_hash), which stores it only if the row still
+        holds `stored` (returns False otherwise). Skipped when the pool is at capacity;
+        the next login tries again.
+        """
+        if not needs_rehash(stored):
+            return
+        if self._submit(self._upgrade, password, save) is None:
+            PASSWORD_REHASHES.inc("deferred")
+
+    def _upgrade(self, password, save):
+        try:
+            PASSWORD_REHASHES.inc("upgraded" if save(hash_password(password)) else "raced")
+        except Exception as e:
+            print(f"Password rehash failed: {e}")
+            PASSWORD_REHASHES.inc("failed")
+
+
+LOGIN = LoginHasher()
+
+REGISTRY.gauge("mindgauge_password_hashes_pending", "Login/register password hashes queued or running.", LOGIN.pending)
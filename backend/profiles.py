@@ -0,0 +1,251 @@
+import os
+import sys
+import time
+import threading
+import argparse
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+
+from metrics import CACHE_LOOKUPS, REGISTRY
+
+# ==============================================================================
+# USER PROFILE CACHE (read-through, TTL, invalidated on writes)
+# ==============================================================================
+#
+# Scoring routes by age (adult vs children models) and /token/refresh reissues
+# tokens from the current age, so both need a user's profile (id, name, age,
+# location) but should not pay a MySQL round trip per request for it. CACHE.get()
+# answers from a bounded in-process LRU; a miss loads the row through the
+# caller's loader and keeps it for TTL_SECONDS. Unknown ids are cached too (as
+# None), so scans over nonexistent ids do not reach the database either.
+# Profiles are shared between requests: treat them as read-only.
+#
+# Whoever writes a profile - /register, a profile update, a roster import -
+# calls invalidate() after committing. A load that started before an
+# invalidation is not stored (the generation check), so a read that raced an
+# update cannot put the old row back.
+#
+# Several workers each hold their own LRU and only see their own invalidations.
+# With MINDGAUGE_PROFILE_CACHE_ADDRESS set, they share a cache process
+# (python profiles.py --address ...) behind it: misses consult it before the
+# database, invalidations are sent to it, and the per-worker LRU then keeps
+# entries only SHARED_LOCAL_TTL_SECONDS, which bounds how long another worker's
+# update can go unseen. If the cache process is unreachable, lookups fall
+# through to the database and it is retried after SHARED_RETRY_SECONDS.
+# The cache process unpickles whatever a connecting client sends, so both ends
+# need MINDGAUGE_PROFILE_CACHE_AUTHKEY (a shared secret) and refuse to start
+# without one; there is no default key.
+
+TTL_SECONDS = float(os.environ.get("MINDGAUGE_PROFILE_TTL_SECONDS", "300"))
+MAX_ENTRIES = int(os.environ.get("MINDGAUGE_PROFILE_CACHE_SIZE", "100000"))
+SHARED_ADDRESS = os.environ.get("MINDGAUGE_PROFILE_CACHE_ADDRESS")
+SHARED_AUTHKEY = os.environ.get("MINDGAUGE_PROFILE_CACHE_AUTHKEY", "").encode()
+SHARED_LOCAL_TTL_SECONDS = 2.0
+SHARED_RETRY_SECONDS = 30.0
+
+_ABSENT = object()
+
+
+class _LRU:
+    """Profiles by user id with an expiry each; also the shared process's store."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = 0     # bumped by every invalidation
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id):
+        """The cached profile (None for a cached unknown id) or _ABSENT."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return _ABSENT
+            if entry[0] < time.monotonic():
+                del self._entries[user_id]
+                return _ABSENT
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def put(self, user_id, profile, generation):
+        """Stores unless something was invalidated since `generation` was read."""
+        with self._lock:
+            if generation != self.generation:
+                return False
+            self._entries[user_id] = (time.monotonic() + self.ttl, profile)
+            self._entries.move_to_end(user_id)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def invalidate(self, user_ids):
+        with self._lock:
+            self.generation += 1
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+
+# --- Shared cache process ---
+
+class _Store(_LRU):
+    """What the cache process serves; `found` flags stand in for _ABSENT, which does not pickle."""
+
+    def lookup(self, user_id):
+        """(found, profile, generation)"""
+        generation = self.generation
+        profile = self.get(user_id)
+        return (False, None, generation) if profile is _ABSENT else (True, profile, generation)
+
+    def store(self, user_id, profile, generation):
+        return self.put(user_id, profile, generation)
+
+    def drop(self, user_ids):
+        self.invalidate(user_ids)
+
+    def size(self):
+        return len(self)
+
+
+class _Manager(BaseManager):
+    pass
+
+
+def _address(spec):
+    """"host:port" for TCP, anything else is a Unix socket path."""
+    host, _, port = spec.rpartition(":")
+    return (host, int(port)) if host and port.isdigit() else spec
+
+
+def _required(authkey):
+    if not authkey:
+        raise ValueError("MINDGAUGE_PROFILE_CACHE_AUTHKEY must be set to use a shared profile cache")
+    return authkey
+
+
+class SharedProfiles:
+    """Client of the cache process; every failure reads as a miss."""
+
+    def __init__(self, address, authkey=SHARED_AUTHKEY):
+        self.address = _address(address)
+        self.authkey = _required(authkey)
+        self._store = None
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+
+    def _connected(self):
+        if self._store is None and time.monotonic() >= self._down_until:
+            with self._lock:
+                if self._store is None:
+                    try:
+                        manager = _Manager(address=self.address, authkey=self.authkey)
+                        manager.register("profiles")
+                        manager.connect()
+                        self._store = manager.profiles()
+                    except (OSError, EOFError) as e:
+                        self._failed(e)
+        return self._store
+
+    def _failed(self, error):
+        print(f"Profile cache process at {self.address} unavailable ({error}); "
+              f"using the database, retrying in {SHARED_RETRY_SECONDS:.0f}s")
+        self._store = None
+        self._down_until = time.monotonic() + SHARED_RETRY_SECONDS
+
+    def _call(self, method, *args):
+        store = self._connected()
+        if store is None:
+            return None
+        try:
+            return getattr(store, method)(*args)
+        except (OSError, EOFError) as e:
+            CACHE_LOOKUPS.inc("profile_shared", "error")
+            self._failed(e)
+            return None
+
+    def get(self, user_id):
+        """(profile or _ABSENT, generation to store a loaded row under)"""
+        found, profile, generation = self._call("lookup", user_id) or (False, None, None)
+        if generation is not None:
+            CACHE_LOOKUPS.inc("profile_shared", "hit" if found else "miss")
+        return (profile if found else _ABSENT), generation
+
+    def put(self, user_id, profile, generation):
+        if generation is not None:
+            self._call("store", user_id, profile, generation)
+
+    def invalidate(self, user_ids):
+        self._call("drop", list(user_ids))
+
+
+def serve(address, authkey=SHARED_AUTHKEY, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+    store = _Store(ttl, max_entries)
+    _Manager.register("profiles", callable=lambda: store)
+    server = _Manager(address=_address(address), authkey=_required(authkey)).get_server()
+    print(f"Serving profiles on {server.address} (ttl {ttl:.0f}s, {max_entries:,d} entries)")
+    server.serve_forever()
+
+
+# --- Per-worker cache ---
+
+class ProfileCache:
+
+    def __init__(self, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES, shared=None):
+        self.shared = shared
+        self._local = _LRU(min(ttl, SHARED_LOCAL_TTL_SECONDS) if shared else ttl, max_entries)
+
+    def __len__(self):
+        return len(self._local)
+
+    def generation(self):
+        """Read before querying a row that will be handed to put()."""
+        return self._local.generation
+
+    def get(self, user_id, load):
+        """The user's profile, or None if there is no such user; load(user_id) runs on a miss."""
+        profile = self._local.get(user_id)
+        if profile is not _ABSENT:
+            CACHE_LOOKUPS.inc("profile", "hit")
+            return profile
+        CACHE_LOOKUPS.inc("profile", "miss")
+
+        generation = self._local.generation
+        shared_generation = None
+        if self.shared:
+            profile, shared_generation = self.shared.get(user_id)
+        if profile is _ABSENT:
+            profile = load(user_id)
+            if self.shared:
+                self.shared.put(user_id, profile, shared_generation)
+        self._local.put(user_id, profile, generation)
+        return profile
+
+    def put(self, user_id, profile, generation):
+        """Primes the local cache with a row the caller read anyway (e.g. at login)."""
+        self._local.put(user_id, profile, generation)
+
+    def invalidate(self, *user_ids):
+        self._local.invalidate(user_ids)
+        if self.shared:
+            self.shared.invalidate(user_ids)
+
+
+CACHE = ProfileCache(shared=SharedProfiles(SHARED_ADDRESS) if SHARED_ADDRESS else None)
+
+REGISTRY.gauge("mindgauge_profile_cache_entries", "Profiles held in this worker's cache.", lambda: len(CACHE))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the profile cache process shared by the API workers.")
+    parser.add_argument("--address", default=SHARED_ADDRESS, help="host:port or a Unix socket path")
+    parser.add_argument("--ttl", type=float, default=TTL_SECONDS)
+    parser.add_argument("--max-entries", type=int, default=MAX_ENTRIES)
+    args = parser.parse_args()
+    if not args.address:
+        sys.exit("--address (or MINDGAUGE_PROFILE_CACHE_ADDRESS) is required")
+    if not SHARED_AUTHKEY:
+        sys.exit("MINDGAUGE_PROFILE_CACHE_AUTHKEY is required")
+    serve(args.address, ttl=args.ttl, max_entries=args.max_entries)
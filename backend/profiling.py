@@ -0,0 +1,184 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from flask import g, jsonify, request
+
+# ==============================================================================
+# ON-DEMAND REQUEST PROFILING
+# ==============================================================================
+#
+# Off unless MINDGAUGE_PROFILING=1: the hooks are then never registered, so a
+# disabled service pays nothing. When on, a request is profiled with cProfile if
+# it carries "X-Profile: 1" or falls into the MINDGAUGE_PROFILE_SAMPLE_RATE sample.
+#
+# Each capture is <dir>/<timestamp>_<request id>_<population>_<domain>_v<version>.prof
+# (open with `python -m pstats` or snakeviz) plus one line in <dir>/index.jsonl.
+# Training runs started with train_lgbm_model(..., profile=True) write the same
+# format, so pointing both at one directory lists them together.
+# GET /debug/profiles returns the slowest recent captures.
+#
+# Captures cost disk and CPU, so X-Profile (and a client-chosen X-Request-ID as
+# the capture id) is only honoured with a staff token, as is /debug/profiles.
+# The directory keeps the newest MAX_CAPTURES .prof files; once it holds a tenth
+# more, the oldest are deleted and index.jsonl is cut back to its last
+# MAX_CAPTURES lines.
+
+ENABLED = os.environ.get("MINDGAUGE_PROFILING", "0") == "1"
+SAMPLE_RATE = float(os.environ.get("MINDGAUGE_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get(
+    "MINDGAUGE_PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+)
+PROFILE_HEADER = "X-Profile"
+REQUEST_ID_HEADER = "X-Request-ID"
+INDEX_FILE = "index.jsonl"
+MAX_CAPTURES = int(os.environ.get("MINDGAUGE_PROFILE_MAX_CAPTURES", "1000"))
+
+# The summary endpoint only looks at this many of the most recent captures
+RECENT_CAPTURES = 500
+TOP_FUNCTIONS = 8
+
+
+def top_functions(profiler, limit=TOP_FUNCTIONS):
+    """Functions with the most self time in a capture (cumulative time included for context)."""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (_, calls, self_time, cumulative, _) in stats.stats.items():
+        rows.append((self_time, cumulative, calls, f"{os.path.basename(filename)}:{line}({name})"))
+    rows.sort(reverse=True)
+    return [
+        {"function": name, "calls": calls, "self_s": round(own, 6), "cumulative_s": round(cum, 6)}
+        for own, cum, calls, name in rows[:limit]
+    ]
+
+
+def _slug(value):
+    return re.sub(r"[^A-Za-z0-9.-]+", "-", str(value)).strip("-") or "none"
+
+
+def _tail(path, n, block=64 * 1024):
+    """The last n lines of a file, reading backwards from the end in blocks."""
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        position, data = end, b""
+        while position > 0 and data.count(b"\n") <= n:
+            position = max(0, position - block)
+            f.seek(position)
+            data = f.read(end - position)
+    lines = data.decode().splitlines()
+    return lines[-n:] if position == 0 else lines[1:][-n:]
+
+
+class ProfileStore:
+
+    def __init__(self, directory=PROFILE_DIR, max_captures=MAX_CAPTURES):
+        self.directory = directory
+        self.max_captures = max_captures
+        self._lock = threading.Lock()
+
+    def save(self, profiler, duration, capture_id, kind, **tags):
+        os.makedirs(self.directory, exist_ok=True)
+        captured_at = datetime.now(timezone.utc)
+        name = "_".join([
+            captured_at.strftime("%Y%m%dT%H%M%S"), _slug(capture_id),
+            _slug(tags.get("population")), _slug(tags.get("domain")),
+            "unversioned" if tags.get("model_version") is None else f"v{_slug(tags['model_version'])}",
+        ]) + ".prof"
+        profiler.dump_stats(os.path.join(self.directory, name))
+
+        entry = {
+            "id": capture_id,
+            "kind": kind,
+            "file": name,
+            "captured_at": captured_at.isoformat(timespec="seconds"),
+            "duration_ms": round(duration * 1000, 3),
+            **tags,
+            "top_functions": top_functions(profiler),
+        }
+        with self._lock:
+            with open(os.path.join(self.directory, INDEX_FILE), "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._prune()
+        return entry
+
+    def _prune(self):
+        """Deletes the oldest captures once there are a tenth more than max_captures."""
+        captures = sorted(name for name in os.listdir(self.directory) if name.endswith(".prof"))
+        if len(captures) <= self.max_captures + self.max_captures // 10:
+            return
+        for name in captures[:-self.max_captures]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+        index = os.path.join(self.directory, INDEX_FILE)
+        lines = _tail(index, self.max_captures)
+        with open(index + ".tmp", "w") as f:
+            f.write("".join(line + "\n" for line in lines))
+        os.replace(index + ".tmp", index)
+
+    def recent(self, limit=RECENT_CAPTURES):
+        try:
+            lines = _tail(os.path.join(self.directory, INDEX_FILE), limit)
+        except FileNotFoundError:
+            return []
+        return [json.loads(line) for line in lines if line.strip()]
+
+    def slowest(self, limit=20, kind=None):
+        entries = [e for e in self.recent() if kind is None or e["kind"] == kind]
+        return sorted(entries, key=lambda e: e["duration_ms"], reverse=True)[:limit]
+
+
+def install(app, authorize, store=None, sample_rate=SAMPLE_RATE):
+    """
+    Registers the profiling hooks and the summary endpoint on a Flask app.
+    authorize() -> (claims, None) for a staff token, else (None, error response).
+    """
+    store = store or ProfileStore()
+
+    @app.before_request
+    def start_profile():
+        requested = request.headers.get(PROFILE_HEADER) == "1" and authorize()[1] is None
+        if requested or (sample_rate and random.random() < sample_rate):
+            g.profile_id = (requested and request.headers.get(REQUEST_ID_HEADER)) or uuid.uuid4().hex[:16]
+            g.profile_start = time.perf_counter()
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def finish_profile(response):
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            duration = time.perf_counter() - g.pop("profile_start")
+            tags = g.pop("profile_tags", {})
+            store.save(profiler, duration, g.profile_id, "request",
+                       endpoint=request.url_rule.rule if request.url_rule else request.path,
+                       status=response.status_code, **tags)
+            response.headers[REQUEST_ID_HEADER] = g.profile_id
+        return response
+
+    @app.teardown_request
+    def stop_profile(error=None):
+        # after_request is skipped when a request raises; never leave a profiler running
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+
+    @app.get("/debug/profiles")
+    def slowest_profiles():
+        _, error = authorize()
+        if error:
+            return error
+        limit = request.args.get("limit", default=20, type=int)
+        return jsonify({"captures": store.slowest(limit, kind=request.args.get("kind"))})
+
+    return store
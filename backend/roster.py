@@ -0,0 +1,176 @@
+import io
+import csv
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+
+import passwords
+
+# ==============================================================================
+# BULK USER IMPORT (school / clinic rosters)
+# ==============================================================================
+#
+# A roster is CSV with a header row or JSON (a list of objects, or {"users": [...]})
+# with the /register fields: name, email, password, age, location. Every row gets
+# an outcome instead of the whole import failing on the first bad one:
+#
+#   created            inserted; "user_id" is its new id
+#   email_exists       the email already belongs to a user (or won a race meanwhile)
+#   duplicate_in_file  an earlier row of the same roster has this email
+#   invalid            failed validation; "error" says why
+#
+# Rows are imported CHUNK_ROWS at a time: passwords are hashed in parallel
+# (passwords.hash_many), existing emails are looked up with one IN query, and the
+# rest are inserted with one executemany and committed together. A row without
+# a password creates an account that cannot log in until a password is set.
+#
+#   python roster.py district.csv           (or POST /users/import with an admin token)
+
+CHUNK_ROWS = 1000
+FIELDS = ("name", "email", "password", "age", "location")
+MAX_AGE = 120
+
+
+class InvalidRoster(ValueError):
+    """The roster itself could not be parsed (as opposed to individual bad rows)."""
+
+
+def parse(body, content_type="application/json"):
+    """Roster rows (dicts) from a CSV or JSON document."""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8-sig")
+    if "csv" in content_type:
+        reader = csv.DictReader(io.StringIO(body))
+        if not reader.fieldnames or "email" not in reader.fieldnames:
+            raise InvalidRoster("CSV roster needs a header row with at least an email column")
+        return [{k: (v or None) for k, v in row.items() if k in FIELDS} for row in reader]
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise InvalidRoster(f"Roster is not valid JSON: {e}") from e
+    if isinstance(data, dict):
+        data = data.get("users")
+    if not isinstance(data, list):
+        raise InvalidRoster('JSON roster must be a list of users or {"users": [...]}')
+    return data
+
+
+def validate(row):
+    """(user fields, None) or (None, error)."""
+    if not isinstance(row, dict):
+        return None, "row is not an object"
+    name, email, password = row.get("name"), row.get("email"), row.get("password")
+    if not isinstance(email, str) or "@" not in email.strip():
+        return None, "email is missing or invalid"
+    if not isinstance(name, str) or not name.strip():
+        return None, "name is required"
+    if password is not None and (not isinstance(password, str) or not password):
+        return None, "password must be a non-empty string"
+    age = row.get("age")
+    if age is not None:
+        try:
+            age = int(age)
+        except (TypeError, ValueError):
+            return None, "age must be an integer"
+        if not 0 <= age <= MAX_AGE:
+            return None, f"age must be 0-{MAX_AGE}"
+    location = row.get("location")
+    return {
+        "name": name.strip(), "email": email.strip().lower(), "password": password, "age": age,
+        "location": location.strip() if isinstance(location, str) else None,
+    }, None
+
+
+def _sql(statement, dialect):
+    return statement if dialect == "mysql" else statement.replace("%s", "?")
+
+
+def _existing(cursor, emails, dialect):
+    cursor.execute(_sql(f"SELECT email FROM users WHERE email IN ({', '.join(['%s'] * len(emails))})", dialect), emails)
+    return {email.lower() for email, in cursor.fetchall()}
+
+
+def import_users(conn, rows, dialect="mysql", chunk_rows=CHUNK_ROWS):
+    """
+    Imports roster rows; returns one outcome per row, in order:
+    {"row": i, "email", "status", "user_id" | "error"}.
+    """
+    verb = "INSERT IGNORE" if dialect == "mysql" else "INSERT OR IGNORE"
+    insert = _sql(f"{verb} INTO users (name, email, password, age, location) VALUES (%s, %s, %s, %s, %s)", dialect)
+    results = []
+    seen = set()
+    cursor = conn.cursor()
+    for offset in range(0, len(rows), chunk_rows):
+        pending = []
+        for i, row in enumerate(rows[offset:offset + chunk_rows], start=offset):
+            user, error = validate(row)
+            if error:
+                results.append({"row": i, "email": row.get("email") if isinstance(row, dict) else None,
+                                "status": "invalid", "error": error})
+            elif user["email"] in seen:
+                results.append({"row": i, "email": user["email"], "status": "duplicate_in_file"})
+            else:
+                seen.add(user["email"])
+                outcome = {"row": i, "email": user["email"], "status": None}
+                results.append(outcome)
+                pending.append((outcome, user))
+        if not pending:
+            continue
+
+        existing = _existing(cursor, [user["email"] for _, user in pending], dialect)
+        new = [(outcome, user) for outcome, user in pending if user["email"] not in existing]
+        for outcome, user in pending:
+            if user["email"] in existing:
+                outcome["status"] = "email_exists"
+        if not new:
+            continue
+
+        hashes = passwords.hash_many([user["password"] for _, user in new])
+        cursor.executemany(insert, [
+            (user["name"], user["email"], hashed, user["age"], user["location"])
+            for (_, user), hashed in zip(new, hashes)
+        ])
+        conn.commit()
+
+        # INSERT IGNORE skipped rows whose email was registered after the lookup above:
+        # a row is ours if it holds the (salted, so unique) hash we just inserted
+        placeholders = ", ".join(["%s"] * len(new))
+        cursor.execute(
+            _sql(f"SELECT email, id, password FROM users WHERE email IN ({placeholders})", dialect),
+            [user["email"] for _, user in new],
+        )
+        stored = {email.lower(): (user_id, hashed) for email, user_id, hashed in cursor.fetchall()}
+        for (outcome, user), hashed in zip(new, hashes):
+            user_id, stored_hash = stored.get(user["email"], (None, None))
+            if user_id is not None and stored_hash == hashed:
+                outcome["status"], outcome["user_id"] = "created", user_id
+            else:
+                outcome["status"] = "email_exists"
+    return results
+
+
+def counts(results):
+    return dict(Counter(result["status"] for result in results))
+
+
+if __name__ == '__main__':
+    import db
+
+    parser = argparse.ArgumentParser(description="Import a CSV or JSON user roster.")
+    parser.add_argument("roster", help="path to a .csv or .json roster")
+    parser.add_argument("--failures", action="store_true", help="print every row that was not created")
+    args = parser.parse_args()
+
+    with open(args.roster, "rb") as f:
+        rows = parse(f.read(), "text/csv" if args.roster.endswith(".csv") else "application/json")
+    start = time.perf_counter()
+    with db.connection() as conn:
+        results = import_users(conn, rows)
+    print(f"Imported {len(rows)} rows in {time.perf_counter() - start:.1f}s: {counts(results)}")
+    if args.failures:
+        for result in results:
+            if result["status"] != "created":
+                print(json.dumps(result))
+    sys.exit(0 if all(result["status"] == "created" for result in results) else 2)
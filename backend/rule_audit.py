@@ -0,0 +1,101 @@
+import os
+import queue
+import random
+import threading
+from collections import deque
+
+import numpy as np
+
+from metrics import RULE_AUDIT_ROWS, RULE_AUDIT_DROPPED
+
+# ==============================================================================
+# RULE FAST PATH AUDITOR
+# ==============================================================================
+#
+# Rows answered from published cut-offs (inference/rules.py) skip the model. A
+# sample of those requests (MINDGAUGE_RULE_AUDIT_RATE, default 5%) is queued and
+# re-scored by the model on a background thread, off the request path. Per-domain
+# agreement goes to /metrics (mindgauge_rule_audit_rows_total) and, with the most
+# recent disagreements, to GET /debug/rule-audit.
+#
+# The queue is bounded: when the auditor falls behind, samples are dropped (and
+# counted) instead of holding memory or slowing requests down.
+
+SAMPLE_RATE = float(os.environ.get("MINDGAUGE_RULE_AUDIT_RATE", "0.05"))
+QUEUE_SIZE = 256
+RECENT_DISAGREEMENTS = 20
+
+
+class RuleAuditor:
+
+    def __init__(self, score_with_model, sample_rate=SAMPLE_RATE, queue_size=QUEUE_SIZE):
+        """score_with_model(population, domain, rows) -> model labels for those rows."""
+        self.score_with_model = score_with_model
+        self.sample_rate = sample_rate
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._thread = None
+
+    def submit(self, population, domain, rows, rule_labels):
+        """Queues a sample of rule-decided rows for re-scoring; never blocks the caller."""
+        if not rows or not self.sample_rate or random.random() >= self.sample_rate:
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((population, domain, rows, list(rule_labels)))
+        except queue.Full:
+            RULE_AUDIT_DROPPED.inc()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="rule-auditor", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            population, domain, rows, rule_labels = self._queue.get()
+            try:
+                self.audit(population, domain, rows, rule_labels)
+            except Exception as e:      # a bad sample must not kill the auditor
+                print(f"Rule audit failed for {population}/{domain}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def audit(self, population, domain, rows, rule_labels):
+        model_labels = list(self.score_with_model(population, domain, rows))
+        disagree = np.array(model_labels, dtype=object) != np.array(rule_labels, dtype=object)
+        n_disagree = int(disagree.sum())
+
+        RULE_AUDIT_ROWS.inc(population, domain, "agree", amount=len(rows) - n_disagree)
+        if n_disagree:
+            RULE_AUDIT_ROWS.inc(population, domain, "disagree", amount=n_disagree)
+
+        with self._lock:
+            stats = self._stats.setdefault(
+                (population, domain), {"rows": 0, "disagreements": 0, "recent": deque(maxlen=RECENT_DISAGREEMENTS)}
+            )
+            stats["rows"] += len(rows)
+            stats["disagreements"] += n_disagree
+            for i in np.flatnonzero(disagree).tolist():
+                # Plain lists (null for unanswered), so summary() stays JSON-serializable
+                scores = [None if np.isnan(v) else v for v in np.asarray(rows[i], dtype=np.float64).tolist()]
+                stats["recent"].append({"scores": scores, "rule": rule_labels[i], "model": model_labels[i]})
+
+    def drain(self):
+        """Blocks until every queued sample has been audited (tests, shutdown)."""
+        self._queue.join()
+
+    def summary(self):
+        with self._lock:
+            return {
+                f"{population}/{domain}": {
+                    "rows": stats["rows"],
+                    "disagreements": stats["disagreements"],
+                    "disagreement_rate": round(stats["disagreements"] / stats["rows"], 6) if stats["rows"] else None,
+                    "recent_disagreements": list(stats["recent"]),
+                }
+                for (population, domain), stats in sorted(self._stats.items())
+            }
@@ -0,0 +1,237 @@
+import json
+from types import SimpleNamespace
+from typing import Optional, Union
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import msgspec
+except ImportError:     # stdlib json and the field checks in Schema._check
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:     # Flask's stdlib encoder
+    orjson = None
+
+# ==============================================================================
+# REQUEST SCHEMAS AND JSON CODEC
+# ==============================================================================
+#
+# The endpoints (/login, /register, /score, ...) decode their bodies through a
+# Schema instead of request.json + data.get checks. With msgspec installed, a
+# Schema is compiled once into a typed msgspec decoder, which validates while
+# it parses. Without msgspec, the same declaration is checked field by field on
+# the stdlib json result. Either way a bad body raises InvalidPayload, whose
+# message names the field.
+#
+# A score matrix field is kept as raw JSON by msgspec and turned into a
+# float64 (n_rows, n_items) array, NaN for null. Item and Level 1 scores are
+# 0-4 ratings, so a body of single-digit rows has a fixed stride: row r, item i
+# is byte r * stride + 2 * i. Such bodies are read with one np.frombuffer,
+# without a Python object per score. Anything else (wider numbers, or bodies
+# below SMALL_MATRIX_BYTES where the NumPy call overhead dominates) goes through
+# msgspec's typed list decoder.
+#
+# FastJSONProvider puts orjson behind request.json and jsonify on every
+# endpoint when it is installed. It keeps Flask's handling of dates, Decimals
+# and dataclasses and writes NaN as null. Keys come out unsorted.
+#
+# msgspec and orjson are optional: pip install msgspec orjson.
+
+SMALL_MATRIX_BYTES = 512
+_WHITESPACE = b" \t\r\n"
+_ROW_BREAK = np.frombuffer(b"],[", np.uint8)
+_NULL = ord("n")
+
+
+class InvalidPayload(ValueError):
+    """The body is not JSON or does not match the endpoint's schema."""
+
+
+# --- JSON codec ---
+
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, encoding and decoding with orjson when it is installed."""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS), mimetype=self.mimetype
+        )
+
+
+# --- Score matrices ---
+
+def _single_digit_matrix(text):
+    """The matrix of a whitespace-free [[d,d,...],...] body of digits and nulls; None for any other shape."""
+    if text[:2] != b"[[" or text[-2:] != b"]]":
+        return None
+    body = text[2:-2].replace(b"null", b"n") + b"],["
+    n_rows = body.count(b"],[")
+    stride, rest = divmod(len(body), n_rows)
+    if rest or stride % 2 or stride < 4:
+        return None
+    grid = np.frombuffer(body, np.uint8).reshape(n_rows, stride)
+    if not ((grid[:, 1:stride - 3:2] == ord(",")).all() and (grid[:, stride - 3:] == _ROW_BREAK).all()):
+        return None
+    cells = grid[:, 0:stride - 3:2]
+    missing = cells == _NULL
+    if not (((cells >= ord("0")) & (cells <= ord("9"))) | missing).all():
+        return None
+    matrix = cells.astype(np.float64) - ord("0")
+    matrix[missing] = np.nan
+    return matrix
+
+
+def _rows_matrix(rows):
+    if not rows or any(len(row) != len(rows[0]) for row in rows):
+        raise InvalidPayload("scores must be a non-empty list of rows of equal length")
+    return np.array(
+        [[np.nan if v is None else v for v in row] for row in rows], dtype=np.float64
+    ).reshape(len(rows), len(rows[0]))
+
+
+def _checked_rows(value):
+    """Stdlib path: the same checks msgspec's list[list[float | None]] decoder makes."""
+    if not isinstance(value, list) or not all(isinstance(row, list) for row in value):
+        raise InvalidPayload("scores must be a list of rows")
+    for row in value:
+        for v in row:
+            if v is not None and (isinstance(v, bool) or not isinstance(v, (int, float))):
+                raise InvalidPayload(f"scores must be numbers or null, got {v!r}")
+    return value
+
+
+if msgspec is not None:
+    _ROWS = msgspec.json.Decoder(list[list[Optional[float]]])
+
+
+def score_matrix(raw):
+    """(n_rows, n_items) float64 array, NaN for null, from a decoded list or msgspec.Raw of rows."""
+    if msgspec is None or not isinstance(raw, msgspec.Raw):
+        return _rows_matrix(_checked_rows(raw))
+    text = bytes(raw).translate(None, _WHITESPACE)
+    if len(text) >= SMALL_MATRIX_BYTES:
+        matrix = _single_digit_matrix(text)
+        if matrix is not None:
+            return matrix
+    try:
+        return _rows_matrix(_ROWS.decode(text))
+    except msgspec.ValidationError as e:
+        raise InvalidPayload(f"scores: {e}") from None
+
+
+# --- Schemas ---
+
+def _is_a(value, kind):
+    return isinstance(value, kind) and not (kind is int and isinstance(value, bool))
+
+
+class Matrix:
+    """Field type: a score matrix (see score_matrix)."""
+
+
+class Schema:
+    """
+    A request body: Schema("StructName", field=type, ...), where a type is str, int,
+    bool, Matrix or a tuple of them; a tuple with None makes the field optional
+    (default None). int never matches a JSON true/false. With partial=True (a PATCH
+    body) every field may be left out, and decode() only sets the ones given.
+    """
+
+    def __init__(self, struct_name, /, *, partial=False, **fields):
+        self.name = struct_name
+        self.partial = partial
+        self.fields = {field: kinds if isinstance(kinds, tuple) else (kinds,) for field, kinds in fields.items()}
+        self.matrices = [field for field, kinds in self.fields.items() if Matrix in kinds]
+        self._decoder = msgspec.json.Decoder(self._struct()) if msgspec is not None else None
+
+    def _struct(self):
+        def annotation(kinds):
+            types = [msgspec.Raw if kind is Matrix else type(None) if kind is None else kind for kind in kinds]
+            if self.partial:
+                types.append(msgspec.UnsetType)
+            return Union[tuple(types)] if len(types) > 1 else types[0]
+
+        if self.partial:
+            return msgspec.defstruct(self.name, [
+                (field, annotation(kinds), msgspec.UNSET) for field, kinds in self.fields.items()
+            ])
+        # Required fields first, as msgspec wants
+        ordered = sorted(self.fields.items(), key=lambda item: None in item[1])
+        return msgspec.defstruct(self.name, [
+            (field, annotation(kinds), None) if None in kinds else (field, annotation(kinds))
+            for field, kinds in ordered
+        ])
+
+    def decode(self, body):
+        """The body's fields as attributes (partial: only those given); raises InvalidPayload."""
+        if self._decoder is not None:
+            try:
+                payload = self._decoder.decode(body)
+            except msgspec.ValidationError as e:
+                raise InvalidPayload(str(e)) from None
+            except msgspec.DecodeError as e:
+                raise InvalidPayload(f"Body is not valid JSON: {e}") from None
+            if self.partial:
+                payload = SimpleNamespace(**{
+                    field: getattr(payload, field) for field in self.fields
+                    if getattr(payload, field) is not msgspec.UNSET
+                })
+        else:
+            try:
+                data = json.loads(body)
+            except ValueError as e:
+                raise InvalidPayload(f"Body is not valid JSON: {e}") from None
+            payload = SimpleNamespace(**self._check(data))
+        for field in self.matrices:
+            if getattr(payload, field, None) is not None:
+                setattr(payload, field, score_matrix(getattr(payload, field)))
+        return payload
+
+    def _check(self, data):
+        if not isinstance(data, dict):
+            raise InvalidPayload(f"Expected `object`, got `{type(data).__name__}`")
+        values = {}
+        for field, kinds in self.fields.items():
+            if self.partial and field not in data:
+                continue
+            value = data.get(field)
+            if value is None and self.partial and None not in kinds:
+                raise InvalidPayload(f"Expected `{kinds[0].__name__}`, got `null` - at `$.{field}`")
+            if value is None:
+                if None not in kinds:
+                    raise InvalidPayload(f"Object missing required field `{field}`")
+            elif not any(kind is Matrix or _is_a(value, kind) for kind in kinds if kind is not None):
+                expected = " | ".join("null" if kind is None else kind.__name__ for kind in kinds)
+                raise InvalidPayload(f"Expected `{expected}`, got `{type(value).__name__}` - at `$.{field}`")
+            values[field] = value
+        return values
+
+
+LOGIN = Schema("LoginRequest", email=str, password=str)
+REFRESH = Schema("RefreshRequest", refreshToken=str)
+PROFILE = Schema("ProfileRequest", partial=True, name=str, age=(int, None), location=(str, None))
+REGISTER = Schema(
+    "RegisterRequest", name=str, email=str, password=(str, None), age=(int, str, None), location=(str, None),
+)
+SCORE = Schema(
+    "ScoreRequest", domain=str, scores=Matrix, population=(str, None), explain=(bool, int, None), user_id=(int, None),
+)
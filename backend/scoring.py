@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+# --- The models live in ml_backend; scoring goes through its slim inference runtime ---
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ml_backend'))
+import inference
+# -----------------------------------------------------------------------------
+
+from metrics import SCORING_LATENCY, SCORING_BATCH_SIZE, MODEL_LOAD_SECONDS, CACHE_LOOKUPS, RULE_PATH_ROWS, \
+    MODEL_RELEASE_SWAPS
+from rule_audit import RuleAuditor
+import shadow
+
+# ==============================================================================
+# SCORING SERVICE (Level 1 diagnosis + Level 2 severity, instrumented)
+# ==============================================================================
+
+# Domain name clients use for the Level 1 cross-cutting model
+LEVEL1 = "level1"
+
+# Answer rows covered by published cut-offs without the model (see inference/rules.py)
+RULE_FAST_PATH = os.environ.get("MINDGAUGE_RULE_FAST_PATH", "1") == "1"
+
+AUDITOR = RuleAuditor(lambda population, domain, rows: inference.predict_batch(population, domain, rows)[0])
+
+# Candidate releases (noted by the release watcher below) score the same requests
+# in a background process (see shadow.py)
+SHADOW = shadow.ShadowScorer()
+
+# How often loaded models check their release pointer (inference/releases.py); 0 disables.
+# A moved pointer is loaded and warmed in the background, then swapped in.
+RELEASE_POLL_SECONDS = float(os.environ.get("MINDGAUGE_RELEASE_POLL_SECONDS", "10"))
+
+if RELEASE_POLL_SECONDS > 0:
+    inference.start_release_watcher(
+        RELEASE_POLL_SECONDS,
+        on_swap=lambda population, domain, old, new: MODEL_RELEASE_SWAPS.inc(population, domain),
+    )
+
+
+def _model_domain(domain):
+    return "level1_diagnosis" if domain == LEVEL1 else domain
+
+
+def _load(population, domain):
+    return inference.load_level1_model(population) if domain == LEVEL1 \
+        else inference.load_domain_model(population, domain)
+
+
+def ensure_loaded(population, domain):
+    """
+    The loaded model dict, loaded on first use (recording the model cache hit/miss
+    and load time). Callers read version, classes and release from this one dict:
+    the release watcher may swap in another between two lookups.
+    """
+    if inference.is_loaded(population, _model_domain(domain)):
+        CACHE_LOOKUPS.inc("model", "hit")
+        return _load(population, domain)
+
+    CACHE_LOOKUPS.inc("model", "miss")
+    start = time.perf_counter()
+    loaded = _load(population, domain)
+    MODEL_LOAD_SECONDS.observe(time.perf_counter() - start, population, domain)
+    return loaded
+
+
+def _probability_rows(probabilities):
+    """NaN rows (unscorable respondents) become None so the result stays valid JSON."""
+    return [None if np.isnan(row[0]) else row for row in probabilities.round(6).tolist()]
+
+
+def score(population, domain, rows, explain=0):
+    """
+    Scores a batch of respondents. rows holds raw item scores (None = unanswered)
+    for a Level 2 domain, or the Level 1 domain scores when domain == "level1".
+    explain > 0 adds the top `explain` contributing items per respondent.
+    """
+    loaded = ensure_loaded(population, domain)
+    SCORING_BATCH_SIZE.observe(len(rows), population, domain)
+
+    explanations = None
+    by_rule = None
+    with SCORING_LATENCY.time(population, domain):
+        if domain == LEVEL1 and explain:
+            labels, probabilities, explanations = inference.explain_level1_batch(
+                population, rows, top_k=explain, loaded=loaded
+            )
+        elif domain == LEVEL1:
+            labels, probabilities = inference.predict_level1_with(loaded, rows)
+        elif explain:
+            labels, probabilities, explanations = inference.explain_batch(
+                population, domain, rows, top_k=explain, loaded=loaded
+            )
+        elif RULE_FAST_PATH and inference.has_rules(population, domain):
+            labels, probabilities, by_rule = inference.predict_batch_with_rules(population, domain, rows, loaded=loaded)
+        else:
+            labels, probabilities = inference.predict_with(loaded, rows)
+
+        if domain == LEVEL1:
+            referrals = inference.level1_referrals_batch(population, rows)
+            features = inference.LEVEL1_FEATURES[population]
+            result = {
+                "referrals": [[f for f, hit in zip(features, row) if hit] for row in referrals.tolist()],
+            }
+        else:
+            result = {}
+
+    result.update({
+        "population": population,
+        "domain": domain,
+        "model_version": loaded["version"],
+        "classes": list(loaded["classes"]),
+        "labels": list(labels),
+        "probabilities": _probability_rows(probabilities),
+    })
+    if explanations is not None:
+        result["explanations"] = explanations
+    if by_rule is not None:
+        _record_rule_path(population, domain, rows, labels, by_rule)
+        result["decided_by"] = ["rules" if hit else "model" for hit in by_rule.tolist()]
+
+    candidate = inference.candidate_release(population, _model_domain(domain)) if shadow.ENABLED else None
+    if candidate is not None:
+        SHADOW.submit(population, domain, _model_domain(domain), loaded["release"], candidate, rows)
+    return result
+
+
+def _record_rule_path(population, domain, rows, labels, by_rule):
+    n_rule = int(by_rule.sum())
+    RULE_PATH_ROWS.inc(population, domain, "rules", amount=n_rule)
+    RULE_PATH_ROWS.inc(population, domain, "model", amount=len(rows) - n_rule)
+    if n_rule:
+        hits = by_rule.nonzero()[0].tolist()
+        AUDITOR.submit(population, domain, [rows[i] for i in hits], labels[hits])
@@ -0,0 +1,243 @@
+import os
+import queue
+import random
+import threading
+import time
+import multiprocessing
+
+import numpy as np
+
+from metrics import SHADOW_ROWS, SHADOW_DROPPED, SHADOW_CPU_SECONDS, SHADOW_PROBABILITY_DELTA
+
+# ==============================================================================
+# SHADOW SCORING OF CANDIDATE RELEASES
+# ==============================================================================
+#
+# A release proposed as CANDIDATE (inference/releases.py) is noted by the release
+# watcher. Requests for that model are still answered by the current release;
+# their input is queued to a worker that scores it with both releases and reports
+# label agreement, the largest per-row change in class probability and each
+# release's scoring cost (CPU time on the same rows in the same process).
+#
+# The worker is a separate process at idle CPU priority (SCHED_IDLE, else nice 19):
+# as a thread it would compete with the request threads for the GIL and stall them
+# for up to the interpreter's switch interval (5 ms), and at normal priority it
+# would take CPU time from them: it only runs when the CPU would otherwise idle.
+# The request path only does a dict lookup and put_nowait(); when the worker falls
+# behind, batches are dropped (and counted), never waited on.
+# Results: /metrics (mindgauge_shadow_*) and GET /debug/shadow.
+
+ENABLED = os.environ.get("MINDGAUGE_SHADOW", "1") == "1"
+SAMPLE_RATE = float(os.environ.get("MINDGAUGE_SHADOW_RATE", "1.0"))
+QUEUE_SIZE = 256
+LATENCY_WINDOW = 1000
+FLUSH_SECONDS = 1.0
+
+
+class ShadowScorer:
+
+    def __init__(self, sample_rate=SAMPLE_RATE, queue_size=QUEUE_SIZE):
+        self.sample_rate = sample_rate
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._jobs = None
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+
+    def submit(self, population, domain, model_domain, current, candidate, rows):
+        """
+        Queues rows for scoring with the current and candidate release (release
+        numbers; None = flat files). Never blocks the caller.
+        """
+        if len(rows) == 0 or random.random() >= self.sample_rate:
+            return
+        self._ensure_started()
+        try:
+            self._jobs.put_nowait((population, domain, model_domain, current, candidate, rows))
+            self.submitted += 1
+        except queue.Full:
+            self.dropped += 1
+            SHADOW_DROPPED.inc(population, domain)
+
+    def _ensure_started(self):
+        if self._jobs is None:
+            with self._lock:
+                if self._jobs is None:
+                    from inference.config import MODELS_DIR
+
+                    # spawn: forking a process with live request threads is not safe
+                    context = multiprocessing.get_context("spawn")
+                    jobs, results = context.Queue(self.queue_size), context.Queue()
+                    jobs.cancel_join_thread()       # unsent batches must not hold up interpreter exit
+                    context.Process(
+                        target=_worker, args=(MODELS_DIR, jobs, results), name="shadow-scorer", daemon=True
+                    ).start()
+                    threading.Thread(target=self._collect, args=(results,), name="shadow-results", daemon=True).start()
+                    self._jobs = jobs
+
+    def _collect(self, results):
+        while True:
+            flushed = results.get()
+            for key, totals in flushed.items():
+                try:
+                    self.record(key, totals)
+                finally:
+                    self.completed += totals["batches"]
+
+    def record(self, key, totals):
+        population, domain, current, candidate = key
+        if totals["errors"]:
+            print(f"Shadow scoring failed for {population}/{domain} ({totals['errors']} batches): {totals['error']}")
+        agree = totals["rows"] - totals["disagreements"]
+
+        SHADOW_ROWS.inc(population, domain, "agree", amount=agree)
+        if totals["disagreements"]:
+            SHADOW_ROWS.inc(population, domain, "disagree", amount=totals["disagreements"])
+        for release, (counts, total) in totals["latency_buckets"].items():
+            SHADOW_CPU_SECONDS.observe_counts(counts, total, population, domain, release)
+        SHADOW_PROBABILITY_DELTA.observe_counts(*totals["delta_buckets"], population, domain)
+
+        with self._lock:
+            stats = self._stats.get((population, domain))
+            if stats is None or stats["candidate"] != candidate:
+                stats = self._stats[(population, domain)] = {
+                    "candidate": candidate, "batches": 0, "rows": 0, "disagreements": 0,
+                    "delta_sum": 0.0, "delta_max": 0.0, "ms": {"current": [], "candidate": []},
+                }
+            stats["current"] = current
+            stats["batches"] += totals["batches"] - totals["errors"]
+            stats["rows"] += totals["rows"]
+            stats["disagreements"] += totals["disagreements"]
+            stats["delta_sum"] += totals["delta_buckets"][1]
+            stats["delta_max"] = max(stats["delta_max"], totals["delta_max"])
+            for release, window in stats["ms"].items():
+                window.extend(totals["ms"][release])
+                del window[:-LATENCY_WINDOW]
+
+    def drain(self, timeout=60):
+        """Waits until every queued batch has been compared (tests, benchmarks, shutdown)."""
+        deadline = time.monotonic() + timeout
+        while self.completed < self.submitted and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def summary(self):
+        with self._lock:
+            return {
+                f"{population}/{domain}": {
+                    "current_release": stats["current"],
+                    "candidate_release": stats["candidate"],
+                    "batches": stats["batches"],
+                    "rows": stats["rows"],
+                    "agreement_rate": round(1 - stats["disagreements"] / stats["rows"], 6) if stats["rows"] else None,
+                    "mean_probability_delta": round(stats["delta_sum"] / stats["rows"], 6) if stats["rows"] else None,
+                    "max_probability_delta": round(stats["delta_max"], 6),
+                    "cpu_ms": {
+                        name: {
+                            "p50": round(float(np.percentile(window, 50)), 3),
+                            "p99": round(float(np.percentile(window, 99)), 3),
+                        } if window else None
+                        for name, window in stats["ms"].items()
+                    },
+                }
+                for (population, domain), stats in sorted(self._stats.items())
+            }
+
+
+# ==============================================================================
+# WORKER PROCESS
+# ==============================================================================
+
+def _lower_priority():
+    try:
+        os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+    except (AttributeError, OSError):
+        os.nice(19)
+
+
+def _bucketed(histogram, values):
+    """(counts per bucket incl. +Inf, sum) as Histogram.observe would have recorded them."""
+    values = np.asarray(values, dtype=np.float64)
+    index = np.searchsorted(histogram.buckets, values, side='left')
+    return np.bincount(index, minlength=len(histogram.buckets) + 1).tolist(), float(values.sum())
+
+
+def _worker(models_dir, jobs, results):
+    """
+    Scores queued batches with both releases. Totals are sent back about once per
+    FLUSH_SECONDS (or whenever the queue runs empty), so the serving process wakes up
+    to merge them rarely instead of once per request.
+    """
+    _lower_priority()
+    from inference import config, models, scoring
+
+    config.MODELS_DIR = models_dir
+    loaded = {}     # (population, model_domain, release) -> loaded release; the last two per model
+
+    def release(population, model_domain, number):
+        key = (population, model_domain, number)
+        if key not in loaded:
+            for stale in [k for k in loaded if k[:2] == key[:2]][:-1]:
+                del loaded[stale]
+            loaded[key] = models.load_release(population, model_domain, number)
+        return loaded[key]
+
+    def timed(model, rows):
+        # CPU time: at idle priority the worker is preempted whenever requests come in
+        start = time.thread_time()
+        if 'spec' in model:
+            labels, probabilities = scoring.predict_with(model, rows)
+        else:
+            labels, probabilities = scoring.predict_level1_with(model, rows)
+        return labels, probabilities, time.thread_time() - start
+
+    pending = {}
+    last_flush = time.monotonic()
+    while True:
+        population, domain, model_domain, current, candidate, rows = jobs.get()
+        totals = pending.setdefault((population, domain, current, candidate), {
+            "batches": 0, "errors": 0, "error": None, "rows": 0, "disagreements": 0,
+            "delta": [], "delta_max": 0.0, "ms": {"current": [], "candidate": []},
+        })
+        totals["batches"] += 1
+        try:
+            current_model = release(population, model_domain, current)
+            candidate_model = release(population, model_domain, candidate)
+            labels, probabilities, seconds = timed(current_model, rows)
+            shadow_labels, shadow_probabilities, shadow_seconds = timed(candidate_model, rows)
+
+            scored = np.array([label is not None for label in labels])
+            delta = _max_probability_delta(
+                current_model["classes"], candidate_model["classes"],
+                probabilities[scored], shadow_probabilities[scored],
+            )
+            totals["rows"] += int(scored.sum())
+            totals["disagreements"] += int((labels[scored] != shadow_labels[scored]).sum())
+            totals["delta"].append(delta)
+            totals["delta_max"] = max(totals["delta_max"], float(delta.max(initial=0.0)))
+            totals["ms"]["current"].append(seconds * 1000)
+            totals["ms"]["candidate"].append(shadow_seconds * 1000)
+        except Exception as e:      # a bad batch must not kill the worker
+            totals["errors"] += 1
+            totals["error"] = str(e)
+
+        if jobs.empty() or time.monotonic() - last_flush >= FLUSH_SECONDS:
+            for totals in pending.values():
+                totals["delta_buckets"] = _bucketed(SHADOW_PROBABILITY_DELTA, np.concatenate(totals.pop("delta") or [[]]))
+                totals["latency_buckets"] = {
+                    release: _bucketed(SHADOW_CPU_SECONDS, np.array(ms) / 1000) for release, ms in totals["ms"].items()
+                }
+            results.put(pending)
+            pending = {}
+            last_flush = time.monotonic()
+
+
+def _max_probability_delta(classes, shadow_classes, probabilities, shadow_probabilities):
+    """Largest absolute probability change per row, matching classes by name."""
+    union = sorted(set(classes) | set(shadow_classes))
+    index = {c: i for i, c in enumerate(union)}
+    aligned = np.zeros((len(probabilities), len(union)))
+    aligned[:, [index[c] for c in classes]] = probabilities
+    aligned[:, [index[c] for c in shadow_classes]] -= shadow_probabilities
+    return np.abs(aligned).max(axis=1, initial=0.0)
@@ -0,0 +1,32 @@
+import os
+import sys
+import sqlite3
+import contextlib
+
+import pytest
+
+# Tests import the backend modules the way app.py and the benchmarks do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    """(path, connect) of an SQLite file with a users table; connect() is a context manager like db.connection."""
+    path = str(tmp_path / "mindgauge.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT UNIQUE, password TEXT, "
+                 "age INTEGER, location TEXT)")
+    conn.executemany("INSERT INTO users (id, name, email, password, age, location) VALUES (?, ?, ?, ?, ?, ?)",
+                     [(1, "Ada", "ada@example.test", "x", 14, "Leeds"), (2, "Bo", "bo@example.test", "x", 34, None)])
+    conn.commit()
+    conn.close()
+
+    @contextlib.contextmanager
+    def connect():
+        c = sqlite3.connect(path)
+        try:
+            yield c
+        finally:
+            c.close()
+
+    return path, connect
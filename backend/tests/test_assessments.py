@@ -0,0 +1,157 @@
+import os
+import time
+
+import pytest
+
+import assessments
+from assessments import LEVEL1, AssessmentWriter
+
+
+def records(user_id=1, n=3):
+    result = {"labels": ["Mild", "Severe", None, "Mild"][:n], "probabilities": [[0.7, 0.3], [0.1, 0.9], None, [0.6, 0.4]][:n],
+              "model_version": 2}
+    rows = [[1.0, 2.0, float("nan")], [4.0, 4.0, 3.0], [float("nan")] * 3, [0.0, 1.0, 1.0]][:n]
+    return assessments.assessment_records(user_id, "children", "sleep", rows, result)
+
+
+def table_counts(connect):
+    with connect() as conn:
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("assessments", "assessment_items")
+        } | {
+            "samples": conn.execute("SELECT COALESCE(SUM(samples), 0) FROM assessment_summaries").fetchone()[0],
+            "rollups": conn.execute("SELECT COALESCE(SUM(assessments), 0) FROM cohort_rollups").fetchone()[0],
+        }
+
+
+@pytest.fixture
+def writer(sqlite_db, tmp_path):
+    _, connect = sqlite_db
+    with connect() as conn:
+        for statement in assessments.SCHEMA["sqlite"] + assessments.analytics.SCHEMA["sqlite"]:
+            conn.execute(statement)
+    return AssessmentWriter(connect, dialect="sqlite", spool_path=str(tmp_path / "spool" / "assessments.jsonl"))
+
+
+def test_records_skip_unscorable_rows():
+    batch = records(n=4)
+    assert [r["label"] for r in batch] == ["Mild", "Severe", "Mild"]
+    assert batch[0]["items"] == [1, 2, None]
+    assert batch[1]["probability"] == 0.9
+    assert len({r["id"] for r in batch}) == 3
+
+
+def test_write_fills_tables_summaries_and_rollups(writer, sqlite_db):
+    _, connect = sqlite_db
+    assert writer.flush(records())
+    assert table_counts(connect) == {"assessments": 2, "assessment_items": 6, "samples": 2, "rollups": 2}
+    with connect() as conn:
+        page, next_cursor = assessments.history(conn, 1, dialect="sqlite")
+    assert len(page) == 2 and next_cursor is None
+
+
+def test_replay_writes_spooled_records_once(writer, sqlite_db):
+    _, connect = sqlite_db
+    batch = records()
+    writer.spool(batch)
+    assert writer.has_spool()
+
+    writer.replay()
+    assert not writer.has_spool()
+    after_replay = table_counts(connect)
+    assert after_replay == {"assessments": 2, "assessment_items": 6, "samples": 2, "rollups": 2}
+
+    # A crash between INSERT and removing the spool replays the same records again
+    writer.spool(batch)
+    writer.replay()
+    assert table_counts(connect) == after_replay
+
+
+def test_replay_skips_rows_already_written(writer, sqlite_db):
+    _, connect = sqlite_db
+    batch = records(n=4)
+    writer.flush(batch[:2])
+    writer.spool(batch)
+    writer.replay()
+    assert table_counts(connect) == {"assessments": 3, "assessment_items": 9, "samples": 3, "rollups": 3}
+
+
+def test_replay_skips_a_torn_last_line(writer, sqlite_db):
+    _, connect = sqlite_db
+    writer.spool(records(n=1))
+    with open(writer.spool_path, "a") as f:
+        f.write('{"id": "torn')
+    writer.replay()
+    assert table_counts(connect)["assessments"] == 1
+    assert not writer.has_spool()
+
+
+def test_failed_write_spools_and_keeps_the_spool_until_replayed(writer, sqlite_db, monkeypatch):
+    _, connect = sqlite_db
+
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("database down")
+
+    monkeypatch.setattr(writer, "write", unavailable)
+    assert not writer.flush(records())
+    writer.replay()
+    assert writer.has_spool()
+
+    monkeypatch.undo()
+    writer.replay()
+    assert not writer.has_spool()
+    assert table_counts(connect)["assessments"] == 2
+
+
+def test_replay_leaves_the_spool_to_the_process_replaying_it(writer, sqlite_db):
+    _, connect = sqlite_db
+    writer.spool(records())
+    with assessments._file_lock(writer.spool_path + ".replay.lock"):
+        writer.replay()
+        assert os.path.exists(writer.spool_path)
+    writer.replay()
+    assert not writer.has_spool()
+    assert table_counts(connect)["assessments"] == 2
+
+
+def test_writer_thread_survives_errors(writer, sqlite_db, monkeypatch):
+    _, connect = sqlite_db
+    failures = []
+
+    def unavailable(batch, replayed=False):
+        raise ConnectionError("database down")
+
+    def broken_spool(batch):
+        failures.append(len(batch))
+        raise OSError("No space left on device")
+
+    # The first batch fails to write and then to spool
+    monkeypatch.setattr(writer, "write", unavailable)
+    monkeypatch.setattr(writer, "spool", broken_spool)
+    writer.submit(records())
+    deadline = time.monotonic() + 5
+    while not failures and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert failures
+
+    monkeypatch.undo()
+    writer._retry_at = 0.0
+    writer.submit(records(user_id=2))
+    deadline = time.monotonic() + 5
+    while table_counts(connect)["assessments"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert writer._thread.is_alive()
+    assert table_counts(connect)["assessments"] == 2
+
+
+def test_summary_keeps_level1_referrals(writer, sqlite_db):
+    _, connect = sqlite_db
+    features = assessments.inference.LEVEL1_FEATURES["children"]
+    rows = [[2.0] * len(features)]
+    result = {"labels": ["Refer"], "probabilities": [[1.0]], "referrals": [[features[0]]], "model_version": None}
+    writer.flush(assessments.assessment_records(1, "children", LEVEL1, rows, result))
+    with connect() as conn:
+        summary = assessments.summary(conn, 1, dialect="sqlite")
+    assert summary["children"][LEVEL1]["referrals"] == [features[0]]
+    assert summary["children"][features[0]]["latest_score"] == 2
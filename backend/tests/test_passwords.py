@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+import passwords
+from passwords import LoginHasher, Overloaded
+
+
+@pytest.fixture(autouse=True)
+def cheap_scrypt(monkeypatch):
+    # The format and checks are the same at any cost; the default n makes each hash ~50 ms
+    monkeypatch.setattr(passwords, "SCRYPT_N", 2 ** 8)
+
+
+def test_hash_and_verify():
+    stored = passwords.hash_password("correct horse")
+    assert stored.startswith(f"scrypt${2 ** 8}$8$1$")
+    assert passwords.is_hashed(stored)
+    assert passwords.verify(stored, "correct horse")
+    assert not passwords.verify(stored, "wrong horse")
+    assert stored != passwords.hash_password("correct horse")      # salted
+
+
+def test_unusable_and_malformed_hashes_never_verify():
+    assert not passwords.verify(passwords.UNUSABLE, "!")
+    assert not passwords.verify(None, "")
+    assert not passwords.verify("scrypt$x$8$1$salt$hash", "anything")
+    assert not passwords.verify(passwords.hash_password("pw"), None)
+    assert not passwords.needs_rehash(passwords.UNUSABLE)
+
+
+def test_legacy_plaintext_verifies_and_needs_rehash():
+    assert passwords.verify("hunter2", "hunter2")
+    assert not passwords.verify("hunter2", "hunter3")
+    assert passwords.needs_rehash("hunter2")
+    assert not passwords.needs_rehash(passwords.hash_password("hunter2"))
+
+
+def test_changed_cost_needs_rehash(monkeypatch):
+    stored = passwords.hash_password("pw")
+    monkeypatch.setattr(passwords, "SCRYPT_N", 2 ** 9)
+    assert passwords.needs_rehash(stored)
+    assert passwords.verify(stored, "pw")       # old parameters still verify
+
+
+def test_hash_many_marks_missing_passwords_unusable():
+    stored = passwords.hash_many(["a", None, "b"])
+    assert stored[1] == passwords.UNUSABLE
+    assert passwords.verify(stored[0], "a") and passwords.verify(stored[2], "b")
+
+
+def test_login_upgrades_plaintext_in_the_background():
+    hasher = LoginHasher(workers=1, max_pending=2)
+    saved, done = [], threading.Event()
+
+    def save(new_hash):
+        saved.append(new_hash)
+        done.set()
+        return True
+
+    assert hasher.verify("hunter2", "hunter2")
+    hasher.upgrade("hunter2", "hunter2", save)
+    assert done.wait(5)
+    assert passwords.is_hashed(saved[0]) and passwords.verify(saved[0], "hunter2")
+
+    hasher.upgrade(saved[0], "hunter2", lambda new_hash: pytest.fail("current hash was rehashed"))
+
+
+def test_unknown_user_is_checked_against_a_dummy_hash():
+    hasher = LoginHasher(workers=1, max_pending=2)
+    assert not hasher.verify(None, "anything")
+    assert passwords.is_hashed(hasher._dummy)
+
+
+def test_full_pool_refuses_at_once():
+    hasher = LoginHasher(workers=1, max_pending=2)
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def blocked(*args):
+        started.release()
+        release.wait(5)
+        return True
+
+    # Two slots taken by slow work; a third request must not queue behind them
+    futures = [hasher._submit(blocked) for _ in range(2)]
+    assert started.acquire(timeout=5)
+    assert hasher.pending() == 2
+    with pytest.raises(Overloaded):
+        hasher.verify("hunter2", "hunter2")
+    with pytest.raises(Overloaded):
+        hasher.hash("pw")
+
+    deferred = []
+    hasher.upgrade("hunter2", "hunter2", deferred.append)
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    assert deferred == []
+    assert hasher.verify("hunter2", "hunter2")
+    assert hasher.pending() == 0
+
+
+def test_slow_hash_times_out_as_overloaded(monkeypatch):
+    monkeypatch.setattr(passwords, "WAIT_SECONDS", 0.05)
+    hasher = LoginHasher(workers=1, max_pending=1)
+    release = threading.Event()
+    future = hasher._submit(lambda: release.wait(5))
+    with pytest.raises(Overloaded):
+        hasher._wait(future)
+    release.set()
@@ -0,0 +1,84 @@
+import cProfile
+import json
+import os
+
+import pytest
+from flask import Flask, jsonify, request
+
+import profiling
+from profiling import ProfileStore
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = Flask(__name__)
+
+    def authorize():
+        if request.headers.get("Authorization") == "Bearer staff":
+            return {"role": "clinician"}, None
+        return None, (jsonify({"status": "forbidden"}), 403)
+
+    @app.get("/ping")
+    def ping():
+        return "pong"
+
+    @app.get("/boom")
+    def boom():
+        raise RuntimeError("boom")
+
+    store = profiling.install(app, authorize, store=ProfileStore(str(tmp_path)), sample_rate=0)
+    return app.test_client(), store
+
+
+def test_profile_header_and_summary_need_a_staff_token(client):
+    client, store = client
+    response = client.get("/ping", headers={"X-Profile": "1", "X-Request-ID": "mine"})
+    assert response.status_code == 200 and "X-Request-ID" not in response.headers
+    assert store.recent() == []
+    assert client.get("/debug/profiles").status_code == 403
+
+    staff = {"Authorization": "Bearer staff"}
+    response = client.get("/ping", headers={"X-Profile": "1", "X-Request-ID": "mine", **staff})
+    assert response.headers["X-Request-ID"] == "mine"
+    captures = client.get("/debug/profiles", headers=staff).get_json()["captures"]
+    assert [(c["id"], c["endpoint"], c["status"]) for c in captures] == [("mine", "/ping", 200)]
+
+
+def test_profiler_is_stopped_when_a_request_raises(client):
+    client, _ = client
+    client.application.config["PROPAGATE_EXCEPTIONS"] = True
+    with pytest.raises(RuntimeError):
+        client.get("/boom", headers={"X-Profile": "1", "Authorization": "Bearer staff"})
+    # A profiler left enabled would make this one fail ("Another profiling tool is already active")
+    assert client.get("/ping", headers={"X-Profile": "1", "Authorization": "Bearer staff"}).status_code == 200
+
+
+def test_recent_reads_the_tail_of_the_index(tmp_path):
+    store = ProfileStore(str(tmp_path))
+    with open(tmp_path / profiling.INDEX_FILE, "w") as f:
+        for i in range(3000):
+            f.write(json.dumps({"id": i, "kind": "request", "duration_ms": i, "pad": "x" * 50}) + "\n")
+    assert [e["id"] for e in store.recent(limit=5)] == [2995, 2996, 2997, 2998, 2999]
+    assert [e["id"] for e in store.recent(limit=5000)] == list(range(3000))
+    assert profiling._tail(str(tmp_path / profiling.INDEX_FILE), 2, block=7) == [
+        json.dumps({"id": i, "kind": "request", "duration_ms": i, "pad": "x" * 50}) for i in (2998, 2999)
+    ]
+
+
+def profiled():
+    profiler = cProfile.Profile()
+    profiler.runcall(sorted, range(10))
+    return profiler
+
+
+def test_old_captures_are_pruned(tmp_path):
+    store = ProfileStore(str(tmp_path), max_captures=10)
+    for i in range(11):
+        store.save(profiled(), 0.001, f"c{i:02d}", "request")
+    assert len([n for n in os.listdir(tmp_path) if n.endswith(".prof")]) == 11
+
+    # A tenth over the cap: back down to the newest 10
+    store.save(profiled(), 0.001, "c11", "request")
+    names = sorted(n for n in os.listdir(tmp_path) if n.endswith(".prof"))
+    assert [n.split("_")[1] for n in names] == [f"c{i:02d}" for i in range(2, 12)]
+    assert [e["id"] for e in store.recent()] == [f"c{i:02d}" for i in range(2, 12)]
@@ -0,0 +1,118 @@
+import pytest
+
+import passwords
+import roster
+import tokens
+from tokens import TokenKeys
+
+ROSTER = [
+    {"name": "Cy", "email": "cy@example.test", "password": "pw1", "age": "15", "location": "York"},
+    {"name": "Di", "email": "DI@example.test ", "age": 40},                                 # no password
+    {"name": "Ada again", "email": "ada@example.test", "password": "pw2"},                  # already a user
+    {"name": "Cy twice", "email": "Cy@Example.test", "password": "pw3"},                    # earlier in the file
+    {"name": "", "email": "nameless@example.test"},
+    {"name": "Ed", "email": "not-an-email"},
+    {"name": "Fay", "email": "fay@example.test", "age": 200},
+    "not a row",
+]
+OUTCOMES = ["created", "created", "email_exists", "duplicate_in_file", "invalid", "invalid", "invalid", "invalid"]
+
+
+@pytest.fixture(autouse=True)
+def cheap_scrypt(monkeypatch):
+    monkeypatch.setattr(passwords, "SCRYPT_N", 2 ** 8)
+
+
+def users(connect):
+    with connect() as conn:
+        return {row[1]: row for row in conn.execute("SELECT id, email, name, password, age, location FROM users")}
+
+
+def test_mixed_roster_outcomes(sqlite_db):
+    _, connect = sqlite_db
+    with connect() as conn:
+        results = roster.import_users(conn, ROSTER, "sqlite", chunk_rows=3)
+
+    assert [r["status"] for r in results] == OUTCOMES
+    assert [r["row"] for r in results] == list(range(len(ROSTER)))
+    assert roster.counts(results) == {"created": 2, "email_exists": 1, "duplicate_in_file": 1, "invalid": 4}
+    assert [r["error"] for r in results if r["status"] == "invalid"] == [
+        "name is required", "email is missing or invalid", "age must be 0-120", "row is not an object",
+    ]
+
+    stored = users(connect)
+    assert len(stored) == 4
+    user_id, _, name, password, age, location = stored["cy@example.test"]
+    assert (name, age, location) == ("Cy", 15, "York") and passwords.verify(password, "pw1")
+    assert stored["di@example.test"][3] == passwords.UNUSABLE
+    assert stored["ada@example.test"][2] == "Ada"      # not overwritten
+    assert [(r["email"], r["user_id"]) for r in results if r["status"] == "created"] == [
+        ("cy@example.test", user_id), ("di@example.test", stored["di@example.test"][0]),
+    ]
+
+
+def test_second_import_of_the_same_roster(sqlite_db):
+    _, connect = sqlite_db
+    with connect() as conn:
+        roster.import_users(conn, ROSTER, "sqlite")
+        again = roster.import_users(conn, ROSTER, "sqlite")
+
+    assert [r["status"] for r in again] == [
+        "email_exists", "email_exists", "email_exists", "duplicate_in_file", "invalid", "invalid", "invalid", "invalid",
+    ]
+    assert len(users(connect)) == 4
+
+
+def test_email_registered_during_the_import(sqlite_db, monkeypatch):
+    """INSERT IGNORE skips a row registered after the lookup; the hash check reports it as existing."""
+    _, connect = sqlite_db
+    monkeypatch.setattr(roster, "_existing", lambda cursor, emails, dialect: set())
+    with connect() as conn:
+        results = roster.import_users(conn, ROSTER[:3], "sqlite")
+    assert [r["status"] for r in results] == ["created", "created", "email_exists"]
+    assert "user_id" not in results[2]
+    assert users(connect)["ada@example.test"][3] == "x"
+
+
+def test_parse_csv_and_json():
+    csv_rows = roster.parse(b"\xef\xbb\xbfname,email,age,extra\nCy,cy@example.test,15,x\nDi,di@example.test,,\n",
+                            "text/csv")
+    assert csv_rows == [{"name": "Cy", "email": "cy@example.test", "age": "15"},
+                        {"name": "Di", "email": "di@example.test", "age": None}]
+    assert roster.parse(b'{"users": [{"email": "a@b"}]}') == roster.parse(b'[{"email": "a@b"}]')
+    for body, content_type in ((b"name\nCy\n", "text/csv"), (b"{", "application/json"), (b'{"x": 1}', "application/json")):
+        with pytest.raises(roster.InvalidRoster):
+            roster.parse(body, content_type)
+
+
+@pytest.fixture
+def client(sqlite_db, monkeypatch):
+    path, _ = sqlite_db
+    import app
+    import db
+    monkeypatch.setattr(db, "SQLITE_PATH", path)
+    monkeypatch.setattr(db, "DIALECT", "sqlite")
+    monkeypatch.setattr(tokens, "KEYS", TokenKeys("k1:roster-secret"))
+    return app.app.test_client()
+
+
+def test_import_route_needs_an_admin_token(client, sqlite_db):
+    _, connect = sqlite_db
+    body = "name,email,password\nCy,cy@example.test,pw1\nAda,ada@example.test,pw2\n"
+
+    def post(token=None):
+        headers = {"Content-Type": "text/csv"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        return client.post("/users/import", data=body, headers=headers)
+
+    assert post().status_code == 401
+    assert post("not-a-token").status_code == 401
+    assert post(tokens.issue(1, 14)["accessToken"]).status_code == 403
+    assert post(tokens.issue_staff("dr", "clinician")).status_code == 403
+    assert len(users(connect)) == 2
+
+    response = post(tokens.issue_staff("ops", "admin"))
+    assert response.status_code == 200
+    assert response.get_json()["counts"] == {"created": 1, "email_exists": 1}
+    assert "cy@example.test" in users(connect)
@@ -0,0 +1,17 @@
+import json
+
+import numpy as np
+
+from rule_audit import RuleAuditor
+
+
+def test_disagreements_are_json_serializable():
+    auditor = RuleAuditor(lambda population, domain, rows: ["Low", "High"], sample_rate=1.0)
+    rows = [np.array([1.0, np.nan, 3.0]), np.array([4.0, 4.0, np.nan])]
+    auditor.audit("adult", "somatic", rows, ["Low", "Medium"])
+
+    summary = json.loads(json.dumps(auditor.summary()))
+    assert summary["adult/somatic"]["rows"] == 2 and summary["adult/somatic"]["disagreements"] == 1
+    assert summary["adult/somatic"]["recent_disagreements"] == [
+        {"scores": [4.0, 4.0, None], "rule": "Medium", "model": "High"}
+    ]
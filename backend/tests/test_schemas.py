@@ -0,0 +1,113 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+import schemas
+from schemas import InvalidPayload, Matrix, Schema
+
+needs_msgspec = pytest.mark.skipif(schemas.msgspec is None, reason="msgspec is not installed")
+
+
+def rows_of(n_rows, n_items, values, seed=5):
+    rng = random.Random(seed)
+    return [[rng.choice(values) for _ in range(n_items)] for _ in range(n_rows)]
+
+
+def expected(rows):
+    return np.array([[np.nan if v is None else v for v in row] for row in rows], dtype=np.float64)
+
+
+def score_body(rows, **dumps):
+    return json.dumps({"domain": "sleep", "scores": rows}, **dumps).encode()
+
+
+MATRICES = {
+    "digits": rows_of(200, 12, [0, 1, 2, 3, 4]),
+    "digits and nulls": rows_of(200, 12, [0, 1, 2, 3, 4, None]),
+    "all null": [[None] * 6 for _ in range(100)],
+    "one item": rows_of(300, 1, [0, 4]),
+    "multi-digit": rows_of(200, 12, [0, 1, 2, 3, 4, 10, 27]),
+    "floats": rows_of(200, 12, [0, 1.5, 2, None]),
+    "negative": rows_of(200, 12, [0, 1, -1]),
+    "small": [[1, 2], [3, None]],
+}
+
+
+@needs_msgspec
+@pytest.mark.parametrize("name", MATRICES)
+@pytest.mark.parametrize("separators", [(",", ":"), (", ", ": ")], ids=["compact", "spaced"])
+def test_score_matrix_matches_msgspec(name, separators):
+    rows = MATRICES[name]
+    body = score_body(rows, separators=separators)
+    matrix = schemas.SCORE.decode(body).scores
+    assert matrix.dtype == np.float64 and matrix.shape == (len(rows), len(rows[0]))
+    assert np.array_equal(matrix, expected(rows), equal_nan=True)
+    assert np.array_equal(matrix, schemas._rows_matrix(schemas._ROWS.decode(json.dumps(rows))), equal_nan=True)
+
+
+@needs_msgspec
+def test_fast_path_takes_single_digit_bodies_only():
+    text = json.dumps(MATRICES["digits and nulls"], separators=(",", ":")).encode()
+    assert len(text) >= schemas.SMALL_MATRIX_BYTES
+    assert np.array_equal(schemas._single_digit_matrix(text), expected(MATRICES["digits and nulls"]), equal_nan=True)
+    for name in ("multi-digit", "floats", "negative"):
+        assert schemas._single_digit_matrix(json.dumps(MATRICES[name], separators=(",", ":")).encode()) is None
+
+
+@needs_msgspec
+@pytest.mark.parametrize("rows", [
+    [[1, 2, 3]] * 100 + [[1, 2]],
+    [[1, 2]] + [[1, 2, 3]] * 100,
+    [[1, 2, 3]] * 50 + [[1, 2, 3, 4]] + [[1, 2, 3]] * 50,
+    [[1, 2, 3]] * 50 + [[None, 2]] + [[1, 2, 3]] * 50,
+    [[1, 2, 3]] * 50 + [[1, 234]] + [[1, 2, 3]] * 50,
+], ids=["short last", "short first", "long middle", "short null", "equal bytes"])
+def test_ragged_rows_are_refused(rows):
+    with pytest.raises(InvalidPayload, match="equal length"):
+        schemas.SCORE.decode(score_body(rows, separators=(",", ":")))
+
+
+@needs_msgspec
+@pytest.mark.parametrize("scores", ["[]", '[["1"]]', "[[true]]", "[1, 2]", '"x"'])
+def test_bad_score_matrices_are_refused(scores):
+    with pytest.raises(InvalidPayload):
+        schemas.SCORE.decode(b'{"domain": "sleep", "scores": ' + scores.encode() + b"}")
+
+
+def test_fields_are_validated():
+    assert schemas.LOGIN.decode(b'{"email": "a@b", "password": "pw"}').email == "a@b"
+    with pytest.raises(InvalidPayload, match="not valid JSON"):
+        schemas.LOGIN.decode(b"email=a@b")
+    with pytest.raises(InvalidPayload, match="password"):
+        schemas.LOGIN.decode(b'{"email": "a@b"}')
+    with pytest.raises(InvalidPayload, match="user_id"):
+        schemas.SCORE.decode(b'{"domain": "sleep", "scores": [[1]], "user_id": true}')
+    assert schemas.SCORE.decode(b'{"domain": "sleep", "scores": [[1]]}').user_id is None
+
+
+def test_partial_schema_sets_given_fields_only():
+    assert vars(schemas.PROFILE.decode(b"{}")) == {}
+    assert vars(schemas.PROFILE.decode(b'{"age": null}')) == {"age": None}
+    assert vars(schemas.PROFILE.decode(b'{"name": "Ann", "age": 15}')) == {"name": "Ann", "age": 15}
+    with pytest.raises(InvalidPayload, match="name"):
+        schemas.PROFILE.decode(b'{"name": null}')
+
+
+def test_stdlib_fallback(monkeypatch):
+    """Without msgspec a Schema gives the same results and refusals from json.loads."""
+    monkeypatch.setattr(schemas, "msgspec", None)
+    score = Schema("ScoreRequest", domain=str, scores=Matrix, user_id=(int, None))
+    profile = Schema("ProfileRequest", partial=True, name=str, age=(int, None))
+
+    for rows in MATRICES.values():
+        assert np.array_equal(score.decode(score_body(rows)).scores, expected(rows), equal_nan=True)
+    for body in (b"not json", b"[]", b'{"scores": [[1]]}', b'{"domain": "sleep", "scores": [[1], [1, 2]]}',
+                 b'{"domain": "sleep", "scores": [[true]]}', b'{"domain": "sleep", "scores": [[1]], "user_id": "3"}'):
+        with pytest.raises(InvalidPayload):
+            score.decode(body)
+
+    assert vars(profile.decode(b'{"age": null}')) == {"age": None}
+    with pytest.raises(InvalidPayload, match="name"):
+        profile.decode(b'{"name": null}')
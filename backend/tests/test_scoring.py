@@ -0,0 +1,27 @@
+import pytest
+
+import scoring
+from scoring import LEVEL1, inference
+
+
+@pytest.mark.parametrize("domain, explain", [("somatic", 0), ("somatic", 2), (LEVEL1, 0), (LEVEL1, 2)])
+def test_one_model_per_call_across_a_release_swap(monkeypatch, domain, explain):
+    """A swap between loads must not pair one release's probabilities with another's version."""
+    population = "adult"
+    current = scoring.ensure_loaded(population, domain)
+    swapped = {**current, "version": "swapped", "classes": current["classes"][::-1], "release": "swapped"}
+    loads = []
+
+    def load(*args):
+        loads.append(args)
+        return current if len(loads) == 1 else swapped
+
+    monkeypatch.setattr(inference, "load_level1_model" if domain == LEVEL1 else "load_domain_model", load)
+    monkeypatch.setattr(scoring.AUDITOR, "sample_rate", 0)
+    n_items = len(current["feature_names"] if domain == LEVEL1 else current["item_names"])
+    result = scoring.score(population, domain, [[1] * n_items, [3] * n_items], explain=explain)
+
+    assert len(loads) == 1
+    assert result["model_version"] == current["version"]
+    assert result["classes"] == list(current["classes"])
+    assert result["labels"] == [current["classes"][row.index(max(row))] for row in result["probabilities"]]
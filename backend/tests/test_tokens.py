@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+import tokens
+from tokens import InvalidToken, TokenKeys
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    keys = TokenKeys("k2:second-secret,k1:first-secret")
+    monkeypatch.setattr(tokens, "KEYS", keys)
+    return keys
+
+
+def test_issue_and_verify(keys):
+    issued = tokens.issue(7, 14)
+    access = tokens.verify(issued["accessToken"])
+    assert access["sub"] == 7 and access["pop"] == "children" and access["typ"] == "access"
+    assert access["exp"] - access["iat"] == tokens.ACCESS_SECONDS == issued["expiresIn"]
+    refresh = tokens.verify(issued["refreshToken"], "refresh")
+    assert refresh["sub"] == 7 and "pop" not in refresh
+
+
+def test_token_types_are_not_interchangeable(keys):
+    issued = tokens.issue(7, 30)
+    with pytest.raises(InvalidToken, match="refresh"):
+        tokens.verify(issued["accessToken"], "refresh")
+    with pytest.raises(InvalidToken, match="access"):
+        tokens.verify(issued["refreshToken"])
+
+
+def test_expired_tokens_are_refused(keys):
+    issued = tokens.issue(7, 30, now=time.time() - tokens.ACCESS_SECONDS - tokens.LEEWAY_SECONDS - 5)
+    with pytest.raises(InvalidToken, match="expired"):
+        tokens.verify(issued["accessToken"])
+    tokens.verify(issued["refreshToken"], "refresh")
+
+    # Within the leeway still accepted; the expiry is checked again on cached tokens
+    fresh = tokens.issue(8, 30, now=time.time() - tokens.ACCESS_SECONDS - 1)["accessToken"]
+    assert tokens.verify(fresh)["sub"] == 8
+    keys._verified[fresh]["exp"] -= tokens.LEEWAY_SECONDS + 5
+    with pytest.raises(InvalidToken, match="expired"):
+        tokens.verify(fresh)
+
+
+def test_tampered_and_malformed_tokens(keys):
+    header, payload, signature = tokens.issue(7, 30)["accessToken"].split(".")
+    other_payload = tokens.issue(8, 30)["accessToken"].split(".")[1]
+    with pytest.raises(InvalidToken, match="Bad signature"):
+        tokens.verify(".".join((header, other_payload, signature)))
+    for token in (None, "", "a.b", "a.b.c.d", f"{header}.{payload}.!!"):
+        with pytest.raises(InvalidToken):
+            tokens.verify(token)
+
+
+def test_key_rotation(keys):
+    # Signed with the first key; every listed key verifies
+    assert keys.signing_header == TokenKeys("k2:x").signing_header
+    old = TokenKeys("k1:first-secret")
+    token = old.sign({"typ": "access", "sub": 7, "exp": int(time.time()) + 60})
+    assert keys.verify(token)["sub"] == 7
+
+    # Once k1 is dropped, its tokens stop verifying; a wrong secret under a known kid is a bad signature
+    with pytest.raises(InvalidToken, match="Unknown signing key"):
+        TokenKeys("k2:second-secret").verify(token)
+    with pytest.raises(InvalidToken, match="Bad signature"):
+        TokenKeys("k1:other-secret").verify(token)
+
+
+def test_bad_key_spec():
+    with pytest.raises(ValueError):
+        TokenKeys("no-secret")
+
+
+def test_bearer_header(keys):
+    token = tokens.issue(7, 30)["accessToken"]
+    assert tokens.bearer(None) is None
+    assert tokens.bearer(f"Bearer {token}")["sub"] == 7
+    assert tokens.bearer(f"bearer  {token}")["sub"] == 7
+    with pytest.raises(InvalidToken):
+        tokens.bearer(f"Basic {token}")
+    with pytest.raises(InvalidToken):
+        tokens.bearer("Bearer ")
+
+
+def test_staff_tokens(keys):
+    claims = tokens.verify(tokens.issue_staff("dr.okafor", "clinician"))
+    assert claims["sub"] == "staff:dr.okafor" and claims["role"] == "clinician" and "pop" not in claims
+    with pytest.raises(ValueError):
+        tokens.issue_staff("someone", "root")
+
+
+@pytest.mark.parametrize("age, population", [(10, "adult"), (11, "children"), (17, "children"), (18, "adult"),
+                                             ("15", "children"), (None, "adult"), ("n/a", "adult")])
+def test_population_for_age(age, population):
+    assert tokens.population_for_age(age) == population
@@ -0,0 +1,173 @@
+import os
+import hmac
+import json
+import time
+import uuid
+import base64
+import hashlib
+
+# ==============================================================================
+# SIGNED SESSION TOKENS (HS256 JWTs, stdlib only)
+# ==============================================================================
+#
+# /login returns a short-lived access token and a long-lived refresh token. The
+# access token carries the user id and the population their age maps to, so an
+# authenticated request is identified and routed without a database read; only
+# /token/refresh (every ACCESS_SECONDS at most) reads the user row again.
+#
+# Keys come from MINDGAUGE_TOKEN_KEYS, "kid:secret[,kid:secret...]": the first
+# signs, all verify, so a key is rotated by prepending a new one and dropping the
+# old one once its tokens have expired. Each key's HMAC state and the header
+# segment naming it are built once (TokenKeys), so verifying a new token is one
+# dict lookup, a copy of a keyed HMAC, a digest compare and one json.loads.
+# Tokens whose signature checked out are remembered (VERIFIED_CACHE_SIZE), so a
+# client's later requests with the same token only pay the type and expiry checks.
+#
+# Clinic staff have no user row: their access tokens are issued from the command
+# line and carry a role instead of a population ("clinician" reads any user's
+# history and the cohort reports, "admin" also imports rosters):
+#
+#   python tokens.py --role clinician --subject dr.okafor [--days 7]
+
+ACCESS_SECONDS = int(os.environ.get("MINDGAUGE_ACCESS_TOKEN_SECONDS", "900"))
+REFRESH_SECONDS = int(os.environ.get("MINDGAUGE_REFRESH_TOKEN_SECONDS", str(30 * 86400)))
+LEEWAY_SECONDS = 30
+VERIFIED_CACHE_SIZE = 10_000
+STAFF_SECONDS = int(os.environ.get("MINDGAUGE_STAFF_TOKEN_SECONDS", str(7 * 86400)))
+STAFF_ROLES = ("clinician", "admin")
+ADULT_AGE = 18
+CHILDREN_MIN_AGE = 11
+
+
+class InvalidToken(Exception):
+    """Malformed, wrongly signed, expired or of the wrong type."""
+
+
+def population_for_age(age):
+    """The questionnaire population, as the app picks it (mapAgeToQuestionnaire)."""
+    try:
+        age = int(age)
+    except (TypeError, ValueError):
+        return "adult"
+    return "children" if CHILDREN_MIN_AGE <= age < ADULT_AGE else "adult"
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+
+class TokenKeys:
+
+    def __init__(self, spec):
+        self.signing_header = None
+        self._macs = {}         # header segment -> keyed HMAC, copied per token
+        self._verified = {}     # token -> claims, for tokens with a valid signature
+        for entry in spec.split(","):
+            kid, _, secret = entry.strip().partition(":")
+            if not kid or not secret:
+                raise ValueError("MINDGAUGE_TOKEN_KEYS must be 'kid:secret[,kid:secret...]'")
+            header = _b64encode(json.dumps({"alg": "HS256", "typ": "JWT", "kid": kid}, separators=(",", ":")).encode())
+            self._macs[header] = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+            self.signing_header = self.signing_header or header
+
+    def _signature(self, header, payload):
+        mac = self._macs[header].copy()
+        mac.update(header + b"." + payload)
+        return mac.digest()
+
+    def sign(self, claims):
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+        signature = _b64encode(self._signature(self.signing_header, payload))
+        return b".".join((self.signing_header, payload, signature)).decode()
+
+    def verify(self, token, token_type="access"):
+        """The token's claims; raises InvalidToken."""
+        claims = self._verified.get(token)
+        if claims is None:
+            claims = self._check_signature(token)
+            if len(self._verified) >= VERIFIED_CACHE_SIZE:
+                self._verified.clear()
+            self._verified[token] = claims
+        if claims.get("typ") != token_type:
+            raise InvalidToken(f"Expected a {token_type} token")
+        if not isinstance(claims.get("exp"), int) or claims["exp"] + LEEWAY_SECONDS < time.time():
+            raise InvalidToken("Token expired")
+        return claims
+
+
+    def _check_signature(self, token):
+        try:
+            header, payload, signature = token.encode().split(b".")
+        except (AttributeError, ValueError):
+            raise InvalidToken("Malformed token") from None
+        if header not in self._macs:
+            raise InvalidToken("Unknown signing key")
+        try:
+            valid = hmac.compare_digest(self._signature(header, payload), _b64decode(signature))
+            claims = json.loads(_b64decode(payload)) if valid else None
+        except ValueError:
+            raise InvalidToken("Malformed token") from None
+        if not valid:
+            raise InvalidToken("Bad signature")
+        if not isinstance(claims, dict):
+            raise InvalidToken("Malformed token")
+        return claims
+
+
+def _keys_from_environment():
+    spec = os.environ.get("MINDGAUGE_TOKEN_KEYS")
+    if not spec:
+        print("MINDGAUGE_TOKEN_KEYS is not set: signing with a random key; tokens will not survive a "
+              "restart or be accepted by other workers")
+        spec = f"dev:{base64.b64encode(os.urandom(32)).decode()}"
+    return TokenKeys(spec)
+
+
+KEYS = _keys_from_environment()
+
+
+def issue(user_id, age, now=None):
+    """Access and refresh token for a user: {"accessToken", "refreshToken", "expiresIn"}."""
+    now = int(now or time.time())
+    access = {"typ": "access", "sub": user_id, "pop": population_for_age(age), "iat": now, "exp": now + ACCESS_SECONDS}
+    refresh = {"typ": "refresh", "sub": user_id, "jti": uuid.uuid4().hex, "iat": now, "exp": now + REFRESH_SECONDS}
+    return {"accessToken": KEYS.sign(access), "refreshToken": KEYS.sign(refresh), "expiresIn": ACCESS_SECONDS}
+
+
+def issue_staff(subject, role, seconds=STAFF_SECONDS, now=None):
+    """Access token for a staff member; its "sub" is "staff:<subject>", so it never matches a user id."""
+    if role not in STAFF_ROLES:
+        raise ValueError(f"role must be one of {', '.join(STAFF_ROLES)}")
+    now = int(now or time.time())
+    return KEYS.sign({"typ": "access", "sub": f"staff:{subject}", "role": role, "iat": now, "exp": now + seconds})
+
+
+def verify(token, token_type="access"):
+    return KEYS.verify(token, token_type)
+
+
+def bearer(authorization):
+    """Claims of an "Authorization: Bearer <access token>" header; None without one."""
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise InvalidToken("Expected 'Authorization: Bearer <token>'")
+    return verify(token.strip())
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Issue a staff access token (signed with MINDGAUGE_TOKEN_KEYS).")
+    parser.add_argument("--role", choices=STAFF_ROLES, required=True)
+    parser.add_argument("--subject", required=True, help="who the token is for, e.g. a staff login name")
+    parser.add_argument("--days", type=float, default=STAFF_SECONDS / 86400)
+    args = parser.parse_args()
+    if not os.environ.get("MINDGAUGE_TOKEN_KEYS"):
+        raise SystemExit("Set MINDGAUGE_TOKEN_KEYS to the server's keys first.")
+    print(issue_staff(args.subject, args.role, int(args.days * 86400)))
@@ -0,0 +1,101 @@
+# bench_cold_start.py
+import sys
+import os
+import time
+import argparse
+import subprocess
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+ml_backend_dir = os.path.join(current_dir, '..')
+
+# ==============================================================================
+# COLD START: process start -> first prediction
+# ==============================================================================
+#
+# Each variant runs in a fresh interpreter and is timed from the outside, so the
+# numbers include interpreter startup, imports, model loading and one prediction.
+#   slim runtime : import inference; compiled forest + metadata (NumPy only)
+#   legacy       : the old predictor path (joblib + LightGBM booster + LabelEncoder)
+# The -X importtime report of the slim runtime is summarized below the timings.
+
+TARGET_MS = 150
+
+SLIM_SNIPPET = """
+import sys
+sys.path.insert(0, {ml_backend!r})
+import inference
+label = inference.predict_severity('children', 'sleep', [3, 4, 2, 5, 1, 2, 3, 4])
+heavy = sorted(m for m in ('lightgbm', 'sklearn', 'pandas', 'joblib', 'scipy') if m in sys.modules)
+print(label, '|', ','.join(heavy) or '-')
+"""
+
+LEGACY_SNIPPET = """
+import sys, joblib, numpy as np, pandas as pd
+model = joblib.load({model!r})
+le = joblib.load({encoder!r})
+# Same respondent as the slim snippet, reverse scored with TR/PS appended by hand
+X = pd.DataFrame([[3, 2, 4, 5, 1, 2, 3, 2, 22, 22]], columns=model.feature_name())
+label = le.inverse_transform([np.argmax(model.predict(X)[0])])[0]
+heavy = sorted(m for m in ('lightgbm', 'sklearn', 'pandas', 'joblib', 'scipy') if m in sys.modules)
+print(label, '|', ','.join(heavy))
+"""
+
+
+def run_cold(snippet, runs, extra_args=()):
+    """Best and median wall time (ms) over fresh interpreters, plus the last stdout/stderr."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-W', 'ignore', *extra_args, '-c', snippet],
+                              capture_output=True, text=True, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[0], times[len(times) // 2], proc.stdout.strip(), proc.stderr
+
+
+def importtime_report(stderr, top):
+    """Top-level imports sorted by cumulative time from a `python -X importtime` log."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        self_us, cumulative_us, raw_name = line.split(':', 1)[1].split('|')
+        # Nesting is encoded as extra leading spaces in the name column; keep top-level modules only
+        if not self_us.strip().isdigit() or raw_name.startswith('  '):
+            continue
+        rows.append((int(cumulative_us), raw_name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure process start to first prediction.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    model_dir = os.path.join(ml_backend_dir, 'models', 'children_model')
+    slim = SLIM_SNIPPET.format(ml_backend=os.path.abspath(ml_backend_dir))
+    legacy = LEGACY_SNIPPET.format(model=os.path.join(model_dir, 'sleep_lgbm_model.pkl'),
+                                   encoder=os.path.join(model_dir, 'sleep_label_encoder.pkl'))
+
+    # Warm-up: compiles the forest if it is missing or stale and fills the OS page cache
+    run_cold(slim, 1)
+
+    baseline = run_cold('pass', args.runs)
+    slim_best, slim_median, slim_out, _ = run_cold(slim, args.runs)
+    legacy_best, legacy_median, legacy_out, _ = run_cold(legacy, max(3, args.runs // 3))
+    _, _, _, importtime = run_cold(slim, 1, extra_args=('-X', 'importtime'))
+
+    print("=" * 70)
+    print(f"{'':22s}{'best':>10s}{'median':>10s}   prediction | heavy modules loaded")
+    print(f"{'empty interpreter':22s}{baseline[0]:8.1f}ms{baseline[1]:8.1f}ms")
+    print(f"{'slim runtime':22s}{slim_best:8.1f}ms{slim_median:8.1f}ms   {slim_out}")
+    print(f"{'legacy predictor':22s}{legacy_best:8.1f}ms{legacy_median:8.1f}ms   {legacy_out}")
+    print("-" * 70)
+    print(f"target < {TARGET_MS} ms: {'met' if slim_median < TARGET_MS else 'NOT met'} (median)")
+    print("-" * 70)
+    print("slim runtime, -X importtime (top-level modules, cumulative):")
+    for cumulative_us, name in importtime_report(importtime, args.top):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+    print("=" * 70)
@@ -0,0 +1,73 @@
+# bench_data_loading.py
+import sys
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, '..', 'training'))
+
+from data_cache import load_scores, build_cache
+
+# ==============================================================================
+# SYNTHETIC EXPORT: CSV text parse vs. columnar cache
+# ==============================================================================
+
+DEFAULT_TEMPLATE = os.path.join(current_dir, '..', 'data', 'adult_scores', 'depression_scores.csv')
+
+
+def make_synthetic_export(template_path, n_rows, out_path, seed=0):
+    """Writes n_rows of random 1-5 item responses using the template's header and labels."""
+    template = pd.read_csv(template_path)
+    rng = np.random.default_rng(seed)
+
+    item_cols = template.columns[1:-3]
+    items = rng.integers(1, 6, size=(n_rows, len(item_cols)), dtype=np.uint8)
+    total = items.sum(axis=1, dtype=np.int32)
+
+    export = pd.DataFrame(items, columns=item_cols)
+    export.insert(0, template.columns[0], [f"Sample {i + 1}" for i in range(n_rows)])
+    export[template.columns[-3]] = total
+    export[template.columns[-2]] = total
+    export[template.columns[-1]] = rng.choice(template[template.columns[-1]].dropna().unique(), size=n_rows)
+    export.to_csv(out_path, index=False)
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare CSV parsing against the columnar data cache.")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "synthetic_scores.csv")
+        print(f"Generating {args.rows:,} synthetic rows...")
+        make_synthetic_export(args.template, args.rows, csv_path)
+        print(f"CSV size: {os.path.getsize(csv_path) / 1e6:.1f} MB")
+
+        csv_time, _ = timed(lambda: pd.read_csv(csv_path), repeat=1)
+        build_time, _ = timed(lambda: build_cache(csv_path), repeat=1)
+        warm_time, frame = timed(lambda: load_scores(csv_path, decode_ids=False))
+        decoded_time, _ = timed(lambda: load_scores(csv_path))
+
+        print("\n" + "=" * 50)
+        print(f"pd.read_csv:            {csv_time * 1000:10.1f} ms")
+        print(f"cache build (one-off):  {build_time * 1000:10.1f} ms")
+        print(f"load_scores (warm):     {warm_time * 1000:10.1f} ms")
+        print(f"  + decoded Sample IDs: {decoded_time * 1000:10.1f} ms")
+        print(f"speedup:                {csv_time / warm_time:10.1f}x")
+        print(f"feature dtypes:         {sorted(set(str(t) for t in frame.dtypes))}")
+        print("=" * 50)
@@ -0,0 +1,78 @@
+# bench_explanations.py
+import sys
+import os
+import time
+import argparse
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, '..'))
+import inference
+
+# ==============================================================================
+# EXPLANATIONS: explain_batch vs. predict_batch latency
+# ==============================================================================
+#
+# For 1, 100 and 10k random respondents per domain:
+#   plain : predict_batch (compiled forest)
+#   cold  : explain_batch with an empty contribution cache (pred_contrib on every
+#           distinct threshold signature in the batch)
+#   warm  : explain_batch again, served from the cache
+# The budget is warm <= 2x plain. Also checks that explain_batch returns the same
+# labels and probabilities as predict_batch.
+
+BUDGET = 2.0
+DOMAINS = [('children', 'sleep'), ('adult', 'anxiety'), ('adult', 'depression'), ('children', 'somatic')]
+
+
+def best_ms(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def responses(loaded, n, rng):
+    """Random complete answers on the 1-5 item scale, 10% with one item left unanswered."""
+    rows = rng.integers(1, 6, size=(n, len(loaded['item_names']))).astype(np.float64)
+    gaps = rng.random(n) < 0.1
+    rows[gaps, rng.integers(0, rows.shape[1], size=gaps.sum())] = np.nan
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Explanation latency against plain prediction.")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    print("=" * 86)
+    print(f"{'domain':22s}{'rows':>7s}{'plain':>11s}{'cold':>11s}{'warm':>11s}{'warm/plain':>12s}"
+          f"{'signatures':>12s}")
+    print("-" * 86)
+    worst = 0.0
+    for population, domain in DOMAINS:
+        loaded = inference.load_domain_model(population, domain)
+        for n in (1, 100, 10_000):
+            rows = responses(loaded, n, rng)
+            plain = best_ms(lambda: inference.predict_batch(population, domain, rows), args.repeats)
+
+            loaded.pop('explanations', None)
+            cold = best_ms(lambda: inference.explain_batch(population, domain, rows, use_cache=False), 3)
+            inference.explain_batch(population, domain, rows)
+            warm = best_ms(lambda: inference.explain_batch(population, domain, rows), args.repeats)
+            worst = max(worst, warm / plain)
+            print(f"{population + '/' + domain:22s}{n:7d}{plain:9.3f}ms{cold:9.3f}ms{warm:9.3f}ms"
+                  f"{warm / plain:11.2f}x{len(loaded['explanations']):12d}")
+
+        rows = responses(loaded, 1000, rng)
+        labels, probabilities = inference.predict_batch(population, domain, rows)
+        explained_labels, explained_probabilities, _ = inference.explain_batch(population, domain, rows)
+        print(f"{'':22s}same labels as predict_batch: {bool((labels == explained_labels).all())}, "
+              f"max probability difference {np.nanmax(np.abs(probabilities - explained_probabilities)):.1e}")
+    print("-" * 86)
+    print(f"budget warm <= {BUDGET:.0f}x plain: {'met' if worst <= BUDGET else 'NOT met'} (worst {worst:.2f}x)")
+    print("=" * 86)
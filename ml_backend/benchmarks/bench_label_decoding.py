@@ -0,0 +1,98 @@
+# bench_label_decoding.py
+import sys
+import os
+import json
+import timeit
+import argparse
+import subprocess
+import numpy as np
+import joblib
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+training_dir = os.path.join(current_dir, '..', 'training')
+models_dir = os.path.join(current_dir, '..', 'models')
+
+# ==============================================================================
+# LABEL DECODING: sklearn LabelEncoder vs. class array from the model metadata
+# ==============================================================================
+#
+# 1. Decode cost per call and for a batch of argmax codes.
+# 2. Cold start (fresh interpreter -> first prediction) and peak RSS, with the old
+#    LabelEncoder path and with the metadata classes used by domain_scoring.py.
+
+# Both snippets load the same booster and score the same row; they only differ in
+# how the predicted class index becomes a label.
+ENCODER_SNIPPET = """
+import time, resource, sys, joblib, numpy as np
+start = time.perf_counter()
+model = joblib.load({model!r})
+le = joblib.load({encoder!r})
+proba = model.predict(np.full((1, model.num_feature()), 2.0))
+label = le.inverse_transform([np.argmax(proba[0])])[0]
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 'sklearn.preprocessing' in sys.modules, label)
+"""
+
+CLASSES_SNIPPET = """
+import time, resource, sys, json, joblib, numpy as np
+start = time.perf_counter()
+model = joblib.load({model!r})
+with open({meta!r}) as f:
+    classes = np.array(json.load(f)['classes'], dtype=object)
+proba = model.predict(np.full((1, model.num_feature()), 2.0))
+label = classes[np.argmax(proba, axis=1)][0]
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 'sklearn.preprocessing' in sys.modules, label)
+"""
+
+
+def cold_start(snippet, runs):
+    """Best wall time and median peak RSS (MB) over fresh interpreters."""
+    times, rss = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-W', 'ignore', '-c', snippet],
+                             capture_output=True, text=True, check=True).stdout.split()
+        times.append(float(out[0]))
+        rss.append(int(out[1]) / 1024)
+    return min(times), float(np.median(rss)), out[2] == 'True', ' '.join(out[3:])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare LabelEncoder decoding against metadata class arrays.")
+    parser.add_argument("--model", default="adult_model/depression")
+    parser.add_argument("--batch", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    model_path = os.path.join(models_dir, f"{args.model}_lgbm_model.pkl")
+    encoder_path = os.path.join(models_dir, f"{args.model}_label_encoder.pkl")
+    meta_path = os.path.join(models_dir, f"{args.model}_lgbm_model_meta.json")
+
+    le = joblib.load(encoder_path)
+    with open(meta_path) as f:
+        classes = np.array(json.load(f)['classes'], dtype=object)
+    assert list(classes) == list(le.classes_), "metadata classes differ from the label encoder"
+
+    # --- 1. Decode cost ---
+    n_calls = 20_000
+    per_call_le = timeit.timeit(lambda: le.inverse_transform([1])[0], number=n_calls) / n_calls
+    per_call_np = timeit.timeit(lambda: classes[1], number=n_calls) / n_calls
+
+    codes = np.random.default_rng(0).integers(0, len(classes), size=args.batch)
+    batch_le = min(timeit.repeat(lambda: le.inverse_transform(codes), number=1, repeat=5))
+    batch_np = min(timeit.repeat(lambda: classes[codes], number=1, repeat=5))
+
+    # --- 2. Cold start ---
+    encoder_cold = cold_start(ENCODER_SNIPPET.format(model=model_path, encoder=encoder_path), args.runs)
+    classes_cold = cold_start(CLASSES_SNIPPET.format(model=model_path, meta=meta_path), args.runs)
+
+    print("=" * 60)
+    print(f"single decode   LabelEncoder: {per_call_le * 1e6:8.1f} us   classes[i]: {per_call_np * 1e6:8.2f} us")
+    print(f"{args.batch:,} decodes  LabelEncoder: {batch_le * 1000:8.2f} ms   classes[codes]: {batch_np * 1000:8.2f} ms")
+    print("-" * 60)
+    for name, (elapsed, rss, has_sklearn, label) in (("LabelEncoder", encoder_cold), ("meta classes", classes_cold)):
+        print(f"{name:13s} cold start {elapsed * 1000:7.1f} ms  peak RSS {rss:6.1f} MB  "
+              f"sklearn.preprocessing loaded: {has_sklearn}  -> {label}")
+    print("=" * 60)
+    print("Note: lightgbm imports sklearn itself when it is installed, so the import cost")
+    print("only disappears once serving runs without the lightgbm package.")
@@ -0,0 +1,71 @@
+# bench_rule_fast_path.py
+import sys
+import os
+import time
+import argparse
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, '..'))
+import inference
+from inference.config import SEVERITY_CUTOFFS
+
+# ==============================================================================
+# RULE FAST PATH: published cut-offs vs. the compiled forest
+# ==============================================================================
+#
+# Per domain with cut-offs: latency of predict_batch_with_rules against
+# predict_batch for 1 and 1000 respondents, the share of rows the rules decide,
+# and how often the model disagrees with the rules on random answers (complete and
+# with ~5% unanswered items). Item scales are taken from the training CSVs.
+
+data_dir = os.path.join(current_dir, '..', 'data')
+
+
+def best_ms(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def item_scale(population, domain, n_items):
+    import pandas as pd
+    items = pd.read_csv(os.path.join(data_dir, f'{population}_scores', f'{domain}_scores.csv')).iloc[:, 1:1 + n_items]
+    return int(np.nanmin(items.to_numpy(dtype=float))), int(np.nanmax(items.to_numpy(dtype=float)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rule fast path latency and agreement with the models.")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(3)
+    print("=" * 96)
+    print(f"{'domain':26s}{'model 1':>10s}{'rules 1':>10s}{'model 1k':>11s}{'rules 1k':>11s}"
+          f"{'by rule':>10s}{'disagree':>10s}")
+    print("-" * 96)
+    for population, domain in sorted(SEVERITY_CUTOFFS):
+        loaded = inference.load_domain_model(population, domain)
+        n_items = len(loaded['item_names'])
+        low, high = item_scale(population, domain, n_items)
+
+        rows = rng.integers(low, high + 1, size=(args.rows, n_items)).astype(np.float64)
+        rows[rng.random(rows.shape) < 0.05] = np.nan
+
+        one, batch = rows[:1], rows[:1000]
+        model_1 = best_ms(lambda: inference.predict_batch(population, domain, one), args.repeats)
+        rules_1 = best_ms(lambda: inference.predict_batch_with_rules(population, domain, one), args.repeats)
+        model_k = best_ms(lambda: inference.predict_batch(population, domain, batch), 5)
+        rules_k = best_ms(lambda: inference.predict_batch_with_rules(population, domain, batch), 5)
+
+        model_labels, _ = inference.predict_batch(population, domain, rows)
+        rule_labels, _, by_rule = inference.predict_batch_with_rules(population, domain, rows)
+        disagree = (model_labels[by_rule] != rule_labels[by_rule]).mean()
+        print(f"{population + '/' + domain:26s}{model_1:8.3f}ms{rules_1:8.3f}ms{model_k:9.3f}ms{rules_k:9.3f}ms"
+              f"{by_rule.mean():10.1%}{disagree:10.2%}")
+    print("=" * 96)
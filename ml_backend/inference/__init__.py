@@ -0,0 +1,63 @@
+# inference/__init__.py
+# ==============================================================================
+# SLIM INFERENCE RUNTIME
+# ==============================================================================
+#
+# Level 1 / Level 2 scoring for serving processes: compiled forests evaluated with
+# NumPy (see forest.py), so no lightgbm, sklearn, pandas or joblib is imported.
+# Submodules load on first attribute access and models on first prediction;
+# `import inference` itself only pulls in the exception classes.
+#
+#   import inference
+#   inference.predict_severity('children', 'sleep', [3, 4, 2, 5, 1, 2, 3, 4])
+#
+# Deploy with the *_forest.bin + *_meta.json files (python -m inference.export).
+# explain_batch / explain_level1_batch are the exception: they need lightgbm and
+# the .pkl for feature contributions (see explain.py).
+
+from .errors import InferenceError, ModelNotFoundError, UnknownDomainError, InvalidInputError
+
+_LAZY_ATTRIBUTES = {
+    'predict_severity': 'scoring',
+    'predict_batch': 'scoring',
+    'predict_diagnosis': 'scoring',
+    'predict_level1_batch': 'scoring',
+    'predict_with': 'scoring',
+    'predict_level1_with': 'scoring',
+    'level1_referrals_batch': 'scoring',
+    'build_feature_matrix': 'scoring',
+    'to_score_matrix': 'scoring',
+    'explain_batch': 'explain',
+    'explain_level1_batch': 'explain',
+    'predict_batch_with_rules': 'rules',
+    'has_rules': 'rules',
+    'load_domain_model': 'models',
+    'load_level1_model': 'models',
+    'is_loaded': 'models',
+    'clear_model_cache': 'models',
+    'refresh_models': 'models',
+    'start_release_watcher': 'models',
+    'candidate_release': 'models',
+    'load_release': 'models',
+    'DOMAINS': 'config',
+    'LEVEL1_FEATURES': 'config',
+    'LEVEL2_DOMAIN_FOR': 'config',
+    'MIN_ANSWERED_FRACTION': 'config',
+    'SEVERITY_CUTOFFS': 'config',
+    'sanitize_name': 'config',
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'inference' has no attribute '{name}'")
+
+    import importlib
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRIBUTES))
@@ -0,0 +1,287 @@
+# compact.py
+import os
+import json
+import time
+import argparse
+import itertools
+
+import numpy as np
+
+from .config import DOMAINS, LEVEL1_FEATURES, model_paths
+from .forest import CompiledForest, compile_booster, export_forest
+from .models import load_domain_model
+from .scoring import build_feature_matrix
+
+# ==============================================================================
+# FOREST COMPACTION (drop boosting iterations that never change a label)
+# ==============================================================================
+#
+#   cd ml_backend && python -m inference.compact [--population adult --domain sleep]
+#
+# With learning_rate 0.01 and early stopping on logloss, boosters keep adding trees
+# long after every label is settled; the tail only sharpens the probabilities. This
+# step finds the smallest num_iteration whose predicted label equals the full
+# booster's on every input the questionnaire can produce, and rewrites
+# <model>_forest.bin with only those iterations (the .pkl is left untouched, so
+# `python -m inference.export` restores the full forest).
+#
+# "Every input" is exhaustive for complete responses when the item space has at most
+# EXHAUSTIVE_LIMIT combinations, otherwise a seeded sample; partially answered
+# responses are always sampled. Inputs are grouped by which side of every split
+# threshold each feature falls on: rows in one group walk the same path through
+# every tree, so each group is evaluated once. Item scales come from the training
+# CSVs. Probabilities do change (they are less sharp); --max-probability-shift
+# bounds that too. A <model>_compaction.json report records agreement and speedup.
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+REPORT_SUFFIX = "_compaction.json"
+
+EXHAUSTIVE_LIMIT = 20_000_000
+SAMPLE_SIZE = 1_000_000
+PARTIAL_SAMPLE_SIZE = 200_000
+CHUNK_ROWS = 1_000_000
+BLOCKS = 64
+
+
+def report_path_for(model_path):
+    """sleep_lgbm_model.pkl -> sleep_lgbm_model_compaction.json"""
+    return os.path.splitext(model_path)[0] + REPORT_SUFFIX
+
+
+def training_csv(population, domain, data_dir=DATA_DIR):
+    name = f"level1_{population}_scores.csv" if domain == "level1_diagnosis" else f"{domain}_scores.csv"
+    return os.path.join(data_dir, f"{population}_scores", name)
+
+
+def item_scale(csv_path, n_items):
+    """(lowest, highest) answer seen for any item in the training data."""
+    import pandas as pd
+    items = pd.read_csv(csv_path).iloc[:, 1:1 + n_items].to_numpy(dtype=np.float64)
+    return int(np.nanmin(items)), int(np.nanmax(items))
+
+
+# ------------------------------------------------------------------------------
+# Input space
+# ------------------------------------------------------------------------------
+
+def _complete_chunks(n_items, low, high, exhaustive, rng):
+    base = high - low + 1
+    if exhaustive:
+        total = base ** n_items
+        powers = base ** np.arange(n_items, dtype=np.int64)
+        for start in range(0, total, CHUNK_ROWS):
+            index = np.arange(start, min(start + CHUNK_ROWS, total), dtype=np.int64)
+            yield ((index[:, None] // powers) % base + low).astype(np.float64)
+    else:
+        for start in range(0, SAMPLE_SIZE, CHUNK_ROWS):
+            yield rng.integers(low, high + 1, size=(min(CHUNK_ROWS, SAMPLE_SIZE - start), n_items)).astype(np.float64)
+
+
+def _partial_sample(n_items, low, high, rng):
+    """Responses with between one item and the most items scoring allows left unanswered."""
+    rows = rng.integers(low, high + 1, size=(PARTIAL_SAMPLE_SIZE, n_items)).astype(np.float64)
+    max_missing = n_items - int(np.ceil(n_items / 2))
+    if max_missing < 1:
+        return rows[:0]
+    n_missing = rng.integers(1, max_missing + 1, size=PARTIAL_SAMPLE_SIZE)
+    rank = rng.random(rows.shape).argsort(axis=1).argsort(axis=1)
+    rows[rank < n_missing[:, None]] = np.nan
+    return rows
+
+
+def distinct_inputs(chunks, featurize, forest):
+    """
+    One representative feature row per threshold signature over all chunks, and how
+    many inputs each one stands for.
+    """
+    representatives, seen, counts, total = [], {}, [], 0
+    for raw in chunks:
+        X = featurize(raw)
+        total += len(X)
+        signatures, first, inverse = np.unique(forest.signatures(X), axis=0, return_index=True,
+                                               return_inverse=True)
+        per_signature = np.bincount(inverse.ravel(), minlength=len(signatures))
+        for signature, row, count in zip(map(bytes, signatures), first, per_signature):
+            slot = seen.get(signature)
+            if slot is None:
+                seen[signature] = len(representatives)
+                representatives.append(X[row])
+                counts.append(count)
+            else:
+                counts[slot] += count
+    X = np.array(representatives).reshape(-1, forest.num_feature)
+    return X, np.array(counts, dtype=np.int64), total
+
+
+# ------------------------------------------------------------------------------
+# Iteration search
+# ------------------------------------------------------------------------------
+
+def _labels(raw):
+    return raw.argmax(axis=1) if raw.ndim == 2 else (raw > 0).astype(int)
+
+
+def _probabilities(raw):
+    if raw.ndim == 1:
+        return 1.0 / (1.0 + np.exp(-raw))
+    raw = np.exp(raw - raw.max(axis=1, keepdims=True))
+    return raw / raw.sum(axis=1, keepdims=True)
+
+
+def smallest_agreeing_iteration(booster, X, total_iterations, max_probability_shift=None):
+    """
+    Smallest k whose labels match the first total_iterations iterations on every row
+    of X. Raw scores are accumulated block by block (one pass over the booster),
+    then the first agreeing block is bisected.
+    """
+    full_raw = booster.predict(X, raw_score=True, num_iteration=total_iterations)
+    reference_labels = _labels(full_raw)
+    reference_probabilities = _probabilities(full_raw)
+
+    def agrees(raw):
+        if not np.array_equal(_labels(raw), reference_labels):
+            return False
+        return max_probability_shift is None or \
+            np.abs(_probabilities(raw) - reference_probabilities).max() <= max_probability_shift
+
+    block = max(1, -(-total_iterations // BLOCKS))
+    raw = np.zeros_like(full_raw)
+    for start in range(0, total_iterations, block):
+        size = min(block, total_iterations - start)
+        block_raw = booster.predict(X, raw_score=True, start_iteration=start, num_iteration=size)
+        if not agrees(raw + block_raw):
+            raw += block_raw
+            continue
+
+        # Agreement is reached inside (start, start + size]: bisect it
+        low, high = 1, size
+        while low < high:
+            middle = (low + high) // 2
+            if agrees(raw + booster.predict(X, raw_score=True, start_iteration=start, num_iteration=middle)):
+                high = middle
+            else:
+                low = middle + 1
+        return start + low
+    return total_iterations
+
+
+def _in_memory_forest(booster, num_iteration):
+    arrays = compile_booster(booster, num_iteration=num_iteration)
+    arrays.update(source_size=0, source_sha256="")
+    return CompiledForest(arrays)
+
+
+def _median_ms(forest, X, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        forest.predict(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def compact_model(population, domain, data_dir=DATA_DIR, max_probability_shift=None, write=True, seed=42):
+    """Compacts one model's forest; returns the report (also written next to the model)."""
+    import joblib
+
+    model_path, _ = model_paths(population, domain)
+    model = joblib.load(model_path)
+    booster = model.booster_ if hasattr(model, "booster_") else model
+    total_iterations = booster.best_iteration or booster.current_iteration()
+
+    full = _in_memory_forest(booster, total_iterations)
+    rng = np.random.default_rng(seed)
+
+    if domain == "level1_diagnosis":
+        n_items = len(LEVEL1_FEATURES[population])
+        featurize = lambda raw: raw
+    else:
+        loaded = load_domain_model(population, domain)
+        n_items = len(loaded["item_names"])
+
+        def featurize(raw):
+            X, scorable = build_feature_matrix(loaded, raw)
+            return X[scorable]
+
+    low, high = item_scale(training_csv(population, domain, data_dir), n_items)
+    space = (high - low + 1) ** n_items
+    exhaustive = space <= EXHAUSTIVE_LIMIT
+
+    chunks = _complete_chunks(n_items, low, high, exhaustive, rng)
+    if domain != "level1_diagnosis":
+        chunks = itertools.chain(chunks, [_partial_sample(n_items, low, high, rng)])
+
+    start = time.perf_counter()
+    X, counts, inputs_checked = distinct_inputs(chunks, featurize, full)
+    iterations = smallest_agreeing_iteration(booster, X, total_iterations, max_probability_shift)
+
+    compact = _in_memory_forest(booster, iterations)
+    full_probabilities, compact_probabilities = full.predict(X), compact.predict(X)
+    agreement = float(np.average(
+        _labels(full_probabilities) == _labels(compact_probabilities), weights=counts
+    ))
+    search_seconds = time.perf_counter() - start
+
+    batch = X[rng.integers(0, len(X), size=1000)]
+    single = X[:1]
+    timings = {
+        "full_1_row_ms": _median_ms(full, single, 200), "compact_1_row_ms": _median_ms(compact, single, 200),
+        "full_1000_rows_ms": _median_ms(full, batch, 20), "compact_1000_rows_ms": _median_ms(compact, batch, 20),
+    }
+
+    report = {
+        "population": population,
+        "domain": domain,
+        "item_scale": [low, high],
+        "input_space": "exhaustive" if exhaustive else "sampled",
+        "complete_combinations": space,
+        "inputs_checked": inputs_checked,
+        "distinct_signatures": len(X),
+        "iterations_before": total_iterations,
+        "iterations_after": iterations,
+        "trees_before": full.num_trees(),
+        "trees_after": compact.num_trees(),
+        "label_agreement": agreement,
+        "max_probability_shift": round(float(np.abs(full_probabilities - compact_probabilities).max()), 6),
+        "search_seconds": round(search_seconds, 2),
+        **{name: round(value, 4) for name, value in timings.items()},
+        "speedup_1_row": round(timings["full_1_row_ms"] / timings["compact_1_row_ms"], 2),
+        "speedup_1000_rows": round(timings["full_1000_rows_ms"] / timings["compact_1000_rows_ms"], 2),
+        "written": False,
+    }
+
+    # Never ship a forest that disagrees with the booster it came from
+    if write and agreement == 1.0:
+        export_forest(model_path, booster=booster, num_iteration=iterations)
+        report["written"] = True
+        with open(report_path_for(model_path), "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Drop boosting iterations that never change a predicted label.")
+    parser.add_argument('--population')
+    parser.add_argument('--domain', help="Level 2 domain or level1_diagnosis")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--max-probability-shift', type=float, default=None,
+                        help="also require probabilities within this distance of the full booster's")
+    parser.add_argument('--dry-run', action='store_true', help="report only, keep the current forests")
+    args = parser.parse_args()
+
+    targets = sorted(DOMAINS) + [(population, "level1_diagnosis") for population in LEVEL1_FEATURES]
+    targets = [(p, d) for p, d in targets
+               if (args.population in (None, p)) and (args.domain in (None, d))
+               and os.path.exists(model_paths(p, d)[0])]
+
+    for population, domain in targets:
+        if not os.path.exists(training_csv(population, domain, args.data_dir)):
+            print(f"{population}/{domain}: no training CSV to take the item scale from, skipped")
+            continue
+        r = compact_model(population, domain, data_dir=args.data_dir,
+                          max_probability_shift=args.max_probability_shift, write=not args.dry_run)
+        print(f"{population}/{domain}: {r['iterations_before']} -> {r['iterations_after']} iterations, "
+              f"{r['trees_before']} -> {r['trees_after']} trees, agreement {r['label_agreement']:.2%} on "
+              f"{r['inputs_checked']:,} {r['input_space']} inputs, max prob shift {r['max_probability_shift']:.3f}, "
+              f"speedup {r['speedup_1_row']:.1f}x (1 row) / {r['speedup_1000_rows']:.1f}x (1000 rows)"
+              f"{'' if r['written'] else ' [not written]'}")
@@ -0,0 +1,144 @@
+# config.py
+import os
+import re
+
+from .releases import current_version, version_dir
+
+# ==============================================================================
+# 1. DOMAIN CONFIGURATION (Level 2 severity models)
+# ==============================================================================
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models')
+
+# Sanitized names of the items that are reverse scored (Scored = 6 - Raw) before the
+# derived scores are computed. Must match the *_REVERSE_COLS lists in the training scripts.
+SLEEP_REVERSE_ITEMS = [
+    'I_was_satisfied_with_my_sleep',
+    'My_sleep_was_refreshing',
+    'I_got_enough_sleep',
+    'My_sleep_quality_was',
+]
+
+# How the trailing (non-item) features of each model are derived from the items:
+#   tr_ps  -> Total Raw Score (TR) + Prorated Score (PS = prorated TR * ps_scale)
+#   tr_ats -> Total Raw Score (TR) + Average Total Score (ATS = prorated TR / n_items)
+#   ndsu   -> Number of Distinct Substances Used (items answered with a score > 0)
+DERIVED_FEATURE_COUNT = {'tr_ps': 2, 'tr_ats': 2, 'ndsu': 1}
+
+DOMAINS = {
+    ('adult', 'anger'): {'derived': 'tr_ps'},
+    ('adult', 'anxiety'): {'derived': 'tr_ps'},
+    ('adult', 'depression'): {'derived': 'tr_ps'},
+    ('adult', 'mania'): {'derived': 'tr_ps'},
+    ('adult', 'repetitive_thoughts'): {'derived': 'tr_ps'},
+    ('adult', 'separation_anxiety'): {'derived': 'tr_ps'},
+    ('adult', 'sleep'): {'derived': 'tr_ps', 'reverse_items': SLEEP_REVERSE_ITEMS},
+    ('adult', 'somatic'): {'derived': 'tr_ps'},
+    ('adult', 'substance_use'): {'derived': 'ndsu'},
+    ('children', 'anger'): {'derived': 'tr_ps'},
+    ('children', 'anxiety'): {'derived': 'tr_ps'},
+    ('children', 'depression'): {'derived': 'tr_ps'},
+    ('children', 'irritability'): {'derived': 'tr_ats'},
+    ('children', 'mania'): {'derived': 'tr_ps'},
+    ('children', 'repetitive_thoughts'): {'derived': 'tr_ps'},
+    ('children', 'sleep'): {'derived': 'tr_ps', 'reverse_items': SLEEP_REVERSE_ITEMS},
+    # 13 items prorated to the 15-item instrument
+    ('children', 'somatic'): {'derived': 'tr_ps', 'ps_scale': 15 / 13},
+    ('children', 'substance_use'): {'derived': 'ndsu'},
+}
+
+# PROMIS scoring only allows prorating when at least half of the items were answered
+MIN_ANSWERED_FRACTION = 0.5
+
+# Published severity cut-offs, applied to the last derived feature (PS, or NDSU):
+# [(lowest score of the band, label), ...] in increasing order. Labels must match
+# the model's classes; a band whose label the model never learned (e.g. children
+# somatic "Minimal") is left to the model. Domains without published raw-score
+# cut-offs (the PROMIS T-score based ones) are not listed and always use the model.
+ASRM_CUTOFFS = [(0, 'Less Significant Mania'), (6, 'Significant Mania')]              # ASRM >= 6
+PHQ15_CUTOFFS = [(0, 'Minimal'), (5, 'Low'), (10, 'Medium'), (15, 'High')]             # PHQ-15
+NDSU_CUTOFFS = [(0, 'No Use'), (1, 'Single Substance Use'), (2, 'Polysubstance Use')]  # distinct substances
+SEVERITY_CUTOFFS = {
+    ('adult', 'mania'): ASRM_CUTOFFS,
+    ('adult', 'somatic'): PHQ15_CUTOFFS,
+    ('adult', 'substance_use'): NDSU_CUTOFFS,
+    ('children', 'mania'): ASRM_CUTOFFS,
+    ('children', 'somatic'): PHQ15_CUTOFFS,
+    ('children', 'substance_use'): NDSU_CUTOFFS,
+    # PROMIS pediatric sleep disturbance: the bands are part of the labels
+    ('children', 'sleep'): [(8, 'Minimal/Slight (8-15)'), (16, 'Mild (16-23)'), (24, 'Moderate (24-31)'),
+                            (32, 'Severe (32-40)')],
+}
+
+
+def sanitize_name(name):
+    """Applies the exact same sanitization used during training."""
+    name = str(name).strip().replace(' ', '_').replace('(', '').replace(')', '')
+    name = name.replace(',', '_').replace('.', '_').replace('-', '_').replace(':', '_')
+    name = re.sub(r'__+', '_', name).strip('_')
+    return name
+
+
+def model_dir_for(population):
+    return os.path.join(MODELS_DIR, f'{population}_model')
+
+
+def model_paths(population, domain, version=None):
+    """
+    (model, encoder) paths of the release CURRENT points to (or `version`), falling
+    back to the flat files for domains without releases (see releases.py).
+    """
+    model_dir = model_dir_for(population)
+    if version is None:
+        version = current_version(model_dir, domain)
+    if version is not None:
+        model_dir = version_dir(model_dir, domain, version)
+    return (
+        os.path.join(model_dir, f'{domain}_lgbm_model.pkl'),
+        os.path.join(model_dir, f'{domain}_label_encoder.pkl'),
+    )
+
+
+# ==============================================================================
+# 2. LEVEL 1 (Cross-cutting measure features + Level 2 referral thresholds)
+# ==============================================================================
+
+# Highest item score (0-4) per Level 1 domain, in model feature order
+LEVEL1_FEATURES = {
+    'adult': [
+        'Depression_Score', 'Anger_Score', 'Mania_Score', 'Anxiety_Score',
+        'Somatic_Score', 'Sleep_Disturbance_Score', 'Repetitive_Thoughts_Score',
+        'Substance_Use_Score', 'Suicidal_Score', 'Psychosis_Score', 'Memory_Score', 'Dissociation_Score',
+        'Personality_Functioning_Score'
+    ],
+    'children': [
+        'Somatic_Score', 'Sleep_Disturbance_Score', 'Inattention_Score', 'Depression_Score',
+        'Anger_Score', 'Irritability_Score', 'Mania_Score', 'Anxiety_Score',
+        'Psychosis_Score', 'Repetitive_Thoughts_Score', 'Substance_Use_Score',
+        'Suicidal_Ideation_Score'
+    ],
+}
+
+# DSM-5-TR Level 1 thresholds: 2 = Mild or greater, 1 = Slight or greater (risk domains)
+MILD_THRESHOLD = 2
+SLIGHT_THRESHOLD = 1
+SLIGHT_DOMAINS = {
+    'Inattention_Score', 'Psychosis_Score', 'Substance_Use_Score', 'Suicidal_Score', 'Suicidal_Ideation_Score'
+}
+LEVEL1_THRESHOLDS = {
+    population: [SLIGHT_THRESHOLD if f in SLIGHT_DOMAINS else MILD_THRESHOLD for f in features]
+    for population, features in LEVEL1_FEATURES.items()
+}
+
+# Level 1 domain -> Level 2 severity model it refers to
+LEVEL2_DOMAIN_FOR = {
+    'Depression_Score': 'depression',
+    'Anger_Score': 'anger',
+    'Mania_Score': 'mania',
+    'Anxiety_Score': 'anxiety',
+    'Somatic_Score': 'somatic',
+    'Sleep_Disturbance_Score': 'sleep',
+    'Repetitive_Thoughts_Score': 'repetitive_thoughts',
+    'Substance_Use_Score': 'substance_use',
+    'Irritability_Score': 'irritability',
+}
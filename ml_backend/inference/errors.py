@@ -0,0 +1,20 @@
+# errors.py
+
+# Each error also derives from the builtin the old predictors raised (or caught),
+# so existing `except FileNotFoundError` / `except ValueError` handlers keep working.
+
+
+class InferenceError(Exception):
+    """Base class for everything the inference runtime raises."""
+
+
+class ModelNotFoundError(InferenceError, FileNotFoundError):
+    """The model (or its compiled forest) for a population/domain is not on disk."""
+
+
+class UnknownDomainError(InferenceError, KeyError):
+    """No model is configured for the requested population/domain."""
+
+
+class InvalidInputError(InferenceError, ValueError):
+    """Wrong number of scores, or too few items answered to score the respondent."""
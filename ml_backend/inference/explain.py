@@ -0,0 +1,152 @@
+# explain.py
+import numpy as np
+
+from .config import model_paths
+from .models import load_domain_model, load_level1_model
+from .errors import InvalidInputError
+from .scoring import to_score_matrix, build_feature_matrix, _domain_score_matrix
+
+# ==============================================================================
+# PER-RESPONDENT EXPLANATIONS (LightGBM pred_contrib, top-k items)
+# ==============================================================================
+#
+# Feature contributions (TreeSHAP) come from one booster.predict(pred_contrib=True)
+# call over the distinct rows of a batch, so this path needs lightgbm + joblib; they
+# and the .pkl are only loaded on the first explanation of a model.
+#
+# Contributions depend only on which side of each split threshold every feature
+# falls (CompiledForest.signatures), and a domain's answers produce few such
+# signatures, so they are cached per model. Contributions sum to the raw score, so
+# the probabilities are taken from them instead of walking the forest again: once
+# warm, an explained batch costs about what a plain one does. The cache lives in
+# the loaded model dict and is dropped with it by clear_model_cache().
+
+DEFAULT_TOP_K = 3
+
+# Signatures kept per model; partially answered responses (imputed means) add more
+CACHE_LIMIT = 50_000
+
+
+def _booster(loaded, population, domain):
+    if 'booster' not in loaded:
+        import joblib
+        model = joblib.load(loaded.get('model_path') or model_paths(population, domain)[0])
+        loaded['booster'] = model.booster_ if hasattr(model, 'booster_') else model
+    return loaded['booster']
+
+
+def feature_contributions(loaded, population, domain, X, use_cache=True):
+    """(n_rows, n_classes, n_features + 1) contributions; the last column is the expected value."""
+    forest = loaded['model']
+    n_outputs = forest.num_class if forest.objective == 'multiclass' else 1
+    width = n_outputs * (forest.num_feature + 1)
+    if len(X) == 0:
+        return np.zeros((0, n_outputs, forest.num_feature + 1))
+
+    if len(X) == 1:
+        signatures, first, inverse = forest.signatures(X), np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+    else:
+        signatures, first, inverse = np.unique(forest.signatures(X), axis=0, return_index=True,
+                                               return_inverse=True)
+    cache = loaded.setdefault('explanations', {}) if use_cache else {}
+    keys = [row.tobytes() for row in signatures]
+    rows = np.empty((len(keys), width))
+    missing = []
+    for i, key in enumerate(keys):
+        cached = cache.get(key)
+        if cached is None:
+            missing.append(i)
+        else:
+            rows[i] = cached
+
+    if missing:
+        computed = _booster(loaded, population, domain).predict(
+            X[first[missing]], pred_contrib=True, num_iteration=forest.num_iteration
+        )
+        rows[missing] = computed
+        if use_cache:
+            for i, row in zip(missing, computed):
+                if len(cache) >= CACHE_LIMIT:
+                    break
+                cache[keys[i]] = row
+
+    return rows[inverse.ravel()].reshape(len(X), n_outputs, forest.num_feature + 1)
+
+
+def top_contributions(contributions, class_index, names, top_k, exclude=None):
+    """
+    The top_k features pushing each row towards its predicted class, largest first.
+    Features the trees never used for the row (zero contribution) are left out, as
+    are those masked by exclude (e.g. unanswered items).
+    """
+    per_feature = contributions[np.arange(len(contributions)), class_index, :len(names)]
+    hidden = per_feature == 0 if exclude is None else (per_feature == 0) | exclude
+    ranked = np.where(hidden, -np.inf, per_feature)
+    order = np.argsort(-ranked, axis=1, kind='stable')[:, :top_k]
+    values = np.take_along_axis(per_feature, order, axis=1)
+    keep = np.take_along_axis(np.isfinite(ranked), order, axis=1)
+    return [
+        [{'item': names[f], 'contribution': round(float(v), 6)} for f, v, k in zip(row, vals, ks) if k]
+        for row, vals, ks in zip(order.tolist(), values.tolist(), keep.tolist())
+    ]
+
+
+# ==============================================================================
+# LEVEL 2 + LEVEL 1 BATCH EXPLANATIONS
+# ==============================================================================
+
+def explain_batch(population, domain, raw_scores, top_k=DEFAULT_TOP_K, use_cache=True, loaded=None):
+    """
+    Same labels and probabilities as predict_batch plus, per scorable respondent, the
+    top_k answered items driving the predicted severity and the contribution of the
+    derived scores (TR/PS, ...). `loaded` pins an already loaded model.
+    Returns (labels, probabilities, explanations); unscorable rows get None.
+    """
+    loaded = loaded or load_domain_model(population, domain)
+    raw_matrix = to_score_matrix(raw_scores, len(loaded['item_names']))
+    X, scorable = build_feature_matrix(loaded, raw_matrix)
+
+    probabilities = np.full((len(X), len(loaded['classes'])), np.nan)
+    labels = np.full(len(X), None, dtype=object)
+    explanations = [None] * len(X)
+    rows = np.flatnonzero(scorable)
+    if len(rows) == 0:
+        return labels, probabilities, explanations
+
+    contributions = feature_contributions(loaded, population, domain, X[rows], use_cache)
+    probabilities[rows] = loaded['model'].transform(contributions.sum(axis=2))
+    class_index = np.argmax(probabilities[rows], axis=1)
+    labels[rows] = loaded['classes'][class_index]
+
+    n_items = len(loaded['item_names'])
+    items = top_contributions(contributions, class_index, loaded['item_names'], top_k,
+                              exclude=np.isnan(raw_matrix[rows]))
+    derived = contributions[np.arange(len(rows)), class_index, n_items:-1].round(6).tolist()
+    base = contributions[np.arange(len(rows)), class_index, -1].round(6).tolist()
+
+    derived_names = loaded['feature_names'][n_items:]
+    for i, row in enumerate(rows.tolist()):
+        explanations[row] = {
+            'top_items': items[i],
+            'derived': dict(zip(derived_names, derived[i])),
+            'base_value': base[i],
+        }
+    return labels, probabilities, explanations
+
+
+def explain_level1_batch(population, domain_scores, top_k=DEFAULT_TOP_K, use_cache=True, loaded=None):
+    """Same result as predict_level1_batch plus the top_k Level 1 domains driving each diagnosis."""
+    loaded = loaded or load_level1_model(population)
+    matrix = _domain_score_matrix(domain_scores)
+    if matrix.ndim != 2 or matrix.shape[1] != len(loaded['feature_names']):
+        raise InvalidInputError(f"Input must contain exactly {len(loaded['feature_names'])} domain scores.")
+
+    contributions = feature_contributions(loaded, population, 'level1_diagnosis', matrix, use_cache)
+    probabilities = loaded['model'].transform(contributions.sum(axis=2))
+    class_index = np.argmax(probabilities, axis=1)
+    diagnoses = loaded['classes'][class_index]
+    domains = top_contributions(contributions, class_index, loaded['feature_names'], top_k)
+    base = contributions[np.arange(len(matrix)), class_index, -1].round(6).tolist()
+
+    explanations = [{'top_items': d, 'base_value': b} for d, b in zip(domains, base)]
+    return diagnoses, probabilities, explanations
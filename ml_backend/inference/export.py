@@ -0,0 +1,33 @@
+# export.py
+import os
+import glob
+import argparse
+
+from .config import MODELS_DIR
+from .forest import export_forest, forest_path_for
+
+# ==============================================================================
+# COMPILE EVERY TRAINED MODEL TO ITS FOREST (.bin) FOR DEPLOYMENT
+# ==============================================================================
+#
+#   cd ml_backend && python -m inference.export
+#
+# Needs lightgbm + joblib (it unpickles the boosters). Run it in the build step so
+# serving images only ship *_forest.bin + *_meta.json. Versioned copies
+# (<stem>_v<N>.pkl) are skipped; only the live model of each domain is compiled.
+# `python -m inference.compact` can then shrink the forests (see compact.py).
+
+
+def live_model_paths(models_dir=MODELS_DIR):
+    return sorted(glob.glob(os.path.join(models_dir, '*_model', '*_lgbm_model.pkl')))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compile trained LightGBM models into NumPy forests.")
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    args = parser.parse_args()
+
+    for model_path in live_model_paths(args.models_dir):
+        forest = export_forest(model_path)
+        print(f"{os.path.relpath(forest_path_for(model_path), args.models_dir)}: "
+              f"{forest.source_trees} trees -> {forest.num_trees()} after folding")
@@ -0,0 +1,357 @@
+# forest.py
+import os
+import json
+import struct
+
+import numpy as np
+
+from .errors import ModelNotFoundError
+
+# ==============================================================================
+# COMPILED FORESTS (LightGBM boosters flattened into NumPy arrays)
+# ==============================================================================
+#
+# A trained booster is exported once to <model>_forest.bin next to its .pkl. The
+# file holds every tree's nodes in flat arrays; leaves point back to themselves,
+# so evaluating a batch is a fixed number of vectorized "descend one level" steps
+# over all (row, tree) pairs, with no lightgbm/sklearn import at serving time.
+#
+# Node decisions follow LightGBM's numerical splits exactly:
+#   NaN with missing_type None/Zero is treated as 0.0;
+#   missing values (NaN for missing_type NaN, |x| <= 1e-35 for Zero) take the
+#   default direction; everything else goes left when x <= threshold.
+
+FOREST_SUFFIX = "_forest.bin"
+FORMAT_VERSION = 1
+
+# File layout: 8-byte little-endian header length, JSON header (scalars + the dtype,
+# shape and offset of every array), then the raw array buffers. Reading it is one
+# read() plus np.frombuffer views; np.load on an .npz would also import zipfile,
+# which costs more than the whole model load.
+HEADER_SIZE = struct.Struct("<Q")
+
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+MISSING_TYPES = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+ZERO_THRESHOLD = 1e-35
+
+# Upper bound on (rows x trees) evaluated at once, keeps the index matrices ~100 MB
+MAX_CELLS_PER_STEP = 4_000_000
+
+
+def forest_path_for(model_path):
+    """sleep_lgbm_model.pkl -> sleep_lgbm_model_forest.bin"""
+    return os.path.splitext(model_path)[0] + FOREST_SUFFIX
+
+
+def _file_sha256(path):
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CompiledForest:
+    """Multiclass / binary LightGBM forest evaluated with NumPy."""
+
+    def __init__(self, arrays):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.default_left = arrays["default_left"]
+        self.missing_type = arrays["missing_type"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.bias = arrays["bias"]
+        self.max_depth = int(arrays["max_depth"])
+        self.num_class = int(arrays["num_class"])
+        self.num_feature = int(arrays["num_feature"])
+        self.objective = str(arrays["objective"])
+        self.source_trees = int(arrays["source_trees"])
+        # Boosting iterations compiled in (None for forests written before this was recorded)
+        self.num_iteration = arrays.get("num_iteration")
+        self.source = {"size": int(arrays["source_size"]), "sha256": str(arrays["source_sha256"])}
+        # (n_trees, n_class) one-hot: summing leaf values per class becomes one matmul
+        self.class_matrix = np.zeros((len(self.roots), self.num_class))
+        self.class_matrix[np.arange(len(self.roots)), arrays["tree_class"]] = 1.0
+        self.has_zero_missing = bool((self.missing_type == MISSING_ZERO).any())
+        self._split_points = None
+
+    def num_trees(self):
+        return len(self.roots)
+
+    def split_points(self):
+        """Sorted split thresholds of every feature, as (num_feature, most splits) padded with +inf."""
+        if self._split_points is None:
+            internal = self.left != np.arange(len(self.left))
+            per_feature = [np.unique(self.threshold[internal & (self.feature == f)]) for f in range(self.num_feature)]
+            padded = np.full((self.num_feature, max([len(t) for t in per_feature] + [1])), np.inf)
+            for f, t in enumerate(per_feature):
+                padded[f, :len(t)] = t
+            self._split_points = padded
+        return self._split_points
+
+    def signatures(self, X):
+        """
+        Per row and feature, the interval between split thresholds the value falls in
+        (exact zero and NaN kept apart for the missing-value rules). Rows with equal
+        signatures take the same path through every tree, so they get the same
+        prediction and the same feature contributions.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        interval = (self.split_points()[None, :, :] < X[:, :, None]).sum(axis=2)
+        return interval * 3 + (X == 0) + 2 * np.isnan(X)
+
+    def predict_raw(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.num_feature:
+            raise ValueError(f"Expected {self.num_feature} features, got shape {X.shape}.")
+
+        raw = np.repeat(self.bias[None, :], len(X), axis=0)
+        n_trees = len(self.roots)
+        if n_trees == 0:
+            return raw
+
+        rows_per_step = max(1, MAX_CELLS_PER_STEP // n_trees)
+        for start in range(0, len(X), rows_per_step):
+            block = X[start:start + rows_per_step]
+            leaves = self._descend(block)
+            raw[start:start + len(block)] += self.value[leaves] @ self.class_matrix
+        return raw
+
+    def _descend(self, X):
+        n_rows = len(X)
+        flat = X.ravel()
+        row_offset = (np.arange(n_rows, dtype=np.int64) * X.shape[1])[:, None]
+        node = np.repeat(self.roots[None, :], n_rows, axis=0)
+        exact = not self.has_zero_missing and not np.isnan(flat).any()
+
+        for _ in range(self.max_depth):
+            x = flat[row_offset + self.feature[node]]
+            if exact:
+                go_left = x <= self.threshold[node]
+            else:
+                go_left = self._decide(x, node)
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def _decide(self, x, node):
+        missing_type = self.missing_type[node]
+        is_nan = np.isnan(x)
+        x = np.where(is_nan & (missing_type != MISSING_NAN), 0.0, x)
+        use_default = ((missing_type == MISSING_NAN) & is_nan) | (
+            (missing_type == MISSING_ZERO) & (np.abs(x) <= ZERO_THRESHOLD)
+        )
+        with np.errstate(invalid="ignore"):
+            return np.where(use_default, self.default_left[node], x <= self.threshold[node])
+
+    def predict(self, X):
+        """Class probabilities, matching Booster.predict for the exported iterations."""
+        return self.transform(self.predict_raw(X))
+
+    def transform(self, raw):
+        """Raw (n_rows, n_class) scores -> probabilities (softmax / sigmoid)."""
+        if self.objective == "multiclass":
+            raw = np.exp(raw - raw.max(axis=1, keepdims=True))
+            return raw / raw.sum(axis=1, keepdims=True)
+        if self.objective == "binary":
+            return 1.0 / (1.0 + np.exp(-raw[:, 0]))
+        return raw[:, 0]
+
+
+# ==============================================================================
+# EXPORT (needs lightgbm + joblib; runs at training / deploy time only)
+# ==============================================================================
+
+def _is_leaf(node):
+    return "split_feature" not in node
+
+
+def _split_key(node):
+    return (node["split_feature"], node["threshold"], node["default_left"], node["missing_type"])
+
+
+def compile_booster(booster, num_iteration=None):
+    """
+    Flattens booster.dump_model() (best iteration if set, or the first num_iteration
+    iterations) into node arrays.
+
+    Boosting on 1-5 item scores produces thousands of near-identical trees, so the
+    forest is folded first: single-leaf trees become a per-class bias and stumps
+    splitting on the same feature/threshold are merged into one stump with the
+    summed leaf values. Probabilities match the booster up to float rounding.
+    """
+    dump = booster.dump_model(num_iteration=num_iteration)
+    objective = dump["objective"].split()[0]
+    if objective not in ("multiclass", "binary", "regression"):
+        raise ValueError(f"Cannot compile objective '{objective}'.")
+
+    num_class = dump["num_tree_per_iteration"]
+    bias = np.zeros(num_class)
+    stumps = {}
+    trees = []
+
+    for info in dump["tree_info"]:
+        tree, cls = info["tree_structure"], info["tree_index"] % num_class
+        if _is_leaf(tree):
+            bias[cls] += tree.get("leaf_value", 0.0)
+        elif _is_leaf(tree["left_child"]) and _is_leaf(tree["right_child"]):
+            values = stumps.setdefault((cls,) + _split_key(tree), [0.0, 0.0])
+            values[0] += tree["left_child"]["leaf_value"]
+            values[1] += tree["right_child"]["leaf_value"]
+        else:
+            trees.append((tree, cls))
+
+    for (cls, feature_idx, thr, default, missing), (left_value, right_value) in stumps.items():
+        trees.append(({
+            "split_feature": feature_idx, "threshold": thr, "decision_type": "<=",
+            "default_left": default, "missing_type": missing,
+            "left_child": {"leaf_value": left_value}, "right_child": {"leaf_value": right_value},
+        }, cls))
+
+    feature, threshold, left, right, default_left, missing_type, value = [], [], [], [], [], [], []
+    roots, tree_class = [], []
+    max_depth = 0
+
+    for tree, cls in trees:
+        # Explicit stack instead of recursion: trees can be a few dozen levels deep
+        roots.append(len(feature))
+        tree_class.append(cls)
+        stack = [(tree, None, 0)]
+        while stack:
+            node, parent_slot, depth = stack.pop()
+            index = len(feature)
+            if parent_slot is not None:
+                parent_slot[0][parent_slot[1]] = index
+            max_depth = max(max_depth, depth)
+
+            if _is_leaf(node):
+                feature.append(0)
+                threshold.append(np.inf)
+                left.append(index)
+                right.append(index)
+                default_left.append(True)
+                missing_type.append(MISSING_NONE)
+                value.append(node.get("leaf_value", 0.0))
+                continue
+
+            if node["decision_type"] != "<=":
+                raise ValueError("Categorical splits are not supported by the compiled forest.")
+            feature.append(node["split_feature"])
+            threshold.append(node["threshold"])
+            left.append(-1)
+            right.append(-1)
+            default_left.append(node["default_left"])
+            missing_type.append(MISSING_TYPES[node["missing_type"]])
+            value.append(0.0)
+            stack.append((node["right_child"], (right, index), depth + 1))
+            stack.append((node["left_child"], (left, index), depth + 1))
+
+    return {
+        "feature": np.array(feature, dtype=np.int32),
+        "threshold": np.array(threshold, dtype=np.float64),
+        "left": np.array(left, dtype=np.int32),
+        "right": np.array(right, dtype=np.int32),
+        "default_left": np.array(default_left, dtype=bool),
+        "missing_type": np.array(missing_type, dtype=np.uint8),
+        "value": np.array(value, dtype=np.float64),
+        "roots": np.array(roots, dtype=np.int32),
+        "tree_class": np.array(tree_class, dtype=np.int32),
+        "bias": bias,
+        "max_depth": max_depth,
+        "num_class": num_class,
+        "num_feature": dump["max_feature_idx"] + 1,
+        "objective": objective,
+        "source_trees": len(dump["tree_info"]),
+        "num_iteration": len(dump["tree_info"]) // num_class,
+    }
+
+
+def write_forest(path, arrays):
+    header = {"format_version": FORMAT_VERSION, "arrays": {}}
+    buffers = []
+    offset = 0
+    for name, value in arrays.items():
+        value = np.asarray(value)
+        if value.ndim == 0:
+            header[name] = value.item()
+            continue
+        value = np.ascontiguousarray(value)
+        header["arrays"][name] = {"dtype": value.dtype.str, "shape": list(value.shape), "offset": offset}
+        buffers.append(value.tobytes())
+        offset += value.nbytes
+
+    encoded = json.dumps(header).encode()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER_SIZE.pack(len(encoded)))
+        f.write(encoded)
+        for buffer in buffers:
+            f.write(buffer)
+    os.replace(tmp_path, path)
+
+
+def read_forest(path):
+    """Returns the arrays/fields dict written by write_forest, or None for another format version."""
+    with open(path, "rb") as f:
+        data = f.read()
+    (header_length,) = HEADER_SIZE.unpack_from(data)
+    header = json.loads(data[HEADER_SIZE.size:HEADER_SIZE.size + header_length])
+    if header.get("format_version") != FORMAT_VERSION:
+        return None
+
+    body = HEADER_SIZE.size + header_length
+    fields = {key: value for key, value in header.items() if key != "arrays"}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        fields[name] = np.frombuffer(data, dtype=dtype, count=count,
+                                     offset=body + spec["offset"]).reshape(spec["shape"])
+    return fields
+
+
+def export_forest(model_path, booster=None, num_iteration=None):
+    """
+    Compiles the pickled booster (or LGBMClassifier) at model_path into its forest
+    file. Training passes the booster it just saved to skip unpickling it again;
+    compaction (inference/compact.py) passes a truncated num_iteration.
+    """
+    if not os.path.exists(model_path):
+        raise ModelNotFoundError(f"Model not found ({model_path}).")
+    if booster is None:
+        import joblib
+        model = joblib.load(model_path)
+        booster = model.booster_ if hasattr(model, "booster_") else model
+
+    arrays = compile_booster(booster, num_iteration=num_iteration)
+    arrays["source_size"] = os.path.getsize(model_path)
+    arrays["source_sha256"] = _file_sha256(model_path)
+    write_forest(forest_path_for(model_path), arrays)
+    return CompiledForest(arrays)
+
+
+def load_forest(model_path, verify=False):
+    """
+    Loads <model>_forest.bin, compiling it from the .pkl when it is missing or
+    older than the model. verify=True also compares the content hash, for when
+    the .pkl may have been replaced with a file of the same size.
+    """
+    path = forest_path_for(model_path)
+    model_exists = os.path.exists(model_path)
+
+    if os.path.exists(path):
+        fields = read_forest(path)
+        forest = CompiledForest(fields) if fields is not None else None
+        if forest is not None and not model_exists:
+            return forest
+        if forest is not None and os.path.getsize(model_path) == forest.source["size"]:
+            if os.path.getmtime(path) >= os.path.getmtime(model_path) and not verify:
+                return forest
+            if _file_sha256(model_path) == forest.source["sha256"]:
+                return forest
+
+    if not model_exists:
+        raise ModelNotFoundError(f"Model not found ({model_path}).")
+    return export_forest(model_path)
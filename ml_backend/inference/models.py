@@ -0,0 +1,205 @@
+# models.py
+import os
+import json
+import time
+import threading
+
+import numpy as np
+
+from .config import DOMAINS, DERIVED_FEATURE_COUNT, LEVEL1_FEATURES, model_dir_for, model_paths
+from .errors import ModelNotFoundError, UnknownDomainError
+from .forest import load_forest, forest_path_for
+from .releases import current_version, candidate_version
+
+# ==============================================================================
+# MODEL LOADING (first use, then cached per process)
+# ==============================================================================
+#
+# A deployable model is <domain>_lgbm_model_forest.bin + <domain>_lgbm_model_meta.json.
+# The .pkl is only read to (re)compile the forest or for metadata-less legacy models,
+# and only then are joblib/lightgbm imported.
+#
+# Each loaded model remembers the release it came from. refresh_models() (run
+# periodically by start_release_watcher) loads and warms the version a moved
+# CURRENT pointer names, then replaces the cache entry in one assignment: requests
+# already holding the old dict finish on it, later ones get the warm new one.
+# The CANDIDATE release of each loaded model is only noted (_CANDIDATES); shadow
+# scoring (backend/shadow.py) loads it with load_release() in its own process.
+
+_LOADED = {}
+_CANDIDATES = {}
+
+
+def read_metadata(model_path):
+    """Same sidecar as training/model_metadata.py; {} when the model has none."""
+    try:
+        with open(os.path.splitext(model_path)[0] + "_meta.json") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _require_model(model_path, what):
+    if not os.path.exists(model_path) and not os.path.exists(forest_path_for(model_path)):
+        raise ModelNotFoundError(f"Model files for {what} not found. Train the model first ({model_path}).")
+
+
+def _legacy_pickle(path):
+    import joblib
+    return joblib.load(path)
+
+
+def load_classes(meta, encoder_path):
+    """
+    Class labels in encoded order, as an object array for NumPy fancy-index decoding.
+    The pickled sklearn LabelEncoder is only read for models whose metadata predates
+    the 'classes' field.
+    """
+    if meta.get('classes') is not None:
+        return np.array(meta['classes'], dtype=object)
+
+    if not os.path.exists(encoder_path):
+        raise ModelNotFoundError(f"Label encoder not found ({encoder_path}).")
+    return np.array(_legacy_pickle(encoder_path).classes_, dtype=object)
+
+
+def load_domain_model(population, domain):
+    """Loads the compiled forest, class labels and metadata for one Level 2 domain."""
+    key = (population, domain)
+    if key in _LOADED:
+        return _LOADED[key]
+
+    if key not in DOMAINS:
+        raise UnknownDomainError(f"Unknown domain: {population}/{domain}")
+
+    loaded = _LOADED[key] = _build_domain_model(population, domain)
+    return loaded
+
+
+def _build_domain_model(population, domain, release=None):
+    release = release if release is not None else current_version(model_dir_for(population), domain)
+    model_path, encoder_path = model_paths(population, domain, release)
+    _require_model(model_path, f"{population}/{domain}")
+
+    meta = read_metadata(model_path)
+    feature_names = meta.get('feature_names') or _legacy_pickle(model_path).feature_name()
+    means = meta.get('imputation_means') or {}
+
+    spec = DOMAINS[(population, domain)]
+    n_items = len(feature_names) - DERIVED_FEATURE_COUNT[spec['derived']]
+    item_names = feature_names[:n_items]
+
+    return {
+        'model': load_forest(model_path),
+        'classes': load_classes(meta, encoder_path),
+        'version': meta.get('version'),
+        'release': release,
+        'model_path': model_path,
+        'spec': spec,
+        'feature_names': feature_names,
+        'item_names': item_names,
+        # NaN where no training mean exists (legacy models): such items cannot be imputed
+        'item_means': np.array([np.nan if means.get(n) is None else means[n] for n in item_names]),
+        'reverse_mask': np.isin(item_names, spec.get('reverse_items', [])),
+    }
+
+
+def load_level1_model(population):
+    """Loads the Level 1 diagnosis classifier for a population."""
+    key = (population, 'level1_diagnosis')
+    if key in _LOADED:
+        return _LOADED[key]
+
+    if population not in LEVEL1_FEATURES:
+        raise UnknownDomainError(f"Unknown population: {population}")
+
+    loaded = _LOADED[key] = _build_level1_model(population)
+    return loaded
+
+
+def _build_level1_model(population, release=None):
+    release = release if release is not None else current_version(model_dir_for(population), 'level1_diagnosis')
+    model_path, encoder_path = model_paths(population, 'level1_diagnosis', release)
+    _require_model(model_path, f"{population} Level 1")
+
+    meta = read_metadata(model_path)
+    return {
+        'model': load_forest(model_path),
+        'classes': load_classes(meta, encoder_path),
+        'version': meta.get('version'),
+        'release': release,
+        'model_path': model_path,
+        'feature_names': LEVEL1_FEATURES[population],
+    }
+
+
+def is_loaded(population, domain):
+    """True when the model is already in this process's cache (domain 'level1_diagnosis' for Level 1)."""
+    return (population, domain) in _LOADED
+
+
+def candidate_release(population, domain):
+    """CANDIDATE release of a loaded model as of the last refresh, or None. Never touches the disk."""
+    return _CANDIDATES.get((population, domain))
+
+
+def clear_model_cache():
+    """Drops every loaded model so the next call re-reads them from disk."""
+    _LOADED.clear()
+    _CANDIDATES.clear()
+
+
+# ==============================================================================
+# RELEASE WATCHER (background warm + atomic swap when CURRENT moves)
+# ==============================================================================
+
+def load_release(population, domain, release):
+    """Loads (uncached) and warms one release of a model."""
+    if domain == 'level1_diagnosis':
+        fresh = _build_level1_model(population, release)
+    else:
+        fresh = _build_domain_model(population, domain, release)
+    # Warm: first predict touches every array page before real traffic does
+    fresh['model'].predict(np.zeros((1, fresh['model'].num_feature)))
+    return fresh
+
+
+def refresh_models():
+    """
+    Reloads every cached model whose CURRENT pointer changed. The new version is
+    fully loaded and run once before it replaces the cached one. Returns
+    [(population, domain, old release, new release), ...].
+    The CANDIDATE pointers of the cached models are re-read along the way.
+    """
+    swapped = []
+    for (population, domain), loaded in list(_LOADED.items()):
+        model_dir = model_dir_for(population)
+        release = current_version(model_dir, domain)
+        if release is not None and release != loaded['release']:
+            _LOADED[(population, domain)] = load_release(population, domain, release)
+            swapped.append((population, domain, loaded['release'], release))
+
+        candidate = candidate_version(model_dir, domain)
+        if candidate is None or candidate == release:
+            _CANDIDATES.pop((population, domain), None)
+        else:
+            _CANDIDATES[(population, domain)] = candidate
+    return swapped
+
+
+def start_release_watcher(interval_seconds, on_swap=None):
+    """Daemon thread running refresh_models() every interval_seconds; on_swap gets each swap tuple."""
+    def watch():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                for swap in refresh_models():
+                    print("Model release swapped: {}/{} v{} -> v{}".format(*swap))
+                    if on_swap is not None:
+                        on_swap(*swap)
+            except Exception as e:      # keep serving the loaded versions
+                print(f"Model release refresh failed: {e}")
+
+    thread = threading.Thread(target=watch, name="release-watcher", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,277 @@
+# releases.py
+import os
+import re
+import sys
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timezone
+
+# ==============================================================================
+# VERSIONED MODEL RELEASES (immutable version dirs + atomic CURRENT pointer)
+# ==============================================================================
+#
+#   models/<population>_model/releases/<domain>/
+#       v1/  v2/  v3/         one immutable directory per trained version
+#       CURRENT               "v3" - the version serving uses
+#       CANDIDATE             "v4" - optional: scored in shadow, not served
+#       HISTORY               one line per activation (audit trail)
+#
+# Training builds a version in a hidden staging dir, renames it into place (an
+# atomic directory rename) and only then replaces CURRENT (temp file + fsync +
+# os.replace). A reader therefore sees either the old or the new version, never a
+# half-written one. Activation also mirrors the version's files to the flat
+# models/<population>_model/<domain>_* paths (again via temp + rename) for the
+# training and benchmark scripts that read those directly.
+#
+# A version published as a candidate (MINDGAUGE_RELEASE_AS_CANDIDATE=1 while
+# training, or `propose`) only moves CANDIDATE: the backend scores live traffic
+# with it in the background (backend/shadow.py) and `promote` makes it CURRENT.
+#
+# Domains without a releases/ dir (models trained before releases existed) are
+# served from the flat files; `adopt` turns them into v<N> releases.
+#
+#   cd ml_backend
+#   python -m inference.releases list children sleep
+#   python -m inference.releases rollback children sleep       # previous version
+#   python -m inference.releases activate children sleep 3
+#   python -m inference.releases propose children sleep 4      # shadow candidate
+#   python -m inference.releases promote children sleep        # candidate -> CURRENT
+#   python -m inference.releases withdraw children sleep       # drop the candidate
+#   python -m inference.releases adopt                         # every flat model
+
+RELEASES_DIRNAME = "releases"
+POINTER_FILE = "CURRENT"
+CANDIDATE_FILE = "CANDIDATE"
+HISTORY_FILE = "HISTORY"
+VERSION_DIR = re.compile(r"^v(\d+)$")
+
+
+def releases_dir(model_dir, domain):
+    return os.path.join(model_dir, RELEASES_DIRNAME, domain)
+
+
+def list_versions(model_dir, domain):
+    """Published version numbers, ascending."""
+    try:
+        names = os.listdir(releases_dir(model_dir, domain))
+    except FileNotFoundError:
+        return []
+    return sorted(int(m.group(1)) for m in map(VERSION_DIR.match, names) if m)
+
+
+def _read_pointer(model_dir, domain, name):
+    try:
+        with open(os.path.join(releases_dir(model_dir, domain), name)) as f:
+            match = VERSION_DIR.match(f.read().strip())
+    except FileNotFoundError:
+        return None
+    return int(match.group(1)) if match else None
+
+
+def current_version(model_dir, domain):
+    """Version number CURRENT points to, or None when the domain has no releases."""
+    return _read_pointer(model_dir, domain, POINTER_FILE)
+
+
+def candidate_version(model_dir, domain):
+    """Version number CANDIDATE points to, or None when nothing is being shadowed."""
+    return _read_pointer(model_dir, domain, CANDIDATE_FILE)
+
+
+def version_dir(model_dir, domain, version):
+    return os.path.join(releases_dir(model_dir, domain), f"v{version}")
+
+
+def _fsync_dir(path):
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _atomic_write(path, text):
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(directory)
+
+
+def _atomic_copy(source, target):
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(target)}.", dir=os.path.dirname(target))
+    os.close(fd)
+    try:
+        shutil.copy2(source, tmp_path)      # keeps mtimes, so forest staleness checks still hold
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def stage(model_dir, domain):
+    """Empty staging dir for the next version; pass it to publish() once every file is written."""
+    base = releases_dir(model_dir, domain)
+    os.makedirs(base, exist_ok=True)
+    return tempfile.mkdtemp(prefix=".staging-", dir=base)
+
+
+def publish(model_dir, domain, staging_dir, version, candidate=False):
+    """Moves a fully written staging dir into place as v<version> and activates (or proposes) it."""
+    for name in os.listdir(staging_dir):
+        with open(os.path.join(staging_dir, name), "rb") as f:
+            os.fsync(f.fileno())
+    target = version_dir(model_dir, domain, version)
+    if os.path.exists(target):
+        raise FileExistsError(f"Release {domain} v{version} already exists ({target}).")
+    os.rename(staging_dir, target)
+    _fsync_dir(os.path.dirname(target))
+    if candidate:
+        propose(model_dir, domain, version)
+    else:
+        activate(model_dir, domain, version)
+    return target
+
+
+def _log(model_dir, domain, line):
+    with open(os.path.join(releases_dir(model_dir, domain), HISTORY_FILE), "a") as f:
+        f.write(f"{datetime.now(timezone.utc).isoformat(timespec='seconds')} {line}\n")
+
+
+def activate(model_dir, domain, version, reason="publish"):
+    """Points CURRENT at an existing version and mirrors its files to the flat paths."""
+    source = version_dir(model_dir, domain, version)
+    if not os.path.isdir(source):
+        raise FileNotFoundError(f"No release v{version} for {domain} in {model_dir}.")
+
+    base = releases_dir(model_dir, domain)
+    _atomic_write(os.path.join(base, POINTER_FILE), f"v{version}\n")
+    _log(model_dir, domain, f"v{version} {reason}")
+    if candidate_version(model_dir, domain) == version:
+        os.remove(os.path.join(base, CANDIDATE_FILE))
+
+    for name in sorted(os.listdir(source)):
+        _atomic_copy(os.path.join(source, name), os.path.join(model_dir, name))
+
+
+def propose(model_dir, domain, version):
+    """Points CANDIDATE at an existing version; serving keeps answering with CURRENT."""
+    if not os.path.isdir(version_dir(model_dir, domain, version)):
+        raise FileNotFoundError(f"No release v{version} for {domain} in {model_dir}.")
+    _atomic_write(os.path.join(releases_dir(model_dir, domain), CANDIDATE_FILE), f"v{version}\n")
+    _log(model_dir, domain, f"v{version} candidate")
+
+
+def promote(model_dir, domain):
+    """Activates the candidate. Returns its version."""
+    version = candidate_version(model_dir, domain)
+    if version is None:
+        raise ValueError(f"{domain} has no candidate release to promote.")
+    activate(model_dir, domain, version, reason="promote")
+    return version
+
+
+def withdraw(model_dir, domain):
+    """Drops the candidate pointer (the version dir stays for later use)."""
+    version = candidate_version(model_dir, domain)
+    if version is not None:
+        os.remove(os.path.join(releases_dir(model_dir, domain), CANDIDATE_FILE))
+        _log(model_dir, domain, f"v{version} withdrawn")
+    return version
+
+
+def rollback(model_dir, domain, to=None):
+    """Activates `to`, or the newest version older than the current one. Returns the version."""
+    current = current_version(model_dir, domain)
+    if to is None:
+        older = [v for v in list_versions(model_dir, domain) if current is None or v < current]
+        if not older:
+            raise ValueError(f"No version of {domain} older than v{current} to roll back to.")
+        to = older[-1]
+    activate(model_dir, domain, to, reason=f"rollback from v{current}")
+    return to
+
+
+def adopt(model_dir, domain, version=None):
+    """Publishes the flat <domain>_* files of a pre-release model as its first release."""
+    files = [n for n in os.listdir(model_dir)
+             if n.startswith(f"{domain}_") and os.path.isfile(os.path.join(model_dir, n))
+             and not re.search(r"_v\d+(_meta)?\.(pkl|json)$", n)]
+    if not any(n.endswith("_lgbm_model.pkl") for n in files):
+        raise FileNotFoundError(f"No {domain}_lgbm_model.pkl in {model_dir}.")
+
+    staging = stage(model_dir, domain)
+    for name in files:
+        shutil.copy2(os.path.join(model_dir, name), os.path.join(staging, name))
+    return publish(model_dir, domain, staging, version or 1)
+
+
+def next_version(model_dir, domain, previous=None):
+    """Next free version number: above every release and the flat metadata's version."""
+    return max(list_versions(model_dir, domain) + [previous or 0]) + 1
+
+
+if __name__ == '__main__':
+    from .config import MODELS_DIR
+
+    parser = argparse.ArgumentParser(description="List, activate or roll back model releases.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for command in ("list", "rollback", "activate", "propose", "promote", "withdraw"):
+        p = sub.add_parser(command)
+        p.add_argument("population")
+        p.add_argument("domain")
+        if command in ("activate", "propose"):
+            p.add_argument("version", type=int)
+    sub.add_parser("adopt", help="turn every flat model without releases into v<metadata version or 1>")
+    args = parser.parse_args()
+
+    if args.command == "adopt":
+        import json
+        for model_dir in sorted(d for d in (os.path.join(MODELS_DIR, n) for n in os.listdir(MODELS_DIR))
+                                if d.endswith("_model") and os.path.isdir(d)):
+            for name in sorted(os.listdir(model_dir)):
+                if not name.endswith("_lgbm_model.pkl"):
+                    continue
+                domain = name[:-len("_lgbm_model.pkl")]
+                if current_version(model_dir, domain) is not None:
+                    continue
+                try:
+                    with open(os.path.join(model_dir, f"{domain}_lgbm_model_meta.json")) as f:
+                        version = json.load(f).get("version")
+                except FileNotFoundError:
+                    version = None
+                print(f"{os.path.basename(model_dir)}/{domain}: -> {adopt(model_dir, domain, version)}")
+        sys.exit(0)
+
+    model_dir = os.path.join(MODELS_DIR, f"{args.population}_model")
+    if args.command == "list":
+        current = current_version(model_dir, args.domain)
+        candidate = candidate_version(model_dir, args.domain)
+        for v in list_versions(model_dir, args.domain):
+            print(f"{'*' if v == current else 'c' if v == candidate else ' '} v{v}")
+        if current is None:
+            print(f"{args.population}/{args.domain} has no releases (served from the flat files).")
+    elif args.command == "rollback":
+        print(f"{args.population}/{args.domain}: now serving v{rollback(model_dir, args.domain)}")
+    elif args.command == "propose":
+        propose(model_dir, args.domain, args.version)
+        print(f"{args.population}/{args.domain}: shadow scoring v{args.version}")
+    elif args.command == "promote":
+        print(f"{args.population}/{args.domain}: now serving v{promote(model_dir, args.domain)}")
+    elif args.command == "withdraw":
+        version = withdraw(model_dir, args.domain)
+        print(f"{args.population}/{args.domain}: " + ("no candidate" if version is None else f"v{version} withdrawn"))
+    else:
+        activate(model_dir, args.domain, args.version, reason="manual")
+        print(f"{args.population}/{args.domain}: now serving v{args.version}")
@@ -0,0 +1,70 @@
+# rules.py
+import numpy as np
+
+from .config import SEVERITY_CUTOFFS
+from .models import load_domain_model
+from .scoring import to_score_matrix, build_feature_matrix, predict_unique
+
+# ==============================================================================
+# RULE FAST PATH (published cut-offs on the derived score, no tree walk)
+# ==============================================================================
+#
+# Where the instrument publishes raw-score cut-offs (config.SEVERITY_CUTOFFS), the
+# label is a comparison of PS / NDSU against them, which the models were trained to
+# reproduce. predict_batch_with_rules answers those rows directly (probability 1.0
+# for the rule's label) and only walks the forest for the rest: domains without
+# cut-offs, and bands whose label the model has no class for.
+# The backend's auditor re-scores a sample of rule answers with the model.
+
+
+def has_rules(population, domain):
+    return (population, domain) in SEVERITY_CUTOFFS
+
+
+def _band_classes(loaded, cutoffs):
+    """Class index of every cut-off band (-1 where the model has no such class)."""
+    if 'rule_bands' not in loaded:
+        index = {label: i for i, label in enumerate(loaded['classes'])}
+        loaded['rule_bands'] = (
+            np.array([low for low, _ in cutoffs], dtype=np.float64),
+            np.array([index.get(label, -1) for _, label in cutoffs] + [-1]),
+        )
+    return loaded['rule_bands']
+
+
+def rule_class_indices(loaded, cutoffs, X):
+    """Class index from the cut-offs per feature row, -1 where the rules do not decide."""
+    lows, classes = _band_classes(loaded, cutoffs)
+    band = np.searchsorted(lows, X[:, -1], side='right') - 1
+    # Scores below the first band map to the trailing -1
+    return classes[np.where(band < 0, len(lows), band)]
+
+
+def predict_batch_with_rules(population, domain, raw_scores, loaded=None):
+    """
+    predict_batch with the rule fast path. Returns (labels, probabilities, by_rule),
+    by_rule marking the rows answered from the cut-offs; `loaded` pins an already
+    loaded model.
+    """
+    loaded = loaded or load_domain_model(population, domain)
+    raw_matrix = to_score_matrix(raw_scores, len(loaded['item_names']))
+    X, scorable = build_feature_matrix(loaded, raw_matrix)
+
+    n_classes = len(loaded['classes'])
+    probabilities = np.full((len(X), n_classes), np.nan)
+    labels = np.full(len(X), None, dtype=object)
+    by_rule = np.zeros(len(X), dtype=bool)
+
+    cutoffs = SEVERITY_CUTOFFS.get((population, domain))
+    if cutoffs is not None:
+        class_index = rule_class_indices(loaded, cutoffs, X)
+        by_rule = scorable & (class_index >= 0)
+        probabilities[by_rule] = np.eye(n_classes)[class_index[by_rule]]
+        labels[by_rule] = loaded['classes'][class_index[by_rule]]
+
+    rest = scorable & ~by_rule
+    if rest.any():
+        probabilities[rest] = predict_unique(loaded['model'], X[rest])
+        labels[rest] = loaded['classes'][np.argmax(probabilities[rest], axis=1)]
+
+    return labels, probabilities, by_rule
@@ -0,0 +1,159 @@
+# scoring.py
+import math
+
+import numpy as np
+
+from .config import MIN_ANSWERED_FRACTION, LEVEL1_THRESHOLDS
+from .errors import InvalidInputError
+from .models import load_domain_model, load_level1_model
+
+# ==============================================================================
+# 1. VECTORIZED FEATURE CONSTRUCTION (NaN mask imputation + TR/PS recompute)
+# ==============================================================================
+
+def to_score_matrix(raw_scores, n_items):
+    """Converts rows of raw scores (None for unanswered items) into a float matrix with NaN gaps."""
+    if isinstance(raw_scores, np.ndarray):
+        matrix = raw_scores.astype(np.float64, copy=False)
+    else:
+        rows = list(raw_scores)
+        try:
+            if any(len(row) != n_items for row in rows):
+                raise InvalidInputError(f"Input must contain exactly {n_items} symptom scores per respondent.")
+            matrix = np.array(
+                [[np.nan if v is None else v for v in row] for row in rows], dtype=np.float64
+            ).reshape(len(rows), n_items)
+        except InvalidInputError:
+            raise
+        except (TypeError, ValueError) as e:
+            raise InvalidInputError(f"Symptom scores must be numbers or None ({e}).") from e
+
+    if matrix.ndim != 2 or matrix.shape[1] != n_items:
+        raise InvalidInputError(f"Input must contain exactly {n_items} symptom scores per respondent.")
+    return matrix
+
+
+def build_feature_matrix(loaded, raw_matrix):
+    """
+    Returns (X, scorable) for a (n_respondents, n_items) matrix of raw scores.
+
+    Missing items (NaN) are imputed with the training means for the item features,
+    while TR is the sum of the answered items and PS is prorated to the full item
+    count, as PROMIS scoring prescribes. Rows with fewer than half of the items
+    answered, or with gaps a legacy model has no means for, are not scorable.
+    """
+    spec = loaded['spec']
+    n_items = raw_matrix.shape[1]
+
+    processed = np.where(loaded['reverse_mask'], 6 - raw_matrix, raw_matrix)
+    missing = np.isnan(processed)
+    answered = n_items - missing.sum(axis=1)
+
+    imputed = np.where(missing, loaded['item_means'], processed)
+    scorable = (answered >= math.ceil(n_items * MIN_ANSWERED_FRACTION)) & ~np.isnan(imputed).any(axis=1)
+
+    total_raw = np.nansum(processed, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prorated = total_raw * n_items / answered
+
+    if spec['derived'] == 'tr_ps':
+        # Round half up to a whole score
+        derived = [total_raw, np.floor(prorated * spec.get('ps_scale', 1) + 0.5)]
+    elif spec['derived'] == 'tr_ats':
+        derived = [total_raw, np.round(prorated / n_items, 2)]
+    else:
+        derived = [(processed > 0).sum(axis=1)]
+
+    X = np.column_stack([imputed] + derived)
+    return X, scorable
+
+
+def predict_unique(model, X):
+    """
+    The item space is tiny, so cohorts repeat the same response patterns: walk the
+    trees once per distinct feature row and scatter the results back.
+    """
+    if len(X) == 1:
+        return model.predict(X)
+    unique_X, inverse = np.unique(X, axis=0, return_inverse=True)
+    return model.predict(unique_X)[inverse.ravel()]
+
+
+# ==============================================================================
+# 2. LEVEL 2 PREDICTION (batch + single respondent)
+# ==============================================================================
+
+def predict_batch(population, domain, raw_scores):
+    """
+    Scores many respondents at once. Returns (labels, probabilities); rows that are
+    not scorable get a None label and NaN probabilities.
+    """
+    return predict_with(load_domain_model(population, domain), raw_scores)
+
+
+def predict_with(loaded, raw_scores):
+    """predict_batch against an already loaded model (e.g. a shadow candidate)."""
+    raw_matrix = to_score_matrix(raw_scores, len(loaded['item_names']))
+    X, scorable = build_feature_matrix(loaded, raw_matrix)
+
+    probabilities = np.full((len(X), len(loaded['classes'])), np.nan)
+    labels = np.full(len(X), None, dtype=object)
+
+    if scorable.any():
+        probabilities[scorable] = predict_unique(loaded['model'], X[scorable])
+        labels[scorable] = loaded['classes'][np.argmax(probabilities[scorable], axis=1)]
+
+    return labels, probabilities
+
+
+def predict_severity(population, domain, raw_symptom_scores):
+    """Predicts the severity label for one respondent; None marks an unanswered item."""
+    labels, _ = predict_batch(population, domain, [raw_symptom_scores])
+    if labels[0] is None:
+        raise InvalidInputError(
+            f"Not enough answered items to score {population}/{domain} "
+            f"(at least {MIN_ANSWERED_FRACTION:.0%} required)."
+        )
+    return labels[0]
+
+
+# ==============================================================================
+# 3. LEVEL 1 PREDICTION (Cross-cutting diagnosis + Level 2 referrals)
+# ==============================================================================
+
+def _domain_score_matrix(domain_scores):
+    try:
+        matrix = np.asarray(domain_scores, dtype=np.float64)
+    except (TypeError, ValueError) as e:
+        raise InvalidInputError(f"Level 1 domain scores must be numbers ({e}).") from e
+    # Parsed request matrices carry null as NaN; Level 1 has no unanswered domains
+    if np.isnan(matrix).any():
+        raise InvalidInputError("Level 1 domain scores must be numbers (got null).")
+    return matrix
+
+
+def predict_level1_batch(population, domain_scores):
+    """Returns (diagnoses, probabilities) for a (n_respondents, n_level1_domains) matrix."""
+    return predict_level1_with(load_level1_model(population), domain_scores)
+
+
+def predict_level1_with(loaded, domain_scores):
+    """predict_level1_batch against an already loaded model."""
+    matrix = _domain_score_matrix(domain_scores)
+    if matrix.ndim != 2 or matrix.shape[1] != len(loaded['feature_names']):
+        raise InvalidInputError(f"Input must contain exactly {len(loaded['feature_names'])} domain scores.")
+
+    probabilities = predict_unique(loaded['model'], matrix)
+    diagnoses = loaded['classes'][np.argmax(probabilities, axis=1)]
+    return diagnoses, probabilities
+
+
+def predict_diagnosis(population, domain_scores):
+    """Predicts the Level 1 diagnosis for one respondent."""
+    diagnoses, _ = predict_level1_batch(population, [domain_scores])
+    return diagnoses[0]
+
+
+def level1_referrals_batch(population, domain_scores):
+    """Boolean (n_respondents, n_level1_domains) matrix: True where the Level 2 threshold is met."""
+    return _domain_score_matrix(domain_scores) >= np.array(LEVEL1_THRESHOLDS[population])
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the ml_backend packages the way the benchmarks and scripts do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,75 @@
+import os
+import sys
+import threading
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'training'))
+import data_cache
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / "scores.csv")
+    pd.DataFrame({
+        "Sample ID": [f"s{i}" for i in range(200)],
+        "q1": [i % 5 for i in range(200)],
+        "label": ["Low", "High"] * 100,
+    }).to_csv(path, index=False)
+    return path
+
+
+def cache_entries(csv_path):
+    return sorted(os.listdir(os.path.dirname(data_cache.cache_dir_for(csv_path))))
+
+
+def test_rebuild_replaces_the_cache_without_leftovers(csv_path):
+    first = data_cache.build_cache(csv_path)
+    second = data_cache.build_cache(csv_path)
+    assert first == second
+    assert cache_entries(csv_path) == ["scores"]
+    assert data_cache.load_scores(csv_path)["q1"].tolist() == [i % 5 for i in range(200)]
+
+
+def test_old_cache_stays_until_the_new_one_is_in_place(csv_path, monkeypatch):
+    data_cache.build_cache(csv_path)
+    target = data_cache.cache_dir_for(csv_path)
+    seen = []
+    swap_in = data_cache._swap_in
+
+    def checking_swap_in(staging, target_dir):
+        seen.append(os.path.exists(os.path.join(target, data_cache.SCHEMA_FILE)))
+        swap_in(staging, target_dir)
+
+    monkeypatch.setattr(data_cache, "_swap_in", checking_swap_in)
+    data_cache.build_cache(csv_path)
+    assert seen == [True]
+
+    # A failed build leaves the previous cache and no staging directory behind
+    monkeypatch.setattr(data_cache, "_write_cache", lambda *args: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        data_cache.build_cache(csv_path)
+    assert cache_entries(csv_path) == ["scores"]
+    assert data_cache.load_scores(csv_path)["label"].tolist() == ["Low", "High"] * 100
+
+
+def test_concurrent_builds_do_not_clobber_each_other(csv_path):
+    errors = []
+
+    def build():
+        try:
+            for _ in range(5):
+                data_cache.build_cache(csv_path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=build) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert cache_entries(csv_path) == ["scores"]
+    assert len(data_cache.load_scores(csv_path)) == 200
@@ -0,0 +1,134 @@
+import os
+
+import pytest
+
+from inference import releases
+
+
+def write_version(model_dir, domain, version, body):
+    """Publishes a release holding one model file whose content is `body`."""
+    staging = releases.stage(model_dir, domain)
+    with open(os.path.join(staging, f"{domain}_lgbm_model.pkl"), "w") as f:
+        f.write(body)
+    return releases.publish(model_dir, domain, staging, version)
+
+
+def flat_model(model_dir, domain):
+    with open(os.path.join(model_dir, f"{domain}_lgbm_model.pkl")) as f:
+        return f.read()
+
+
+def test_publish_activates_and_mirrors_flat_files(tmp_path):
+    model_dir = str(tmp_path)
+    target = write_version(model_dir, "sleep", 1, "one")
+
+    assert target == releases.version_dir(model_dir, "sleep", 1)
+    assert releases.list_versions(model_dir, "sleep") == [1]
+    assert releases.current_version(model_dir, "sleep") == 1
+    assert flat_model(model_dir, "sleep") == "one"
+    assert releases.next_version(model_dir, "sleep") == 2
+
+
+def test_staging_dirs_are_not_versions(tmp_path):
+    model_dir = str(tmp_path)
+    write_version(model_dir, "sleep", 1, "one")
+    releases.stage(model_dir, "sleep")
+
+    assert releases.list_versions(model_dir, "sleep") == [1]
+    assert releases.next_version(model_dir, "sleep") == 2
+
+
+def test_publish_refuses_an_existing_version(tmp_path):
+    model_dir = str(tmp_path)
+    write_version(model_dir, "sleep", 1, "one")
+
+    with pytest.raises(FileExistsError):
+        write_version(model_dir, "sleep", 1, "other")
+    assert releases.current_version(model_dir, "sleep") == 1
+    assert flat_model(model_dir, "sleep") == "one"
+
+
+def test_rollback_and_activate(tmp_path):
+    model_dir = str(tmp_path)
+    for version, body in ((1, "one"), (2, "two"), (3, "three")):
+        write_version(model_dir, "sleep", version, body)
+
+    assert releases.rollback(model_dir, "sleep") == 2
+    assert releases.current_version(model_dir, "sleep") == 2
+    assert flat_model(model_dir, "sleep") == "two"
+
+    assert releases.rollback(model_dir, "sleep", to=1) == 1
+    assert flat_model(model_dir, "sleep") == "one"
+    with pytest.raises(ValueError):
+        releases.rollback(model_dir, "sleep")
+
+    releases.activate(model_dir, "sleep", 3, reason="manual")
+    assert flat_model(model_dir, "sleep") == "three"
+    with pytest.raises(FileNotFoundError):
+        releases.activate(model_dir, "sleep", 9)
+    assert releases.current_version(model_dir, "sleep") == 3
+
+    with open(os.path.join(releases.releases_dir(model_dir, "sleep"), releases.HISTORY_FILE)) as f:
+        history = [line.split(" ", 1)[1].strip() for line in f]
+    assert history == ["v1 publish", "v2 publish", "v3 publish", "v2 rollback from v3", "v1 rollback from v2",
+                       "v3 manual"]
+
+
+def test_candidate_is_not_served_until_promoted(tmp_path):
+    model_dir = str(tmp_path)
+    write_version(model_dir, "sleep", 1, "one")
+    staging = releases.stage(model_dir, "sleep")
+    with open(os.path.join(staging, "sleep_lgbm_model.pkl"), "w") as f:
+        f.write("two")
+    releases.publish(model_dir, "sleep", staging, 2, candidate=True)
+
+    assert releases.current_version(model_dir, "sleep") == 1
+    assert releases.candidate_version(model_dir, "sleep") == 2
+    assert flat_model(model_dir, "sleep") == "one"
+
+    assert releases.promote(model_dir, "sleep") == 2
+    assert releases.current_version(model_dir, "sleep") == 2
+    assert releases.candidate_version(model_dir, "sleep") is None
+    assert flat_model(model_dir, "sleep") == "two"
+    with pytest.raises(ValueError):
+        releases.promote(model_dir, "sleep")
+
+
+def test_failed_pointer_swap_keeps_the_old_pointer(tmp_path, monkeypatch):
+    model_dir = str(tmp_path)
+    write_version(model_dir, "sleep", 1, "one")
+    staging = releases.stage(model_dir, "sleep")
+    with open(os.path.join(staging, "sleep_lgbm_model.pkl"), "w") as f:
+        f.write("two")
+
+    def crash(source, target):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(releases.os, "replace", crash)
+    with pytest.raises(OSError):
+        releases.publish(model_dir, "sleep", staging, 2)
+    monkeypatch.undo()
+
+    # The version dir is in place, but CURRENT, the flat files and the dir listing are untouched
+    base = releases.releases_dir(model_dir, "sleep")
+    assert releases.current_version(model_dir, "sleep") == 1
+    assert flat_model(model_dir, "sleep") == "one"
+    assert sorted(n for n in os.listdir(base) if n.startswith(".")) == []
+    assert releases.list_versions(model_dir, "sleep") == [1, 2]
+    assert releases.rollback(model_dir, "sleep", to=2) == 2
+    assert flat_model(model_dir, "sleep") == "two"
+
+
+def test_adopt_publishes_flat_files(tmp_path):
+    model_dir = str(tmp_path)
+    for name in ("sleep_lgbm_model.pkl", "sleep_label_encoder.pkl", "sleep_lgbm_model_v3.pkl"):
+        with open(os.path.join(model_dir, name), "w") as f:
+            f.write(name)
+
+    releases.adopt(model_dir, "sleep", 4)
+    assert releases.current_version(model_dir, "sleep") == 4
+    assert sorted(os.listdir(releases.version_dir(model_dir, "sleep", 4))) == [
+        "sleep_label_encoder.pkl", "sleep_lgbm_model.pkl",
+    ]
+    with pytest.raises(FileNotFoundError):
+        releases.adopt(model_dir, "anxiety")
@@ -1,9 +1,6 @@
 # predict_adult_level1_multiclass.py
 import sys
 import os
-import joblib
-import pandas as pd
-import numpy as np
 
 # --- FIX: Path setup remains the same ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -11,34 +8,24 @@ parent_dir = os.path.join(current_dir, '..')
 sys.path.append(parent_dir)
 # --------------------------------------
 
+from domain_scoring import LEVEL1_FEATURES, predict_level1_batch
+
 def predict_diagnosis(domain_scores):
     """
     Predicts the Multi-Class Clinical Diagnosis (e.g., Severe Psychopathology).
+    Model loading and label decoding are shared with batch scoring (see domain_scoring.py).
     """
-    # --- 1. Model and Encoder Loading (Uses MULTI-CLASS path) ---
-    MODEL_PATH = '../../models/adult_model/level1_diagnosis_lgbm_model.pkl'
-    ENCODER_PATH = '../../models/adult_model/level1_diagnosis_label_encoder.pkl'
-    
+    FEATURE_COLUMNS = LEVEL1_FEATURES['adult']
+
+    if len(domain_scores) != len(FEATURE_COLUMNS):
+        raise ValueError(f"Input must contain exactly {len(FEATURE_COLUMNS)} domain scores.")
+
     try:
-        model = joblib.load(MODEL_PATH) 
-        le = joblib.load(ENCODER_PATH) 
+        diagnoses, _ = predict_level1_batch('adult', [domain_scores])
     except FileNotFoundError:
         return "Prediction Error: Model files missing. Please run train_adult_level1_multiclass.py first."
 
-    FEATURE_COLUMNS = [
-        'Depression_Score', 'Anger_Score', 'Mania_Score', 'Anxiety_Score', 
-        'Somatic_Score', 'Sleep_Disturbance_Score', 'Repetitive_Thoughts_Score',
-        'Substance_Use_Score', 'Suicidal_Score', 'Psychosis_Score','Memory_Score','Dissociation_Score', 'Personality_Functioning_Score'
-    ]
-    
-    if len(domain_scores) != len(FEATURE_COLUMNS):
-        raise ValueError(f"Input must contain exactly {len(FEATURE_COLUMNS)} domain scores.")
-    
-    # --- Predict and Decode ---
-    encoded_prediction = model.predict([domain_scores])[0] 
-    predicted_label = le.inverse_transform([encoded_prediction])[0]
-    
-    return predicted_label
+    return diagnoses[0]
 
 
 def check_level2_referrals_dsm5(domain_scores):
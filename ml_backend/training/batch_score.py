@@ -0,0 +1,261 @@
+# batch_score.py
+import sys
+import os
+import time
+import argparse
+import multiprocessing
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+import domain_scoring
+from domain_scoring import sanitize_name
+
+# ==============================================================================
+# OFFLINE BATCH SCORING (Cohort files -> predictions, chunked across processes)
+# ==============================================================================
+#
+# Single domain:
+#   python batch_score.py cohort.csv out.csv --population children --domain sleep
+#   Item columns are matched to the model features after sanitization, so the raw
+#   question headers of the survey export work as-is. Empty cells count as
+#   unanswered items and go through the same imputation/prorating as live scoring.
+#
+# Full Level 1 + Level 2 pipeline:
+#   python batch_score.py cohort.csv out.csv --population adult --pipeline
+#   Needs the Level 1 *_Score columns. Level 2 items are read from columns named
+#   "<domain>:<item header>" (e.g. "sleep:My sleep was restless."); each Level 2
+#   domain with all of its item columns present is scored for the respondents
+#   whose Level 1 score crossed the referral threshold.
+
+DEFAULT_CHUNKSIZE = 50_000
+
+
+# --- Input / output ---
+
+def iter_input_chunks(path, chunksize):
+    if path.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Reading Parquet input requires pyarrow (pip install pyarrow).")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+class OutputWriter:
+    """Appends result chunks to a CSV or Parquet file in the order they are written."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet_writer = None
+        self.wrote_header = False
+
+    def write(self, frame):
+        if self.path.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self.parquet_writer is None:
+                self.parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self.parquet_writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='a' if self.wrote_header else 'w', header=not self.wrote_header, index=False)
+            self.wrote_header = True
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+
+
+# --- Column mapping ---
+
+def item_columns(frame_columns, item_names, prefix=None):
+    """Maps model item names to input columns; returns None if any item column is missing."""
+    lookup = {}
+    for col in frame_columns:
+        name = str(col)
+        if prefix is not None:
+            if not name.startswith(prefix + ':'):
+                continue
+            name = name[len(prefix) + 1:]
+        lookup[sanitize_name(name)] = col
+
+    if not all(item in lookup for item in item_names):
+        return None
+    return [lookup[item] for item in item_names]
+
+
+def _numeric(frame, columns):
+    return frame[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+
+
+# --- Worker side (models are loaded once per worker process) ---
+
+_JOB = {}
+
+
+def init_worker(job):
+    _JOB.update(job)
+    if job['pipeline']:
+        domain_scoring.load_level1_model(job['population'])
+        for domain in job['level2_domains']:
+            domain_scoring.load_domain_model(job['population'], domain)
+    else:
+        domain_scoring.load_domain_model(job['population'], job['domain'])
+
+
+def score_domain_chunk(frame, population, domain, columns):
+    labels, probabilities = domain_scoring.predict_batch(population, domain, _numeric(frame, columns))
+    classes = domain_scoring.load_domain_model(population, domain)['classes']
+    out = pd.DataFrame({'label': labels})
+    for i, cls in enumerate(classes):
+        out[f'prob_{cls}'] = probabilities[:, i]
+    return out
+
+
+def score_pipeline_chunk(frame, population, level2_columns):
+    features = domain_scoring.LEVEL1_FEATURES[population]
+    level1_scores = _numeric(frame, features)
+
+    diagnoses, _ = domain_scoring.predict_level1_batch(population, level1_scores)
+    referred = domain_scoring.level1_referrals_batch(population, level1_scores)
+
+    out = pd.DataFrame({'level1_diagnosis': diagnoses})
+    names = np.array([f.replace('_Score', '').upper() for f in features])
+    out['level2_referrals'] = [', '.join(names[row]) for row in referred]
+
+    for level1_feature, domain in domain_scoring.LEVEL2_DOMAIN_FOR.items():
+        if domain not in level2_columns or level1_feature not in features:
+            continue
+        mask = referred[:, features.index(level1_feature)]
+        labels = np.full(len(frame), None, dtype=object)
+        if mask.any():
+            labels[mask], _ = domain_scoring.predict_batch(
+                population, domain, _numeric(frame[mask], level2_columns[domain])
+            )
+        out[f'{domain}_label'] = labels
+    return out
+
+
+def score_chunk(frame):
+    if _JOB['pipeline']:
+        out = score_pipeline_chunk(frame, _JOB['population'], _JOB['level2_columns'])
+    else:
+        out = score_domain_chunk(frame, _JOB['population'], _JOB['domain'], _JOB['columns'])
+
+    if _JOB['id_column']:
+        out.insert(0, _JOB['id_column'], frame[_JOB['id_column']].to_numpy())
+    return out
+
+
+# --- Driver ---
+
+def resolve_job(args, first_chunk):
+    """Works out which input columns feed which model from the first chunk's header."""
+    job = {
+        'population': args.population,
+        'domain': args.domain,
+        'pipeline': args.pipeline,
+        'id_column': args.id_column,
+    }
+
+    if args.pipeline:
+        missing = [f for f in domain_scoring.LEVEL1_FEATURES[args.population] if f not in first_chunk.columns]
+        if missing:
+            raise SystemExit(f"Input is missing Level 1 columns: {missing}")
+
+        level2_columns = {}
+        for domain in set(domain_scoring.LEVEL2_DOMAIN_FOR.values()):
+            try:
+                item_names = domain_scoring.load_domain_model(args.population, domain)['item_names']
+            except (KeyError, FileNotFoundError):
+                continue
+            columns = item_columns(first_chunk.columns, item_names, prefix=domain)
+            if columns is not None:
+                level2_columns[domain] = columns
+
+        print(f"Level 2 domains scored from input: {sorted(level2_columns) or 'none'}", file=sys.stderr)
+        job['level2_columns'] = level2_columns
+        job['level2_domains'] = sorted(level2_columns)
+    else:
+        item_names = domain_scoring.load_domain_model(args.population, args.domain)['item_names']
+        columns = item_columns(first_chunk.columns, item_names)
+        if columns is None:
+            raise SystemExit(f"Input is missing item columns for {args.population}/{args.domain}: {item_names}")
+        job['columns'] = columns
+
+    return job
+
+
+def run(args):
+    chunks = iter_input_chunks(args.input, args.chunksize)
+    try:
+        first_chunk = next(chunks)
+    except StopIteration:
+        raise SystemExit("Input file is empty.")
+
+    job = resolve_job(args, first_chunk)
+    writer = OutputWriter(args.output)
+
+    def all_chunks():
+        yield first_chunk
+        yield from chunks
+
+    start = time.perf_counter()
+    rows_done = 0
+    # Bounded in-flight window keeps memory flat and results in input order
+    max_in_flight = args.workers * 2
+    pending = deque()
+
+    with multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(job,)) as pool:
+        for chunk in all_chunks():
+            pending.append(pool.apply_async(score_chunk, (chunk,)))
+            while len(pending) >= max_in_flight:
+                rows_done += _drain_one(pending, writer)
+                _report(rows_done, start)
+
+        while pending:
+            rows_done += _drain_one(pending, writer)
+            _report(rows_done, start)
+
+    writer.close()
+    elapsed = time.perf_counter() - start
+    print(f"\nScored {rows_done:,} rows in {elapsed:.1f}s ({rows_done / max(elapsed, 1e-9):,.0f} rows/sec)",
+          file=sys.stderr)
+
+
+def _drain_one(pending, writer):
+    result = pending.popleft().get()
+    writer.write(result)
+    return len(result)
+
+
+def _report(rows_done, start):
+    elapsed = time.perf_counter() - start
+    print(f"\r{rows_done:,} rows scored ({rows_done / max(elapsed, 1e-9):,.0f} rows/sec)",
+          end='', file=sys.stderr, flush=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score a cohort file of raw item responses.")
+    parser.add_argument('input', help="CSV or .parquet file of respondents")
+    parser.add_argument('output', help="CSV or .parquet file to write predictions to")
+    parser.add_argument('--population', required=True, choices=sorted(domain_scoring.LEVEL1_FEATURES))
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--domain', help="Level 2 domain to score (e.g. sleep)")
+    target.add_argument('--pipeline', action='store_true', help="Run Level 1 + referred Level 2 domains")
+    parser.add_argument('--id-column', help="Input column copied to the output (e.g. Sample)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    run(parse_args())
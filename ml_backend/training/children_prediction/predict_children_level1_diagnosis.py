@@ -1,9 +1,6 @@
 # predict_children_level1_diagnosis.py
 import sys
 import os
-import joblib
-import pandas as pd
-import numpy as np
 
 # --- FIX: Add the parent directory (where train_model.py lives) to the path ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -11,43 +8,25 @@ parent_dir = os.path.join(current_dir, '..')
 sys.path.append(parent_dir)
 # -----------------------------------------------------------------------------
 
+from domain_scoring import LEVEL1_FEATURES, predict_level1_batch
+
 def predict_diagnosis(domain_scores):
     """
     Predicts the Clinical Diagnosis based on 12 Level 1 domain scores (Children).
+    Model loading and label decoding are shared with batch scoring (see domain_scoring.py).
     """
-    # --- 1. Model and Encoder Loading ---
-    MODEL_PATH = '../../models/children_model/level1_diagnosis_lgbm_model.pkl' # Use children's path
-    ENCODER_PATH = '../../models/children_model/level1_diagnosis_label_encoder.pkl' # Use children's path
-    
+    FEATURE_COLUMNS = LEVEL1_FEATURES['children']
+
+    if len(domain_scores) != len(FEATURE_COLUMNS):
+        raise ValueError(f"Input must contain exactly {len(FEATURE_COLUMNS)} domain scores (12 actual domains + 1 dummy).")
+
     try:
-        model = joblib.load(MODEL_PATH) 
-        le = joblib.load(ENCODER_PATH) 
+        diagnoses, _ = predict_level1_batch('children', [domain_scores])
     except FileNotFoundError:
-        print("FATAL ERROR: Children's Level 1 model files not found. Ensure you trained this model successfully.")
         return "Prediction Error: Model files missing."
 
-    # --- 2. Define Features (MUST MATCH Training Order) ---
-    # Based on the Level 1 Measure domains (Somatic, Sleep, Inattention, Depression, Anger, Irritability, Mania, Anxiety, Psychosis, Repetitive Thoughts, Substance Use, Suicidal Ideation)
-    FEATURE_COLUMNS = [
-        'Somatic_Score', 'Sleep_Disturbance_Score', 'Inattention_Score', 'Depression_Score', 
-        'Anger_Score', 'Irritability_Score', 'Mania_Score', 'Anxiety_Score', 
-        'Psychosis_Score', 'Repetitive_Thoughts_Score', 'Substance_Use_Score', 
-        'Suicidal_Ideation_Score' # Assuming one dummy score to match 13 input features
-    ]
-    
-    if len(domain_scores) != len(FEATURE_COLUMNS):
-        # NOTE: The children's measure has 12 domains + 1 dummy, ensure input is 13
-        raise ValueError(f"Input must contain exactly {len(FEATURE_COLUMNS)} domain scores (12 actual domains + 1 dummy).")
-    
-    # --- 3. Prepare Data for Prediction ---
-    new_data = pd.DataFrame([domain_scores], columns=FEATURE_COLUMNS)
-    
-    # --- 4. Predict and Decode ---
-    raw_prediction = model.predict_proba(new_data)
-    encoded_prediction = np.argmax(raw_prediction[0]) 
-    predicted_label = le.inverse_transform([encoded_prediction])[0]
-    
-    return predicted_label
+    return diagnoses[0]
+
 
 def check_level2_referrals_dsm5(domain_scores):
     """
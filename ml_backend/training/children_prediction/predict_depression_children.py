@@ -1,72 +1,27 @@
 # predict_depression_children.py
-import joblib
-import pandas as pd
-import numpy as np
-import math
-import re
+import sys
+import os
 
-# --- 1. Model Loading ---
-MODEL_PATH = '../../models/children_model/depression_lgbm_model.pkl'
-ENCODER_PATH = '../../models/children_model/depression_label_encoder.pkl'
+# --- FIX: Add the parent directory (where domain_scoring.py lives) to the path ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.join(current_dir, '..')
+sys.path.append(parent_dir)
+# -----------------------------------------------------------------------------
 
-try:
-    model = joblib.load(MODEL_PATH) 
-    le = joblib.load(ENCODER_PATH) 
-except FileNotFoundError:
-    print("FATAL ERROR: Depression model files not found. Ensure you ran train_depression.py successfully.")
-    exit()
+from domain_scoring import predict_severity as score_domain
 
-# PROMIS Depression has NO reverse scored items.
-DEPRESSION_REVERSE_COLS = [] 
-
-def sanitize_name(name):
-    """Applies the exact same sanitization used during training."""
-    name = str(name).strip().replace(' ', '_').replace('(', '').replace(')', '')
-    name = name.replace(',', '_').replace('.', '_').replace('-', '_').replace(':', '_')
-    name = re.sub(r'__+', '_', name).strip('_')
-    return name
+# Feature construction, model loading and label decoding are shared by all domains
+# (see domain_scoring.py); this module keeps the children's depression entry point.
 
 def predict_severity(raw_symptom_scores):
     """
     Accepts 14 raw PROMIS scores and internally calculates the required 16 features.
+    Unanswered items may be passed as None (at least 7 must be answered).
     """
     if len(raw_symptom_scores) != 14:
         raise ValueError("Input must contain exactly 14 symptom scores for the Depression scale.")
-        
-    # No reverse scoring is needed, so processed scores = raw scores
-    processed_scores = list(raw_symptom_scores)
-            
-    # --- Step 1: Calculate the 2 Missing Features (TR and PS) ---
-    
-    total_raw_score = sum(processed_scores)
-    
-    # Prorated Score (PS): Since all 14 items are present, PS = TR.
-    prorated_score = total_raw_score
-    
-    # --- Step 2: Assemble the 16-Feature Input List and Names ---
-    
-    # 14 processed symptoms + TR + PS = 16 features
-    input_list_16 = processed_scores + [total_raw_score, prorated_score]
-    
-    # Names of the 14 symptom columns (You must check your CSV for exact Q-names)
-    symptom_names = [f'Q{i}' for i in range(1, 15)]
-    
-    # Assemble the 16 feature names (must be sanitized)
-    feature_columns = [
-        sanitize_name(name) for name in symptom_names
-    ] + [
-        sanitize_name('Total Raw Score (TR)'), 
-        sanitize_name('Prorated Score (PS)')
-    ]
-    
-    new_data = pd.DataFrame([input_list_16], columns=feature_columns)
-    
-    # --- Step 3: Predict and Decode ---
-    raw_prediction = model.predict(new_data)
-    encoded_prediction = np.argmax(raw_prediction[0]) 
-    predicted_label = le.inverse_transform([encoded_prediction])[0]
-    
-    return predicted_label
+
+    return score_domain('children', 'depression', raw_symptom_scores)
 
 if __name__ == '__main__':
     # --- Example Test Data (14 Scores Input, 1-5 scale) ---
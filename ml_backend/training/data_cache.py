@@ -0,0 +1,218 @@
+# data_cache.py
+import os
+import json
+import hashlib
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# COLUMNAR BINARY CACHE OF THE SCORE CSVs
+# ==============================================================================
+#
+# Each CSV is parsed from text once and stored as one .npy file per column plus a
+# schema.json sidecar under <csv_dir>/.cache/<csv_name>/. Item scores (0-5) end up
+# as uint8; text columns (Sample ID, label) are stored as integer codes with their
+# categories in the schema. Reads memory-map the .npy files, so loading a large
+# export is a handful of mmap calls instead of a full text parse.
+#
+# The cache is invalidated when the source size/mtime change and the content hash
+# no longer matches (a plain `touch` does not force a rebuild).
+#
+# A build writes into its own staging directory next to the cache and renames it
+# into place when complete, so concurrent builds of one CSV do not clobber each
+# other. A directory cannot be renamed over another, so the old cache is first
+# renamed aside, and it is deleted only after the new one is in place. A reader
+# that looks between the two renames finds no cache and builds one itself.
+
+CACHE_DIR_NAME = ".cache"
+SCHEMA_FILE = "schema.json"
+SCHEMA_VERSION = 1
+
+INTEGER_DTYPES = [np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32, np.int64]
+
+# Text columns with more distinct values than this (e.g. the Sample ID column) keep
+# their categories in a memory-mapped .npy next to the codes instead of schema.json
+ID_COLUMN_MIN_CATEGORIES = 1024
+
+
+def cache_dir_for(csv_path, cache_root=None):
+    """Directory holding the cached columns for one CSV."""
+    csv_path = os.path.abspath(csv_path)
+    if cache_root is None:
+        cache_root = os.path.join(os.path.dirname(csv_path), CACHE_DIR_NAME)
+    return os.path.join(cache_root, os.path.splitext(os.path.basename(csv_path))[0])
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _narrowest_numeric(values):
+    """Smallest dtype that holds the column exactly: integers first, then float32, then float64."""
+    finite = values[~np.isnan(values)]
+    if len(finite) == len(values) and np.array_equal(finite, np.round(finite)):
+        low, high = (finite.min(), finite.max()) if len(finite) else (0, 0)
+        for dtype in INTEGER_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return values.astype(dtype)
+    as_float32 = values.astype(np.float32)
+    if np.array_equal(as_float32, values, equal_nan=True):
+        return as_float32
+    return values
+
+
+def _encode_column(series):
+    """Returns (array, categories or None, column schema entry) for one DataFrame column."""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        array = _narrowest_numeric(series.to_numpy(dtype=np.float64))
+        return array, None, {"name": series.name, "kind": "numeric", "dtype": array.dtype.str}
+
+    codes, categories = pd.factorize(series, use_na_sentinel=True)
+    code_dtype = np.int8 if len(categories) < 127 else (np.int16 if len(categories) < 32767 else np.int32)
+    categories = [str(c) for c in categories]
+    entry = {"name": series.name, "kind": "categorical", "dtype": np.dtype(code_dtype).str}
+
+    if len(categories) > ID_COLUMN_MIN_CATEGORIES:
+        entry["kind"] = "identifier"
+        return codes.astype(code_dtype), np.array(categories, dtype=str), entry
+
+    entry["categories"] = categories
+    return codes.astype(code_dtype), None, entry
+
+
+def build_cache(csv_path, cache_root=None):
+    """Parses the CSV once and writes the columnar cache. Returns the schema."""
+    target = cache_dir_for(csv_path, cache_root)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=os.path.basename(target) + ".", suffix=".tmp", dir=os.path.dirname(target))
+    try:
+        schema = _write_cache(csv_path, staging)
+        _swap_in(staging, target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return schema
+
+
+def _write_cache(csv_path, staging):
+    data = pd.read_csv(csv_path, header=0)
+    stat = os.stat(csv_path)
+
+    columns = []
+    for i, name in enumerate(data.columns):
+        array, categories, entry = _encode_column(data[name])
+        np.save(os.path.join(staging, f"col_{i}.npy"), array)
+        if categories is not None:
+            np.save(os.path.join(staging, f"col_{i}_categories.npy"), categories)
+        columns.append(entry)
+
+    schema = {
+        "version": SCHEMA_VERSION,
+        "source": {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _file_sha256(csv_path)},
+        "rows": len(data),
+        "columns": columns,
+    }
+    with open(os.path.join(staging, SCHEMA_FILE), "w") as f:
+        json.dump(schema, f, indent=2)
+    return schema
+
+
+def _swap_in(staging, target, attempts=10):
+    """Renames the finished staging directory to target; the cache it replaces is deleted afterwards."""
+    retired = []
+    try:
+        for attempt in range(attempts):
+            try:
+                os.rename(staging, target)
+                return
+            except OSError as e:    # a cache is there (or another build is swapping one in)
+                error = e
+            try:
+                os.rename(target, f"{staging}.old{attempt}")
+                retired.append(f"{staging}.old{attempt}")
+            except FileNotFoundError:   # another build moved it first
+                pass
+        raise error
+    finally:
+        for path in retired:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _read_schema(target):
+    try:
+        with open(os.path.join(target, SCHEMA_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _is_fresh(schema, target, csv_path):
+    if schema is None or schema.get("version") != SCHEMA_VERSION:
+        return False
+
+    stat = os.stat(csv_path)
+    source = schema["source"]
+    if stat.st_size != source["size"]:
+        return False
+    if stat.st_mtime_ns == source["mtime_ns"]:
+        return True
+
+    # mtime moved but the size did not: only rebuild if the content really changed
+    if _file_sha256(csv_path) != source["sha256"]:
+        return False
+    source["mtime_ns"] = stat.st_mtime_ns
+    tmp_path = os.path.join(target, SCHEMA_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(schema, f, indent=2)
+    os.replace(tmp_path, os.path.join(target, SCHEMA_FILE))
+    return True
+
+
+def load_columns(csv_path, cache_root=None):
+    """
+    Returns (schema, arrays) where arrays are read-only memory maps, one per column,
+    in header order. Builds or refreshes the cache first when needed.
+    """
+    target = cache_dir_for(csv_path, cache_root)
+    schema = _read_schema(target)
+    if not _is_fresh(schema, target, csv_path):
+        schema = build_cache(csv_path, cache_root)
+
+    arrays = [
+        np.load(os.path.join(target, f"col_{i}.npy"), mmap_mode="r")
+        for i in range(len(schema["columns"]))
+    ]
+    return schema, arrays
+
+
+def load_scores(csv_path, cache_root=None, decode_ids=True):
+    """
+    Drop-in replacement for pd.read_csv(csv_path, header=0) backed by the cache.
+    Numeric columns keep their narrow cached dtype; text columns come back as
+    pandas Categoricals over the original values (missing entries are NaN).
+
+    Building a Categorical over millions of unique IDs costs as much as parsing
+    them, so callers that never look at the Sample ID column can pass
+    decode_ids=False to get its integer codes instead.
+    """
+    schema, arrays = load_columns(csv_path, cache_root)
+    target = cache_dir_for(csv_path, cache_root)
+
+    data = {}
+    for i, (entry, array) in enumerate(zip(schema["columns"], arrays)):
+        if entry["kind"] == "categorical":
+            # Codes are wrapped, not decoded; -1 reads as NaN
+            data[entry["name"]] = pd.Categorical.from_codes(array, categories=entry["categories"])
+        elif entry["kind"] == "identifier" and decode_ids:
+            categories = np.load(os.path.join(target, f"col_{i}_categories.npy"), mmap_mode="r")
+            data[entry["name"]] = pd.Categorical.from_codes(array, categories=categories)
+        else:
+            data[entry["name"]] = array
+
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,20 @@
+# domain_scoring.py
+import sys
+import os
+
+# --- Scoring lives in the slim inference package (ml_backend/inference) ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(current_dir, '..'))
+# -----------------------------------------------------------------------------
+
+# Re-exported so the predictor scripts and batch_score.py keep their imports
+from inference.config import (
+    MODELS_DIR, SLEEP_REVERSE_ITEMS, DERIVED_FEATURE_COUNT, DOMAINS, MIN_ANSWERED_FRACTION,
+    LEVEL1_FEATURES, MILD_THRESHOLD, SLIGHT_THRESHOLD, SLIGHT_DOMAINS, LEVEL1_THRESHOLDS, LEVEL2_DOMAIN_FOR,
+    sanitize_name, model_paths,
+)
+from inference.models import load_classes, load_domain_model, load_level1_model
+from inference.scoring import (
+    to_score_matrix, build_feature_matrix, predict_batch, predict_severity,
+    predict_level1_batch, predict_diagnosis, level1_referrals_batch,
+)
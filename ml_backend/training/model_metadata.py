@@ -0,0 +1,46 @@
+# model_metadata.py
+import os
+import json
+from datetime import datetime, timezone
+
+# ==============================================================================
+# MODEL METADATA SIDECAR (<model>_meta.json next to each *_lgbm_model.pkl)
+# ==============================================================================
+#
+# Everything inference needs besides the booster itself: the exact feature order,
+# the per-feature means used to impute missing items during training, and the
+# class labels in encoded order (so serving never unpickles the sklearn LabelEncoder).
+
+
+def metadata_path_for(model_path):
+    """sleep_lgbm_model.pkl -> sleep_lgbm_model_meta.json"""
+    return os.path.splitext(model_path)[0] + "_meta.json"
+
+
+def write_model_metadata(model_path, feature_names, imputation_means, source_file=None, **extra):
+    meta = {
+        "feature_names": list(feature_names),
+        "imputation_means": {
+            name: (None if mean is None or mean != mean else float(mean))
+            for name, mean in zip(feature_names, imputation_means)
+        },
+        "source_file": os.path.basename(source_file) if source_file else None,
+        "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    meta.update(extra)
+
+    path = metadata_path_for(model_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, path)
+    return meta
+
+
+def read_model_metadata(model_path):
+    """Returns the metadata dict, or None for models trained before metadata existed."""
+    try:
+        with open(metadata_path_for(model_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
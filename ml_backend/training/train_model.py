@@ -1,12 +1,28 @@
+import sys
+import os
 import pandas as pd
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
+from sklearn.metrics import log_loss
 import lightgbm as lgb
 import joblib
 from lightgbm import early_stopping
+from data_cache import load_scores
+from model_metadata import write_model_metadata, read_model_metadata
 import numpy as np
 import re
 import math
+import json
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# --- The serving runtime (ml_backend/inference) evaluates compiled forests ---
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from inference.forest import export_forest
+from inference.releases import stage, publish, next_version, version_dir
+from training_telemetry import TrainingTelemetry
 
 # ==============================================================================
 # 1. FINAL DATA PREPARATION FUNCTION (Stable and uses Name-Based Reverse Scoring)
@@ -55,7 +71,8 @@ def convert_sheet(df, reverse_score_names):
         
         # Apply Reverse Scoring based on the descriptive name
         if current_name in reverse_score_names:
-            df[col] = 6 - df[col] 
+            # Widen first: narrow unsigned columns from the data cache would wrap on 6 - x
+            df[col] = 6 - df[col].astype(np.float64)
 
     # Restore descriptive names for final output and feature importance
     df.columns = original_column_names
@@ -64,22 +81,121 @@ def convert_sheet(df, reverse_score_names):
 
 
 # ==============================================================================
-# 2. MAIN TRAINING FUNCTION (Universal, CSV Loading, ML Logic)
+# 2. DUPLICATE COLLAPSING (Unique response patterns + integer weights)
 # ==============================================================================
 
-def train_lgbm_model(file_path, model_output_path, label_encoder_path, reverse_cols_map, label_column="label"):
-    
+def collapse_duplicate_rows(X, y):
+    """
+    Groups identical (features, label) rows into unique rows with an integer weight.
+    Returns (X_unique, y_unique, weights) in first-seen order.
+    """
+    keys = X.reset_index(drop=True)
+    keys['__label__'] = np.asarray(y)
+
+    grouped = keys.groupby(keys.columns.tolist(), sort=False, dropna=False).size()
+    grouped = grouped.reset_index(name='__weight__')
+
+    X_unique = grouped[X.columns.tolist()]
+    y_unique = grouped['__label__'].to_numpy()
+    weights = grouped['__weight__'].to_numpy()
+
+    return X_unique, y_unique, weights
+
+
+def split_unique_groups(X_unique, y_unique, weights, test_size=0.2, random_state=42):
+    """
+    Train/test split performed on unique response patterns so the same pattern can
+    never appear on both sides. Classes with a single unique pattern stay in training.
+    When too few patterns are left to give every class one on each side, the weighted
+    rows are split row by row instead (patterns may then appear on both sides).
+    """
+    pattern_counts = pd.Series(y_unique).value_counts()
+    single_pattern_classes = pattern_counts[pattern_counts < 2].index.tolist()
+    always_train = np.isin(y_unique, single_pattern_classes)
+
+    splittable = np.flatnonzero(~always_train)
+
+    # Stratification needs at least one test pattern per class
+    n_classes = len(np.unique(y_unique[splittable]))
+    n_test = max(math.ceil(test_size * len(splittable)), n_classes)
+    if n_classes == 0 or len(splittable) - n_test < n_classes:
+        print(f"Warning: only {len(splittable)} of {len(y_unique)} unique patterns can be split by pattern; "
+              "falling back to a row-level split.")
+        return split_weighted_rows(X_unique, y_unique, weights, test_size, random_state)
+
+    train_idx, test_idx = train_test_split(
+        splittable, test_size=n_test, random_state=random_state, stratify=y_unique[splittable]
+    )
+    train_idx = np.concatenate([train_idx, np.flatnonzero(always_train)])
+
+    return (
+        X_unique.iloc[train_idx], X_unique.iloc[test_idx],
+        y_unique[train_idx], y_unique[test_idx],
+        weights[train_idx], weights[test_idx]
+    )
+
+
+def split_weighted_rows(X_unique, y_unique, weights, test_size=0.2, random_state=42):
+    """
+    Stratified split of the rows behind the weighted patterns (as without collapsing),
+    re-collapsed per side: a pattern's weight is its number of rows on that side.
+    """
+    rows = np.repeat(np.arange(len(y_unique)), weights)
+    n_test = max(math.ceil(test_size * len(rows)), len(np.unique(y_unique)))
+    train_rows, test_rows = train_test_split(
+        rows, test_size=n_test, random_state=random_state, stratify=y_unique[rows]
+    )
+    w_train = np.bincount(train_rows, minlength=len(y_unique))
+    w_test = np.bincount(test_rows, minlength=len(y_unique))
+    train_idx, test_idx = np.flatnonzero(w_train), np.flatnonzero(w_test)
+
+    return (
+        X_unique.iloc[train_idx], X_unique.iloc[test_idx],
+        y_unique[train_idx], y_unique[test_idx],
+        w_train[train_idx], w_test[test_idx]
+    )
+
+
+# ==============================================================================
+# 3. MAIN TRAINING FUNCTION (Universal, CSV Loading, ML Logic)
+# ==============================================================================
+
+def train_lgbm_model(file_path, model_output_path, label_encoder_path, reverse_cols_map, label_column="label",
+                     collapse_duplicates=True, streaming=False, chunksize=500_000, matrix_dir=None,
+                     use_cache=True, profile=False):
+
+    if profile:
+        # Same run under cProfile; the capture lands in PROFILE_DIR (see section 6)
+        return profile_training_run(model_output_path, lambda: train_lgbm_model(
+            file_path, model_output_path, label_encoder_path, reverse_cols_map, label_column=label_column,
+            collapse_duplicates=collapse_duplicates, streaming=streaming, chunksize=chunksize,
+            matrix_dir=matrix_dir, use_cache=use_cache
+        ))
+
     print(f"Training model for: {file_path}")
 
-    # --- Data Loading (Stable CSV method) ---
+    if streaming:
+        return train_lgbm_model_streaming(
+            file_path, model_output_path, label_encoder_path, reverse_cols_map,
+            label_column=label_column, chunksize=chunksize, matrix_dir=matrix_dir
+        )
+
+    # Phase timers + per-iteration callback; the run report lands next to the model
+    telemetry = TrainingTelemetry(model_output_path, source_file=file_path)
+    telemetry.begin("load")
+
+    # --- Data Loading (Stable CSV method, served from the columnar cache) ---
     try:
-        # Read CSV directly; this assumes the first row is the header
-        data = pd.read_csv(file_path,header=0)
+        # Equivalent to pd.read_csv(file_path, header=0); the text parse only happens
+        # the first time or after the CSV changes
+        # (the Sample ID column is dropped before training, so it is left as codes)
+        data = load_scores(file_path, decode_ids=False) if use_cache else pd.read_csv(file_path, header=0)
     except Exception as e:
         print(f"FATAL ERROR: Could not load CSV file at {file_path}")
         raise e
         
     # Process the data using the universal convert_sheet function
+    telemetry.begin("prepare")
     print("Processing data from CSV...")
     data = convert_sheet(data.copy(), reverse_cols_map) 
     
@@ -96,7 +212,9 @@ def train_lgbm_model(file_path, model_output_path, label_encoder_path, reverse_c
     X_raw = data[feature_cols].copy() 
     
     # --- Pre-processing and Class Cleaning ---
-    X_raw = X_raw.fillna(X_raw.mean())
+    # The means are kept so inference can impute partially answered questionnaires the same way
+    imputation_means = X_raw.mean()
+    X_raw = X_raw.fillna(imputation_means)
     y_cleaned = y_raw.dropna() 
     X_aligned = X_raw.loc[y_cleaned.index]
 
@@ -138,39 +256,510 @@ def train_lgbm_model(file_path, model_output_path, label_encoder_path, reverse_c
 
 
     # --- Training Split with Stratification ---
-    X_train, X_test, y_train, y_test = train_test_split(
-        X_aligned, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded 
-    )
+    if collapse_duplicates:
+        # Identical response vectors become one weighted row; the split is done on
+        # these unique groups so no pattern leaks from train into test.
+        X_unique, y_unique, weights = collapse_duplicate_rows(X_aligned, y_encoded)
+        print(f"\nCollapsed {len(X_aligned)} rows into {len(X_unique)} unique response patterns "
+              f"(compression ratio {len(X_aligned) / len(X_unique):.2f}x)")
+
+        X_train, X_test, y_train, y_test, w_train, w_test = split_unique_groups(
+            X_unique, y_unique, weights, test_size=0.2, random_state=42
+        )
+    else:
+        X_train, X_test, y_train, y_test = train_test_split(
+            X_aligned, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded 
+        )
+        w_train, w_test = None, None
 
     # --- LightGBM Model Training Parameters ---
-    train_data = lgb.Dataset(X_train, label=y_train)
-    test_data = lgb.Dataset(X_test, label=y_test)
-
-    params = {
-        "objective": "multiclass",
-        "num_class": len(le.classes_),
-        "learning_rate": 0.01,
-        "num_leaves": 20,         # <-- INCREASED
-        "max_depth": 6,           # <-- INCREASED
-        "metric": "multi_logloss",
-        "n_jobs": -1,
-        "verbose": -1,
-        "lambda_l1": 0.01,        # <-- REDUCED REGULARIZATION
-        "lambda_l2": 0.01,        # <-- REDUCED REGULARIZATION
-        "min_child_samples": 5,   # <-- REDUCED
-        "is_unbalance": True
-    }
+    train_data = lgb.Dataset(X_train, label=y_train, weight=w_train)
+    test_data = lgb.Dataset(X_test, label=y_test, weight=w_test)
+
+    fit_and_save_booster(
+        train_data, test_data, le, X_aligned.columns.tolist(), model_output_path, label_encoder_path,
+        imputation_means=imputation_means.tolist(), source_file=file_path, telemetry=telemetry
+    )
 
-    callbacks = [early_stopping(stopping_rounds=30, verbose=-1)]
+
+LGBM_PARAMS = {
+    "objective": "multiclass",
+    "learning_rate": 0.01,
+    "num_leaves": 20,         # <-- INCREASED
+    "max_depth": 6,           # <-- INCREASED
+    "metric": "multi_logloss",
+    "n_jobs": -1,
+    "verbose": -1,
+    "lambda_l1": 0.01,        # <-- REDUCED REGULARIZATION
+    "lambda_l2": 0.01,        # <-- REDUCED REGULARIZATION
+    "min_child_samples": 5,   # <-- REDUCED
+    "is_unbalance": True
+}
+
+# MINDGAUGE_RELEASE_AS_CANDIDATE=1: new models are shadow-scored by the backend
+# instead of served; `python -m inference.releases promote` makes them current
+RELEASE_AS_CANDIDATE = os.environ.get("MINDGAUGE_RELEASE_AS_CANDIDATE", "0") == "1"
+
+
+def save_model_artifact(model, le, model_output_path, label_encoder_path, feature_names, imputation_means,
+                        source_file=None, **meta_extra):
+    """
+    Writes booster, encoder, metadata and the compiled forest used for serving as the
+    next release (inference/releases.py): built in a staging dir, renamed into
+    releases/<domain>/v<N>/ and activated by an atomic swap of the CURRENT pointer.
+    With RELEASE_AS_CANDIDATE the release is only proposed for shadow scoring.
+    """
+    previous = read_model_metadata(model_output_path) or {}
+    model_dir = os.path.dirname(model_output_path)
+    domain = os.path.basename(model_output_path)[:-len("_lgbm_model.pkl")]
+    version = next_version(model_dir, domain, previous.get("version"))
+    best_score = model.best_score.get("valid_0", {}).get("multi_logloss")
+
+    staging = stage(model_dir, domain)
+    staged_model_path = os.path.join(staging, os.path.basename(model_output_path))
+    try:
+        joblib.dump(model, staged_model_path)
+        joblib.dump(le, os.path.join(staging, os.path.basename(label_encoder_path)))
+        meta = write_model_metadata(
+            staged_model_path, feature_names, imputation_means, source_file=source_file,
+            version=version, parent_version=previous.get("version"),
+            valid_logloss=best_score, num_trees=model.num_trees(), classes=le.classes_.tolist(), **meta_extra
+        )
+        export_forest(staged_model_path, booster=model)
+        publish(model_dir, domain, staging, version, candidate=RELEASE_AS_CANDIDATE)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return meta
+
+
+def fit_and_save_booster(train_data, test_data, le, feature_names, model_output_path, label_encoder_path,
+                         imputation_means=None, source_file=None, telemetry=None):
+    """Shared LightGBM fit + artifact save used by the in-memory and streaming paths."""
+
+    telemetry = telemetry or TrainingTelemetry(model_output_path, source_file=source_file)
+    params = dict(LGBM_PARAMS, num_class=len(le.classes_))
+
+    # Binning happens here rather than lazily inside lgb.train, so it is timed on its own
+    telemetry.begin("dataset")
+    train_data._update_params(params).construct()
+
+    telemetry.begin("boosting")
+    callbacks = [early_stopping(stopping_rounds=30, verbose=-1), telemetry.callback()]
 
     model = lgb.train(params, train_data, valid_sets=[test_data], num_boost_round=3000, callbacks=callbacks)
 
     # --- Save Model and Encoder ---
-    joblib.dump(model, model_output_path)
-    joblib.dump(le, label_encoder_path)
+    telemetry.begin("save")
+    meta = save_model_artifact(
+        model, le, model_output_path, label_encoder_path, feature_names,
+        imputation_means if imputation_means is not None else [None] * len(feature_names),
+        source_file=source_file, training_mode="full"
+    )
+    model_dir, model_file = os.path.split(model_output_path)
+    release_dir = version_dir(model_dir, model_file[:-len("_lgbm_model.pkl")], meta["version"])
+    report = telemetry.write_report(model, meta, artifact_path=os.path.join(release_dir, model_file))
 
     print("\nTraining complete. Model saved.")
+    print(f"Best iteration {report['iterations']['best_iteration']} of {report['iterations']['rounds_run']} rounds; "
+          + ", ".join(f"{name} {p['seconds']:.2f}s" + ("" if p['peak_rss_mb'] is None else f"/{p['peak_rss_mb']:.0f}MB")
+                      for name, p in report["phases"].items()))
     
     # --- Feature Importance ---
-    importance = pd.DataFrame({"feature": X_aligned.columns, "importance": model.feature_importance()})
-    print("\nFeature Importance:\n", importance.sort_values(by="importance", ascending=False))
\ No newline at end of file
+    importance = pd.DataFrame({"feature": feature_names, "importance": model.feature_importance()})
+    print("\nFeature Importance:\n", importance.sort_values(by="importance", ascending=False))
+
+    return model
+
+
+def backfill_model_metadata(file_path, model_output_path, reverse_cols_map):
+    """
+    Writes the metadata sidecar for a model trained before metadata existed,
+    recomputing the imputation means from the same CSV without retraining.
+    """
+    data = convert_sheet(load_scores(file_path, decode_ids=False), reverse_cols_map)
+    feature_cols = data.columns[1:-1].tolist()
+
+    model = joblib.load(model_output_path)
+    booster = model.booster_ if hasattr(model, "booster_") else model
+    if booster.feature_name() != feature_cols:
+        raise ValueError(f"Feature mismatch between {model_output_path} and {file_path}")
+
+    return write_model_metadata(
+        model_output_path, feature_cols, data[feature_cols].mean().tolist(), source_file=file_path,
+        trained_at=None
+    )
+
+
+# ==============================================================================
+# 4. STREAMING INGESTION (Chunked, out-of-core training matrix)
+# ==============================================================================
+
+STREAMING_SCHEMA_FILE = "schema.json"
+
+
+def _clean_class_list(label_counts, label_column):
+    """Same class cleaning rules as the in-memory path: drop the rogue header label and classes with < 2 samples."""
+    return sorted(
+        label for label, count in label_counts.items()
+        if label != label_column and count >= 2
+    )
+
+
+def build_streaming_matrix(file_path, reverse_cols_map, matrix_dir, label_column="label",
+                           chunksize=500_000, test_size=0.2, random_state=42):
+    """
+    Two passes over the CSV in chunks, never holding more than one chunk in memory.
+
+    Pass 1 sanitizes, coerces and reverse-scores each chunk (via convert_sheet) and
+    accumulates per-feature sums/counts for mean imputation, label counts and the
+    narrowest dtype per column. Pass 2 repeats the per-chunk processing, imputes, and
+    writes one memory-mapped .npy file per column (uint8 for complete 0-255 integer
+    item scores, float32 otherwise) for the train and test splits.
+    """
+    os.makedirs(matrix_dir, exist_ok=True)
+
+    # --- Pass 1: statistics ---
+    feature_names = None
+    sums = counts = None
+    integral = None
+    label_counts = {}
+    split_counts = {}
+    rng = np.random.default_rng(random_state)
+
+    for chunk in pd.read_csv(file_path, header=0, chunksize=chunksize):
+        # convert_sheet rebuilds each column with a 0-based index, so chunks must start at 0 too
+        chunk = convert_sheet(chunk.reset_index(drop=True), reverse_cols_map)
+        label_name = chunk.columns[-1]
+        if feature_names is None:
+            feature_names = chunk.columns[1:-1].tolist()
+            sums = np.zeros(len(feature_names))
+            counts = np.zeros(len(feature_names), dtype=np.int64)
+            integral = np.ones(len(feature_names), dtype=bool)
+
+        values = chunk[feature_names].to_numpy(dtype=np.float64)
+        present = ~np.isnan(values)
+        sums += np.where(present, values, 0.0).sum(axis=0)
+        counts += present.sum(axis=0)
+
+        # A column stays uint8 only if every value is a present integer in 0..255
+        in_range = present & (values >= 0) & (values <= 255) & (values == np.round(values))
+        integral &= in_range.all(axis=0)
+
+        labels = chunk[label_name].dropna()
+        # The split draw happens per labelled row so pass 2 can replay it exactly
+        is_test = rng.random(len(labels)) < test_size
+        # One count per (label, side) of the chunk, not a Python step per row
+        tallies = pd.Series(is_test).groupby([labels.to_numpy(), is_test]).size()
+        for (label, test_flag), count in tallies.items():
+            label_counts[label] = label_counts.get(label, 0) + int(count)
+            split_counts[(label, bool(test_flag))] = split_counts.get((label, bool(test_flag)), 0) + int(count)
+
+    if feature_names is None:
+        raise ValueError(f"No rows found in {file_path}")
+
+    classes = _clean_class_list(label_counts, label_column)
+    means = np.divide(sums, counts, out=np.full(len(feature_names), np.nan), where=counts > 0)
+    dtypes = ["uint8" if flag else "float32" for flag in integral]
+
+    n_train = sum(split_counts.get((label, False), 0) for label in classes)
+    n_test = sum(split_counts.get((label, True), 0) for label in classes)
+    print(f"Streaming pass 1 complete: {sum(label_counts.values())} labelled rows, "
+          f"{n_train} train / {n_test} test after cleaning")
+
+    # --- Pass 2: write the columnar matrix ---
+    splits = {"train": n_train, "test": n_test}
+    columns = {}
+    for split, n_rows in splits.items():
+        os.makedirs(os.path.join(matrix_dir, split), exist_ok=True)
+        columns[split] = [
+            np.lib.format.open_memmap(
+                os.path.join(matrix_dir, split, f"col_{i}.npy"), mode="w+", dtype=dtypes[i], shape=(n_rows,)
+            )
+            for i in range(len(feature_names))
+        ]
+        columns[split].append(
+            np.lib.format.open_memmap(
+                os.path.join(matrix_dir, split, "label.npy"), mode="w+", dtype=np.int16, shape=(n_rows,)
+            )
+        )
+
+    offsets = {"train": 0, "test": 0}
+    class_array = np.array(classes, dtype=object)
+    rng = np.random.default_rng(random_state)
+
+    for chunk in pd.read_csv(file_path, header=0, chunksize=chunksize):
+        chunk = convert_sheet(chunk.reset_index(drop=True), reverse_cols_map)
+        label_name = chunk.columns[-1]
+        chunk = chunk[chunk[label_name].notna()]
+        is_test = rng.random(len(chunk)) < test_size
+
+        keep = chunk[label_name].isin(classes).to_numpy()
+        values = chunk[feature_names].to_numpy(dtype=np.float64)[keep]
+        values = np.where(np.isnan(values), means, values)
+        codes = np.searchsorted(class_array, chunk[label_name].to_numpy()[keep])
+        is_test = is_test[keep]
+
+        for split, mask in (("train", ~is_test), ("test", is_test)):
+            n = int(mask.sum())
+            start, end = offsets[split], offsets[split] + n
+            for i, column in enumerate(columns[split][:-1]):
+                column[start:end] = values[mask, i]
+            columns[split][-1][start:end] = codes[mask]
+            offsets[split] = end
+
+    for split_columns in columns.values():
+        for column in split_columns:
+            column.flush()
+
+    schema = {
+        "source": os.path.abspath(file_path),
+        "feature_names": feature_names,
+        "dtypes": dtypes,
+        "means": [None if np.isnan(m) else float(m) for m in means],
+        "classes": classes,
+        "rows": splits,
+    }
+    with open(os.path.join(matrix_dir, STREAMING_SCHEMA_FILE), "w") as f:
+        json.dump(schema, f, indent=2)
+
+    return schema
+
+
+class ColumnarSequence(lgb.Sequence):
+    """Feeds LightGBM row batches assembled from the per-column memory-mapped .npy files."""
+
+    def __init__(self, split_dir, n_features, batch_size=65_536):
+        self.columns = [np.load(os.path.join(split_dir, f"col_{i}.npy"), mmap_mode="r") for i in range(n_features)]
+        self.batch_size = batch_size
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return np.column_stack([column[idx] for column in self.columns]).astype(np.float32)
+        # LightGBM requires double precision for the rows it samples to build bins
+        return np.array([column[idx] for column in self.columns], dtype=np.float64)
+
+
+def train_lgbm_model_streaming(file_path, model_output_path, label_encoder_path, reverse_cols_map,
+                               label_column="label", chunksize=500_000, matrix_dir=None):
+    """
+    Out-of-core variant of train_lgbm_model for exports that do not fit in memory.
+    The training matrix lives on disk; pass matrix_dir to keep it after training.
+    """
+    cleanup = matrix_dir is None
+    if cleanup:
+        matrix_dir = tempfile.mkdtemp(prefix="mindgauge_matrix_")
+
+    telemetry = TrainingTelemetry(model_output_path, source_file=file_path)
+    try:
+        telemetry.begin("prepare")
+        schema = build_streaming_matrix(
+            file_path, reverse_cols_map, matrix_dir, label_column=label_column, chunksize=chunksize
+        )
+        feature_names = schema["feature_names"]
+
+        if len(schema["classes"]) < 2:
+            raise ValueError("Critical: After cleaning, fewer than 2 classes remain. Check data manually.")
+
+        le = LabelEncoder()
+        le.classes_ = np.array(schema["classes"], dtype=object)
+        print("\nFinal Cleaned Label mapping:", dict(zip(le.classes_, range(len(le.classes_)))))
+
+        n_features = len(feature_names)
+        train_labels = np.load(os.path.join(matrix_dir, "train", "label.npy"), mmap_mode="r")
+        test_labels = np.load(os.path.join(matrix_dir, "test", "label.npy"), mmap_mode="r")
+
+        train_data = lgb.Dataset(
+            ColumnarSequence(os.path.join(matrix_dir, "train"), n_features),
+            label=train_labels, feature_name=feature_names
+        )
+        test_data = lgb.Dataset(
+            ColumnarSequence(os.path.join(matrix_dir, "test"), n_features),
+            label=test_labels, feature_name=feature_names, reference=train_data
+        )
+
+        return fit_and_save_booster(
+            train_data, test_data, le, feature_names, model_output_path, label_encoder_path,
+            imputation_means=schema["means"], source_file=file_path, telemetry=telemetry
+        )
+    finally:
+        if cleanup:
+            shutil.rmtree(matrix_dir, ignore_errors=True)
+
+
+# ==============================================================================
+# 5. INCREMENTAL TRAINING (Continue the current booster on new assessments)
+# ==============================================================================
+
+def _prepare_features(file_path, reverse_cols_map, feature_names, means, le, label_column="label", new_batch=True):
+    """
+    Loads a CSV in the training export format and returns (X, y_encoded) aligned to an existing model.
+    Rows with labels full training dropped (the rogue header label, classes with < 2 rows) are left out
+    of the history; in a new batch, any label other than the rogue one that the model lacks is drift.
+    """
+    data = convert_sheet(pd.read_csv(file_path, header=0), reverse_cols_map)
+    label_column_name = data.columns[-1]
+    if data.columns[1:-1].tolist() != feature_names:
+        raise ValueError(f"Columns of {file_path} do not match the model features.")
+
+    data = data[data[label_column_name].notna() & (data[label_column_name] != label_column)]
+    known = data[label_column_name].isin(le.classes_)
+    if new_batch and not known.all():
+        unseen = sorted(set(data.loc[~known, label_column_name]))
+        raise ValueError(f"New batch contains labels the model was not trained on: {unseen}")
+    data = data[known]
+
+    X = data[feature_names].fillna(pd.Series(means, index=feature_names, dtype=float))
+    return X.reset_index(drop=True), le.transform(data[label_column_name])
+
+
+def train_lgbm_model_incremental(new_data_path, history_path, model_output_path, label_encoder_path,
+                                 reverse_cols_map, label_column="label", max_new_trees=100,
+                                 replay_ratio=1.0, learning_rate=0.05, drift_tolerance=0.10,
+                                 random_state=42):
+    """
+    Appends at most max_new_trees to the current booster (used as init_model) using
+    the new batch plus a replay sample of the historical data (replay_ratio x the
+    new batch size), then saves the result as the next model version.
+
+    Drift guard: if the refreshed model's validation loss is more than
+    drift_tolerance worse than the current version's on the same validation rows,
+    or the batch brings labels/columns the model cannot absorb, the new batch is
+    appended to the history and the model is retrained from scratch instead.
+    """
+    print(f"Incremental training for: {model_output_path}")
+
+    def full_retrain(reason):
+        print(f"\nDrift guard: {reason}. Falling back to full retrain.")
+        history = pd.read_csv(history_path, header=0)
+        new_batch = pd.read_csv(new_data_path, header=0)
+        combined_path = os.path.join(tempfile.mkdtemp(prefix="mindgauge_retrain_"), os.path.basename(history_path))
+        try:
+            pd.concat([history, new_batch.set_axis(history.columns, axis=1)], ignore_index=True).to_csv(
+                combined_path, index=False
+            )
+            return train_lgbm_model(
+                combined_path, model_output_path, label_encoder_path, reverse_cols_map,
+                label_column=label_column, use_cache=False
+            )
+        finally:
+            shutil.rmtree(os.path.dirname(combined_path), ignore_errors=True)
+
+    meta = read_model_metadata(model_output_path)
+    if meta is None or meta.get("imputation_means") is None:
+        return full_retrain("current model has no metadata")
+
+    current = joblib.load(model_output_path)
+    le = joblib.load(label_encoder_path)
+    feature_names = meta["feature_names"]
+    means = [meta["imputation_means"].get(name) for name in feature_names]
+
+    try:
+        X_new, y_new = _prepare_features(new_data_path, reverse_cols_map, feature_names, means, le, label_column)
+        X_hist, y_hist = _prepare_features(
+            history_path, reverse_cols_map, feature_names, means, le, label_column, new_batch=False
+        )
+    except ValueError as e:
+        return full_retrain(str(e))
+
+    # --- Replay sample of historical data so the refresh does not forget old patterns ---
+    n_replay = min(len(X_hist), int(round(len(X_new) * replay_ratio)))
+    replay_idx = np.random.default_rng(random_state).choice(len(X_hist), size=n_replay, replace=False)
+    X_batch = pd.concat([X_new, X_hist.iloc[replay_idx]], ignore_index=True)
+    y_batch = np.concatenate([y_new, y_hist[replay_idx]])
+
+    X_train, X_valid, y_train, y_valid = train_test_split(
+        X_batch, y_batch, test_size=0.2, random_state=random_state
+    )
+    print(f"New rows: {len(X_new)}, replayed rows: {n_replay}, validation rows: {len(X_valid)}")
+
+    # Continue from the best iteration only, not the trailing early-stopping rounds
+    init_booster = lgb.Booster(model_str=current.model_to_string(num_iteration=current.best_iteration or None))
+
+    train_data = lgb.Dataset(X_train, label=y_train)
+    valid_data = lgb.Dataset(X_valid, label=y_valid)
+    params = dict(LGBM_PARAMS, num_class=len(le.classes_), learning_rate=learning_rate)
+
+    model = lgb.train(
+        params, train_data, valid_sets=[valid_data], num_boost_round=max_new_trees,
+        init_model=init_booster, callbacks=[early_stopping(stopping_rounds=10, verbose=-1)]
+    )
+
+    # Both versions on the same validation rows (the stored valid_logloss is from another test set)
+    classes = np.arange(len(le.classes_))
+    baseline_loss = log_loss(y_valid, init_booster.predict(X_valid), labels=classes)
+    new_loss = log_loss(y_valid, model.predict(X_valid, num_iteration=model.best_iteration or None), labels=classes)
+    print(f"Validation multi_logloss: {new_loss:.5f} (current version: {baseline_loss:.5f})")
+
+    if new_loss > baseline_loss * (1 + drift_tolerance):
+        return full_retrain(f"validation loss degraded from {baseline_loss:.5f} to {new_loss:.5f}")
+
+    save_model_artifact(
+        model, le, model_output_path, label_encoder_path, feature_names, means,
+        source_file=meta.get("source_file"), training_mode="incremental",
+        rounds_added=model.current_iteration() - init_booster.current_iteration(),
+        incremental_batch=os.path.basename(new_data_path)
+    )
+    print("\nIncremental training complete. Model saved.")
+    return model
+
+
+# ==============================================================================
+# 6. PROFILING (train_lgbm_model(..., profile=True))
+# ==============================================================================
+#
+# Writes <PROFILE_DIR>/<timestamp>_train-<domain>_<population>_<domain>_v<version>.prof
+# and one line in PROFILE_DIR/index.jsonl, the same capture format as the backend's
+# request profiler (backend/profiling.py), so `python -m pstats <file>` or the
+# backend's /debug/profiles summary work on training runs too.
+
+PROFILE_DIR = os.environ.get(
+    "MINDGAUGE_PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "profiles")
+)
+
+
+def profile_training_run(model_output_path, run):
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        return run()
+    finally:
+        profiler.disable()
+        duration = time.perf_counter() - start
+
+        model_dir, model_file = os.path.split(os.path.abspath(model_output_path))
+        domain = model_file.replace("_lgbm_model.pkl", "")
+        population = os.path.basename(model_dir).replace("_model", "")
+        version = (read_model_metadata(model_output_path) or {}).get("version")
+        captured_at = datetime.now(timezone.utc)
+        capture_id = f"train-{domain}"
+        file_name = (f"{captured_at:%Y%m%dT%H%M%S}_{capture_id}_{population}_{domain}_"
+                     f"{'unversioned' if version is None else f'v{version}'}.prof")
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, file_name))
+
+        stats = pstats.Stats(profiler)
+        top = [
+            {"function": f"{os.path.basename(filename)}:{line}({name})", "calls": calls,
+             "self_s": round(own, 6), "cumulative_s": round(cum, 6)}
+            for (filename, line, name), (_, calls, own, cum, _) in
+            sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:8]
+        ]
+        entry = {
+            "id": capture_id, "kind": "training", "file": file_name,
+            "captured_at": captured_at.isoformat(timespec="seconds"),
+            "duration_ms": round(duration * 1000, 3),
+            "population": population, "domain": domain, "model_version": version,
+            "top_functions": top,
+        }
+        with open(os.path.join(PROFILE_DIR, "index.jsonl"), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        print(f"\nProfile written to {os.path.join(PROFILE_DIR, file_name)}")
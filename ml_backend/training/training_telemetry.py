@@ -0,0 +1,247 @@
+# training_telemetry.py
+import os
+import sys
+import json
+import time
+import glob
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:     # Windows: no rusage, peak RSS is reported as None
+    resource = None
+
+# ==============================================================================
+# TRAINING TELEMETRY (phase timers, per-iteration callback, JSON run report)
+# ==============================================================================
+#
+# Every full training run writes <stem>_run_report.json next to the model with
+# the wall time and peak RSS of each phase (load, prepare, dataset, boosting,
+# save), the per-iteration boosting times, the rounds actually used and the
+# artifact sizes. A one-line summary of each run is appended to
+# models/training_runs.jsonl; `python training_telemetry.py` aggregates that
+# history per domain so regressions in rounds, time or size show up over time.
+#
+# Peak RSS per phase uses Linux's resettable high-water mark (/proc/self/clear_refs);
+# elsewhere it falls back to the process-wide peak so far, and is None where
+# neither is available (Windows).
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models')
+HISTORY_FILE = "training_runs.jsonl"
+REPORT_SUFFIX = "_run_report.json"
+
+
+def report_path_for(model_path):
+    """sleep_lgbm_model.pkl -> sleep_lgbm_model_run_report.json"""
+    return os.path.splitext(model_path)[0] + REPORT_SUFFIX
+
+
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb(resettable):
+    if resettable:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _max_peak(phases):
+    return max((p["peak_rss_mb"] for p in phases if p["peak_rss_mb"] is not None), default=None)
+
+
+class TrainingTelemetry:
+
+    def __init__(self, model_output_path, source_file=None):
+        self.model_output_path = model_output_path
+        self.source_file = source_file
+        self.started_at = datetime.now(timezone.utc)
+        self.phases = {}
+        self.iteration_seconds = []
+        self.eval_history = []
+        self._last_tick = None
+        self._phase = None
+
+    def begin(self, name):
+        """Ends the running phase (if any) and starts timing `name`."""
+        self.end()
+        self._phase = (name, time.perf_counter(), _reset_peak_rss())
+
+    def end(self):
+        if self._phase is None:
+            return
+        name, start, resettable = self._phase
+        self._phase = None
+        peak = _peak_rss_mb(resettable)
+        self.phases[name] = {
+            "seconds": round(time.perf_counter() - start, 4),
+            "peak_rss_mb": None if peak is None else round(peak, 1),
+        }
+
+    @contextmanager
+    def phase(self, name):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end()
+
+    def callback(self):
+        """LightGBM callback recording the wall time and validation score of every iteration."""
+        self._last_tick = time.perf_counter()
+
+        def _record(env):
+            now = time.perf_counter()
+            self.iteration_seconds.append(now - self._last_tick)
+            self._last_tick = now
+            if env.evaluation_result_list:
+                self.eval_history.append(float(env.evaluation_result_list[0][2]))
+
+        _record.order = 25      # before early_stopping (order 30), which raises on the round it stops at
+        return _record
+
+    def iteration_summary(self, model):
+        times = np.array(self.iteration_seconds) * 1000
+        best = model.best_iteration or len(times)
+        return {
+            "rounds_run": len(times),
+            "best_iteration": best,
+            "rounds_after_best": len(times) - best,
+            "total_seconds": round(float(times.sum()) / 1000, 4),
+            "mean_ms": round(float(times.mean()), 3) if len(times) else None,
+            "p50_ms": round(float(np.percentile(times, 50)), 3) if len(times) else None,
+            "p95_ms": round(float(np.percentile(times, 95)), 3) if len(times) else None,
+            "max_ms": round(float(times.max()), 3) if len(times) else None,
+            "per_iteration_ms": [round(float(t), 3) for t in times],
+            "valid_logloss": [round(v, 6) for v in self.eval_history],
+        }
+
+    def write_report(self, model, meta, artifact_path=None):
+        """
+        Writes the run report next to the model and appends its summary to the history
+        file. artifact_path is where the saved model really is (its release dir), for sizes.
+        """
+        self.end()
+        path = self.model_output_path
+        artifact_path = artifact_path or path
+        forest_path = os.path.splitext(artifact_path)[0] + "_forest.bin"
+        model_dir = os.path.dirname(os.path.abspath(path))
+
+        report = {
+            "model": os.path.basename(path),
+            "population": os.path.basename(model_dir).replace("_model", ""),
+            "domain": os.path.basename(path).replace("_lgbm_model.pkl", ""),
+            "version": meta.get("version"),
+            "source_file": os.path.basename(self.source_file) if self.source_file else None,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "phases": self.phases,
+            "total_seconds": round(sum(p["seconds"] for p in self.phases.values()), 4),
+            "iterations": self.iteration_summary(model),
+            "num_trees": model.num_trees(),
+            "valid_logloss": meta.get("valid_logloss"),
+            "model_size_bytes": os.path.getsize(artifact_path),
+            "forest_size_bytes": os.path.getsize(forest_path) if os.path.exists(forest_path) else None,
+        }
+        with open(report_path_for(path), "w") as f:
+            json.dump(report, f, indent=2)
+
+        summary = {k: v for k, v in report.items() if k not in ("phases", "iterations")}
+        summary["phase_seconds"] = {name: p["seconds"] for name, p in self.phases.items()}
+        summary["peak_rss_mb"] = _max_peak(self.phases.values())
+        summary["rounds_run"] = report["iterations"]["rounds_run"]
+        summary["best_iteration"] = report["iterations"]["best_iteration"]
+        with open(os.path.join(os.path.dirname(model_dir), HISTORY_FILE), "a") as f:
+            f.write(json.dumps(summary) + "\n")
+        return report
+
+
+# ==============================================================================
+# AGGREGATION ACROSS DOMAINS (python training_telemetry.py [models_dir])
+# ==============================================================================
+
+def load_history(models_dir=MODELS_DIR):
+    try:
+        with open(os.path.join(models_dir, HISTORY_FILE)) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def aggregate(models_dir=MODELS_DIR):
+    """Latest run per (population, domain) plus the change against the run before it."""
+    runs = {}
+    for entry in load_history(models_dir):
+        runs.setdefault((entry["population"], entry["domain"]), []).append(entry)
+
+    rows = []
+    for key in sorted(runs):
+        latest = runs[key][-1]
+        previous = runs[key][-2] if len(runs[key]) > 1 else None
+        rows.append({
+            "population": key[0],
+            "domain": key[1],
+            "runs": len(runs[key]),
+            "version": latest["version"],
+            "best_iteration": latest["best_iteration"],
+            "rounds_run": latest["rounds_run"],
+            "total_seconds": latest["total_seconds"],
+            "boosting_seconds": latest["phase_seconds"].get("boosting"),
+            "peak_rss_mb": latest["peak_rss_mb"],
+            "model_size_bytes": latest["model_size_bytes"],
+            "valid_logloss": latest["valid_logloss"],
+            "delta_seconds": None if previous is None else round(latest["total_seconds"] - previous["total_seconds"], 3),
+            "delta_best_iteration": None if previous is None else latest["best_iteration"] - previous["best_iteration"],
+        })
+
+    # Reports written next to models that never made it into the history (e.g. copied in)
+    seen = {(r["population"], r["domain"]) for r in rows}
+    for path in sorted(glob.glob(os.path.join(models_dir, "*_model", "*" + REPORT_SUFFIX))):
+        with open(path) as f:
+            report = json.load(f)
+        if (report["population"], report["domain"]) not in seen:
+            rows.append({
+                "population": report["population"], "domain": report["domain"], "runs": 1,
+                "version": report["version"], "best_iteration": report["iterations"]["best_iteration"],
+                "rounds_run": report["iterations"]["rounds_run"], "total_seconds": report["total_seconds"],
+                "boosting_seconds": report["phases"].get("boosting", {}).get("seconds"),
+                "peak_rss_mb": _max_peak(report["phases"].values()),
+                "model_size_bytes": report["model_size_bytes"], "valid_logloss": report["valid_logloss"],
+                "delta_seconds": None, "delta_best_iteration": None,
+            })
+    return rows
+
+
+if __name__ == '__main__':
+    rows = aggregate(sys.argv[1] if len(sys.argv) > 1 else MODELS_DIR)
+    if not rows:
+        print("No training runs recorded yet.")
+        raise SystemExit(0)
+
+    header = f"{'domain':32s}{'ver':>5s}{'best it':>9s}{'rounds':>8s}{'total s':>9s}{'boost s':>9s}" \
+             f"{'peak MB':>9s}{'size KB':>9s}{'logloss':>9s}{'d s':>8s}{'d it':>6s}"
+    print(header)
+    print("-" * len(header))
+    columns = [("version", 5, "d"), ("best_iteration", 9, "d"), ("rounds_run", 8, "d"),
+               ("total_seconds", 9, ".1f"), ("boosting_seconds", 9, ".1f"), ("peak_rss_mb", 9, ".0f"),
+               ("model_size_kb", 9, ".0f"), ("valid_logloss", 9, ".4f"), ("delta_seconds", 8, ".1f"),
+               ("delta_best_iteration", 6, "d")]
+    for r in rows:
+        r["model_size_kb"] = r["model_size_bytes"] / 1024
+        cells = ["-".rjust(width) if r[key] is None else format(r[key], f"{'+' if key.startswith('delta') else ''}{width}{spec}") for key, width, spec in columns]
+        print(f"{r['population'] + '/' + r['domain']:32s}" + "".join(cells))
+    print("-" * len(header))
+    print(f"{len(rows)} domains, {sum(r['total_seconds'] for r in rows):.1f}s total training time (latest runs)")